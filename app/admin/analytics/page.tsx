@@ -57,7 +57,7 @@ export default function AnalyticsPage() {
   const fetchAnalytics = async () => {
     try {
       const [eventsRes, usersRes] = await Promise.all([
-        fetch('/api/events'),
+        fetch('/api/admin/events'),
         fetch('/api/users')
       ]);
 
@@ -269,7 +269,7 @@ export default function AdminEventsPage() {
 
   const fetchEvents = async () => {
     try {
-      const response = await fetch('/api/events');
+      const response = await fetch('/api/admin/events');
       if (response.ok) {
         const data = await response.json();
         console.log('Fetched events:', data);
@@ -143,7 +143,7 @@ export default function AdminFormsPage() {
 
   const fetchData = async () => {
     try {
-      const eventsRes = await fetch('/api/events');
+      const eventsRes = await fetch('/api/events?fields=id,name,date,type,isArchived');
 
       if (eventsRes.ok) {
         const eventsData = await eventsRes.json();
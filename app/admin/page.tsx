@@ -35,7 +35,7 @@ export default function AdminDashboard() {
   const fetchDashboardStats = async () => {
     try {
       const [eventsRes, usersRes, refundsRes] = await Promise.all([
-        fetch('/api/events'),
+        fetch('/api/admin/events'),
         fetch('/api/users'),
         fetch('/api/admin/refunds')
       ]);
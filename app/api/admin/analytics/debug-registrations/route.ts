@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
+import { adminHeaders } from '@/lib/adminApi';
 
 export async function GET(request: NextRequest) {
   try {
@@ -7,7 +8,7 @@ export async function GET(request: NextRequest) {
     const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
 
     // Get all events
-    const eventsRes = await fetch(`${backendUrl}/events`);
+    const eventsRes = await fetch(`${backendUrl}/events?view=full`, { headers: adminHeaders() });
     if (!eventsRes.ok) {
       return NextResponse.json({ error: 'Failed to fetch events' }, { status: 500 });
     }
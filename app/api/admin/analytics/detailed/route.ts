@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
+import { adminHeaders } from '@/lib/adminApi';
 
 export async function GET(request: NextRequest) {
   try {
@@ -8,7 +9,7 @@ export async function GET(request: NextRequest) {
 
     // Fetch base datasets
     const [eventsRes, usersRes, refundsRes] = await Promise.all([
-      fetch(`${backendUrl}/events`),
+      fetch(`${backendUrl}/events?view=full`, { headers: adminHeaders() }),
       fetch(`${backendUrl}/users`),
       fetch(`${backendUrl}/refunds`)
     ]);
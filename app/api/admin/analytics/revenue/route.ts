@@ -1,11 +1,12 @@
 import { NextRequest, NextResponse } from 'next/server';
+import { adminHeaders } from '@/lib/adminApi';
 
 export async function GET(request: NextRequest) {
   try {
     const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
     
     // Get events with registration details
-    const eventsResponse = await fetch(`${backendUrl}/events`);
+    const eventsResponse = await fetch(`${backendUrl}/events?view=full`, { headers: adminHeaders() });
     if (!eventsResponse.ok) {
       return NextResponse.json(
         { success: false, error: 'Failed to fetch events' },
@@ -0,0 +1,34 @@
+import { NextResponse } from 'next/server';
+import { adminHeaders } from '@/lib/adminApi';
+
+// Full event view (including registeredUsers) for the admin dashboard
+export async function GET() {
+  try {
+    const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
+
+    const response = await fetch(`${backendUrl}/events?view=full`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+        ...adminHeaders(),
+      },
+    });
+
+    const data = await response.json();
+
+    if (response.ok) {
+      return NextResponse.json(data, { headers: { 'Cache-Control': 'no-store, no-cache, max-age=0, must-revalidate' } });
+    } else {
+      return NextResponse.json(
+        { detail: data.detail || 'Failed to fetch events' },
+        { status: response.status }
+      );
+    }
+  } catch (error) {
+    console.error('API route: admin events fetch error:', error);
+    return NextResponse.json(
+      { detail: 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
@@ -4,16 +4,21 @@ export async function GET(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url);
     const userEmail = searchParams.get('user_email');
+    const fields = searchParams.get('fields');
     
     const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
     console.log('API route: forwarding events fetch to backend at:', backendUrl);
     
-    // Build URL with user email if provided
-    let url = `${backendUrl}/events`;
+    // Public summary view only; the full view (registeredUsers) is served by /api/admin/events
+    const params = new URLSearchParams({ view: 'summary' });
     if (userEmail) {
-      url += `?user_email=${encodeURIComponent(userEmail)}`;
+      params.set('user_email', userEmail);
       console.log('API route: fetching events for user:', userEmail);
     }
+    if (fields) {
+      params.set('fields', fields);
+    }
+    const url = `${backendUrl}/events?${params.toString()}`;
     
     const response = await fetch(url, {
       method: 'GET',
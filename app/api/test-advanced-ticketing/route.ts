@@ -38,7 +38,7 @@ export async function GET() {
     // Test 2: Get events with advanced ticketing
     try {
       console.log('🧪 Test 2: Fetching events...');
-      const eventsResponse = await fetch(`${backendUrl}/events`);
+      const eventsResponse = await fetch(`${backendUrl}/events?fields=id,name,enableAdvancedTicketing,enableSubEvents`);
       
       if (eventsResponse.ok) {
         const events = await eventsResponse.json();
@@ -67,7 +67,7 @@ export async function GET() {
     try {
       console.log('🧪 Test 3: Testing ticket options...');
       // First get an event with advanced ticketing
-      const eventsResponse = await fetch(`${backendUrl}/events`);
+      const eventsResponse = await fetch(`${backendUrl}/events?fields=id,name,enableAdvancedTicketing,enableSubEvents`);
       const events = await eventsResponse.json();
       const advancedEvent = events.find((e: any) => 
         e.enableAdvancedTicketing || e.enableSubEvents
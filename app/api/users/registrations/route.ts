@@ -0,0 +1,48 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+export async function GET(request: NextRequest) {
+  try {
+    const { searchParams } = new URL(request.url);
+    const userId = searchParams.get('userId');
+    
+    if (!userId) {
+      return NextResponse.json(
+        { success: false, error: 'User ID is required' },
+        { status: 400 }
+      );
+    }
+
+    const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
+    
+    const params = new URLSearchParams();
+    const limit = searchParams.get('limit');
+    const cursor = searchParams.get('cursor');
+    if (limit) params.set('limit', limit);
+    if (cursor) params.set('cursor', cursor);
+    
+    const response = await fetch(`${backendUrl}/users/${encodeURIComponent(userId)}/registrations?${params.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    if (!response.ok) {
+      const errorData = await response.text();
+      console.error('Backend registrations fetch failed:', errorData);
+      return NextResponse.json(
+        { success: false, error: 'Failed to fetch registrations' },
+        { status: response.status }
+      );
+    }
+
+    const data = await response.json();
+    return NextResponse.json(data, { headers: { 'Cache-Control': 'no-store, no-cache, max-age=0, must-revalidate' } });
+  } catch (error) {
+    console.error('Error fetching user registrations:', error);
+    return NextResponse.json(
+      { success: false, error: 'Internal server error' },
+      { status: 500 }
+    );
+  }
+}
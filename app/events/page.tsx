@@ -55,9 +55,6 @@ interface Event {
   image?: string;
   refundDeadline?: string;
   remainingSeats: number;
-  registeredUsers: any[];
-  registrations?: any[];
-  registration_count?: number;
   enableAdvancedTicketing?: boolean;
   enableSubEvents?: boolean;
   ticketTiers?: TicketTier[];
@@ -65,8 +62,20 @@ interface Event {
   url?: string;
 }
 
+interface MyRegistration {
+  eventId: number;
+  finalPrice: number | null;
+}
+
+// Public (non-PII) fields requested from the summary view
+const EVENT_FIELDS = [
+  'id', 'name', 'description', 'type', 'targetYear', 'date', 'image', 'fee', 'capacity', 'remainingSeats',
+  'refundDeadline', 'url', 'isArchived', 'enableAdvancedTicketing', 'enableSubEvents', 'ticketTiers', 'subEvents'
+].join(',');
+
 export default function EventsPage() {
   const [events, setEvents] = useState<Event[]>([]);
+  const [myRegistrations, setMyRegistrations] = useState<{[eventId: number]: MyRegistration}>({});
   const [loading, setLoading] = useState(true);
   const [keyword, setKeyword] = useState('');
   const [category, setCategory] = useState<'all' | 'career' | 'social'>('all');
@@ -138,9 +147,9 @@ export default function EventsPage() {
       isFetchingRef.current = true;
       console.log('🚀 Starting fetchEvents...');
       
-      let url = '/api/events';
+      let url = `/api/events?fields=${EVENT_FIELDS}`;
       if (user?.email) {
-        url += `?user_email=${encodeURIComponent(user.email)}`;
+        url += `&user_email=${encodeURIComponent(user.email)}`;
         console.log('🌐 Fetching events with user email:', user.email);
       } else {
         console.log('🌐 Fetching events without user email');
@@ -172,6 +181,10 @@ export default function EventsPage() {
         });
         
         console.log('✅ Events data set directly from get_all_events');
+        
+        if (user?.id) {
+          await fetchMyRegistrations();
+        }
       } else {
         console.error('❌ Failed to fetch events:', response.status);
       }
@@ -184,6 +197,37 @@ export default function EventsPage() {
     }
   };
 
+  // The user's own registrations (event list no longer carries registeredUsers)
+  const fetchMyRegistrations = async () => {
+    if (!user?.id) {
+      return;
+    }
+    
+    try {
+      const registrations: {[eventId: number]: MyRegistration} = {};
+      let cursor: string | null = null;
+      do {
+        const params = new URLSearchParams({ userId: String(user.id), limit: '100' });
+        if (cursor) {
+          params.set('cursor', cursor);
+        }
+        const response = await fetch(`/api/users/registrations?${params.toString()}`);
+        if (!response.ok) {
+          console.error('❌ Failed to fetch user registrations:', response.status);
+          return;
+        }
+        const data = await response.json();
+        for (const registration of data.registrations || []) {
+          registrations[registration.eventId] = registration;
+        }
+        cursor = data.hasMore ? data.nextCursor : null;
+      } while (cursor);
+      setMyRegistrations(registrations);
+    } catch (error) {
+      console.error('💥 Error fetching user registrations:', error);
+    }
+  };
+
   const fetchUserCredits = async () => {
     if (!user?.id) {
       console.log('❌ fetchUserCredits: No user ID available');
@@ -443,8 +487,7 @@ export default function EventsPage() {
     
     if (event) {
       // Find the user's registration to get the actual paid amount (finalPrice)
-      const userRegistration = event.registeredUsers?.find((regUser: any) => regUser.id === user.id) ||
-                               event.registrations?.find((reg: any) => reg.userId === user.id);
+      const userRegistration = myRegistrations[eventId];
       
       // Use finalPrice if available, otherwise fall back to event fee
       const actualPaidAmount = userRegistration?.finalPrice ?? event.fee;
@@ -683,6 +726,7 @@ export default function EventsPage() {
             <EventCard
               event={event}
               user={user}
+              isRegistered={!!myRegistrations[event.id]}
               onRegister={handleRegister}
               onFreeRegister={handleFreeEventRegistration}
               onCancel={handleCancelRegistration}
@@ -734,6 +778,7 @@ export default function EventsPage() {
                   event={event} 
                   archived 
                   user={user}
+                  isRegistered={!!myRegistrations[event.id]}
                   onRegister={handleRegister}
                   onFreeRegister={handleFreeEventRegistration}
                   onCancel={handleCancelRegistration}
@@ -807,6 +852,7 @@ function EventCard({
   event,
   archived = false,
   user,
+  isRegistered = false,
   onRegister,
   onFreeRegister,
   onCancel,
@@ -820,6 +866,7 @@ function EventCard({
   event: Event;
   archived?: boolean;
   user: any;
+  isRegistered?: boolean;
   onRegister: (eventId: number) => void;
   onFreeRegister?: (eventId: number) => Promise<void>;
   onCancel?: (eventId: number, eventName: string) => void;
@@ -837,12 +884,7 @@ function EventCard({
   const date = new Date(event.date);
   const dateLabel = `${date.getMonth() + 1}/${date.getDate()}`;
   
-  const isUserRegistered = user && (event.registeredUsers || event.registrations || []).some(
-    (registration: any) => {
-      const registeredUser = registration.user || registration;
-      return registeredUser.id === user.id;
-    }
-  );
+  const isUserRegistered = !!user && isRegistered;
   
   // Use useState to ensure consistent rendering between server and client
   const [effectiveCapacity, setEffectiveCapacity] = useState(event.capacity);
@@ -927,7 +969,6 @@ function EventCard({
       // For debugging, let's see what the backend calculated
       const backendRegistrations = event.ticketTiers.reduce((total, tier) => total + (tier.registered_count || 0), 0);
       const backendRemaining = totalCapacity - backendRegistrations;
-      const frontendRegistrations = event.registeredUsers ? event.registeredUsers.length : 0;
       
       // Debug logging for stock calculation
       console.log('🔍 Stock calculation debug for event:', event.name, {
@@ -942,13 +983,9 @@ function EventCard({
         eventRemainingSeats: event.remainingSeats,
         backendRegistrations,
         backendRemaining,
-        frontendRegistrations,
         actualRemaining,
-        registeredUsers: event.registeredUsers?.map((u: any) => ({ id: u.id, email: u.email })) || 'No registeredUsers',
-        registeredUsersLength: event.registeredUsers?.length || 0,
         finalRemaining: actualRemaining,
-        willShowOutOfStock: actualRemaining <= 0,
-        discrepancy: frontendRegistrations !== backendRegistrations ? `FRONTEND: ${frontendRegistrations} vs BACKEND: ${backendRegistrations}` : 'MATCH'
+        willShowOutOfStock: actualRemaining <= 0
       });
       
       capacity = totalCapacity;
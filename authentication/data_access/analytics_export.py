@@ -0,0 +1,275 @@
+# authentication/data_access/analytics_export.py
+import os
+import json
+import asyncio
+import tempfile
+from decimal import Decimal
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from .base_repository import BaseRepository
+
+# Where Parquet parts and manifests live (keep it off the public /uploads mount: rows contain PII)
+ANALYTICS_EXPORT_DIR = os.getenv("ANALYTICS_EXPORT_DIR", "exports/analytics")
+# Rows per Parquet row group; also the most rows held in memory at once
+ANALYTICS_ROW_GROUP_ROWS = int(os.getenv("ANALYTICS_ROW_GROUP_ROWS", "50000"))
+# Rows newer than this are left for the next run, so transactions still in flight with an
+# earlier timestamp can't commit behind the watermark
+ANALYTICS_SAFETY_LAG_SECONDS = int(os.getenv("ANALYTICS_SAFETY_LAG_SECONDS", "60"))
+
+# Namespace for pg_try_advisory_lock so only one worker appends to a dataset at a time
+ANALYTICS_LOCK_NAMESPACE = 40
+
+# dataset → columns (name, SQL expression, Arrow type), source, and the (watermark, key) ordering.
+# Every column list starts with the watermark and key so they can be read back from the last row.
+ANALYTICS_DATASETS = {
+    "registrations": {
+        "watermark": 'er."registeredAt"',
+        "key": "er.id",
+        "columns": [
+            ("registered_at", 'er."registeredAt"', "timestamp"),
+            ("registration_id", "er.id", "int64"),
+            ("event_id", 'er."eventId"', "int64"),
+            ("event_name", "e.name", "string"),
+            ("event_date", "e.date", "timestamp"),
+            ("event_type", "e.type", "string"),
+            ("user_id", "u.id", "int64"),
+            ("user_major", "u.major", "string"),
+            ("graduation_year", 'u."graduationYear"', "int64"),
+            ("current_year", 'u."currentYear"', "string"),
+            ("university", "u.university", "string"),
+            ("tier_id", "tt.id", "int64"),
+            ("tier_name", "tt.name", "string"),
+            ("tier_price", "tt.price", "float64"),
+            ("final_price", 'er."finalPrice"', "float64"),
+            ("payment_status", 'er."paymentStatus"', "string"),
+        ],
+        "source": """
+            "EventRegistration" er
+            JOIN "Event" e ON e.id = er."eventId"
+            JOIN "User" u ON u.id = er."userId"
+            LEFT JOIN "TicketTier" tt ON tt.id = er."ticketTierId"
+        """,
+    },
+    "credit_transactions": {
+        "watermark": 'ct."createdAt"',
+        "key": "ct.id",
+        "columns": [
+            ("created_at", 'ct."createdAt"', "timestamp"),
+            ("transaction_id", "ct.id", "int64"),
+            ("user_id", 'ct."userId"', "int64"),
+            ("type", "ct.type", "string"),
+            ("amount", "ct.amount", "float64"),
+            ("description", "ct.description", "string"),
+            ("related_form_id", 'ct."relatedFormId"', "int64"),
+            ("related_event_id", 'ct."relatedEventId"', "int64"),
+        ],
+        "source": '"CreditTransaction" ct',
+    },
+    "form_responses": {
+        "watermark": 'fs."submittedAt"',
+        "key": "fr.id",
+        "columns": [
+            ("submitted_at", 'fs."submittedAt"', "timestamp"),
+            ("response_id", "fr.id", "int64"),
+            ("submission_id", "fs.id", "int64"),
+            ("form_id", 'fs."formId"', "int64"),
+            ("user_id", 'fs."userId"', "int64"),
+            ("field_id", "ff.id", "int64"),
+            ("field_type", "ff.type", "string"),
+            ("question", "ff.question", "string"),
+            ("value", "fr.value", "string"),
+        ],
+        "source": """
+            "FormResponse" fr
+            JOIN "FormSubmission" fs ON fs.id = fr."submissionId"
+            JOIN "FormField" ff ON ff.id = fr."fieldId"
+        """,
+    },
+}
+
+class AnalyticsExportUnavailable(Exception):
+    """pyarrow is not installed in this deployment"""
+    pass
+
+class AnalyticsExportBusy(Exception):
+    """Another worker is already appending to the dataset"""
+    pass
+
+def _load_pyarrow():
+    """Import pyarrow lazily so the API starts without it"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise AnalyticsExportUnavailable("pyarrow is not installed; Parquet exports are unavailable")
+    return pyarrow, pyarrow.parquet
+
+def _arrow_schema(pa, dataset: str):
+    types = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(name, types[kind]) for name, _, kind in ANALYTICS_DATASETS[dataset]["columns"]])
+
+class AnalyticsExportRepository(BaseRepository):
+    """
+    分析用の列指向エクスポート（Parquet）
+    データセットごとに (watermark, id) のキーセットで新しい行だけを読み、パートファイルとして追記する。
+    manifest.json に最後の watermark とパート一覧を保持する
+    """
+
+    def __init__(self, export_dir: str = ANALYTICS_EXPORT_DIR):
+        super().__init__()
+        self.export_dir = export_dir
+
+    def _dataset_dir(self, dataset: str) -> str:
+        if dataset not in ANALYTICS_DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset}. Available: {', '.join(ANALYTICS_DATASETS)}")
+        return os.path.join(self.export_dir, dataset)
+
+    def get_manifest(self, dataset: str) -> Dict[str, Any]:
+        """Watermark and part list for a dataset (empty manifest before the first export)"""
+        path = os.path.join(self._dataset_dir(dataset), "manifest.json")
+        if not os.path.exists(path):
+            return {"dataset": dataset, "watermark": None, "watermarkId": None, "rows": 0, "parts": []}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, dataset: str, manifest: Dict[str, Any]) -> None:
+        directory = self._dataset_dir(dataset)
+        tmp_path = os.path.join(directory, "manifest.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(directory, "manifest.json"))
+
+    def _build_query(self, dataset: str) -> str:
+        spec = ANALYTICS_DATASETS[dataset]
+        select = ",\n                ".join(f'{expression} AS "{name}"' for name, expression, _ in spec["columns"])
+        watermark, key = spec["watermark"], spec["key"]
+        return f"""
+            SELECT
+                {select}
+            FROM {spec["source"]}
+            WHERE {watermark} IS NOT NULL
+            AND ($1::timestamp IS NULL OR ({watermark}, {key}) > ($1::timestamp, $2::int))
+            AND {watermark} < LOCALTIMESTAMP - make_interval(secs => $3)
+            ORDER BY {watermark}, {key}
+        """
+
+    async def export_increment(self, dataset: str) -> Dict[str, Any]:
+        """
+        Append rows newer than the dataset's watermark as a new Parquet part.
+        Raises AnalyticsExportUnavailable without pyarrow, AnalyticsExportBusy if another worker is exporting.
+        """
+        pa, pq = _load_pyarrow()
+        directory = self._dataset_dir(dataset)
+        os.makedirs(directory, exist_ok=True)
+        schema = _arrow_schema(pa, dataset)
+        names = schema.names
+
+        lock_key = list(ANALYTICS_DATASETS).index(dataset)
+
+        async with self.get_connection() as conn:
+            # Session-level: held past the read transaction until the part and manifest are in place
+            locked = await conn.fetchval('SELECT pg_try_advisory_lock($1, $2)', ANALYTICS_LOCK_NAMESPACE, lock_key)
+            if not locked:
+                raise AnalyticsExportBusy(f"An export of {dataset} is already running")
+            try:
+                # Read under the lock so two workers can never start from the same watermark
+                manifest = self.get_manifest(dataset)
+                after = datetime.fromisoformat(manifest["watermark"]) if manifest["watermark"] else None
+                part_name = f"part-{len(manifest['parts']):05d}.parquet"
+                tmp_path = os.path.join(directory, part_name + ".tmp")
+
+                rows_written = 0
+                last_row = None
+                writer = None
+                try:
+                    async with conn.transaction(readonly=True):
+                        batch: List[Any] = []
+                        cursor = conn.cursor(
+                            self._build_query(dataset), after, manifest["watermarkId"], ANALYTICS_SAFETY_LAG_SECONDS,
+                            prefetch=min(ANALYTICS_ROW_GROUP_ROWS, 5000)
+                        )
+                        async for record in cursor:
+                            batch.append(record)
+                            if len(batch) >= ANALYTICS_ROW_GROUP_ROWS:
+                                writer = await self._write_row_group(pa, pq, writer, tmp_path, schema, names, batch)
+                                rows_written += len(batch)
+                                last_row = batch[-1]
+                                batch = []
+                        if batch:
+                            writer = await self._write_row_group(pa, pq, writer, tmp_path, schema, names, batch)
+                            rows_written += len(batch)
+                            last_row = batch[-1]
+                    if writer is not None:
+                        await asyncio.to_thread(writer.close)
+                except Exception as e:
+                    if writer is not None:
+                        writer.close()
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    print(f"❌ Error exporting analytics dataset {dataset}: {e}")
+                    raise e
+
+                if writer is None:
+                    print(f"✅ Analytics dataset {dataset} already up to date")
+                    return {**manifest, "rowsAppended": 0}
+
+                os.replace(tmp_path, os.path.join(directory, part_name))
+
+                manifest["watermark"] = last_row[0].isoformat()
+                manifest["watermarkId"] = last_row[1]
+                manifest["rows"] += rows_written
+                manifest["parts"].append({
+                    "file": part_name,
+                    "rows": rows_written,
+                    "createdAt": datetime.now().isoformat()
+                })
+                self._write_manifest(dataset, manifest)
+            finally:
+                await conn.execute('SELECT pg_advisory_unlock($1, $2)', ANALYTICS_LOCK_NAMESPACE, lock_key)
+
+        print(f"✅ Appended {rows_written} rows to analytics dataset {dataset} ({part_name})")
+        return {**manifest, "rowsAppended": rows_written}
+
+    async def _write_row_group(self, pa, pq, writer, path: str, schema, names: List[str], batch: List[Any]):
+        """Convert a batch of records to one row group (file I/O runs off the event loop)"""
+        columns = {
+            name: [
+                float(value) if isinstance(value, Decimal) else value
+                for value in (record[index] for record in batch)
+            ]
+            for index, name in enumerate(names)
+        }
+        table = pa.Table.from_pydict(columns, schema=schema)
+        if writer is None:
+            writer = pq.ParquetWriter(path, schema, compression="zstd")
+        await asyncio.to_thread(writer.write_table, table)
+        return writer
+
+    async def build_snapshot(self, dataset: str) -> Optional[str]:
+        """
+        Combine every part into one downloadable Parquet file (row groups are copied part by part).
+        Returns the temporary file path, or None when nothing has been exported yet. Caller deletes it.
+        """
+        pa, pq = _load_pyarrow()
+        manifest = self.get_manifest(dataset)
+        if not manifest["parts"]:
+            return None
+        directory = self._dataset_dir(dataset)
+        schema = _arrow_schema(pa, dataset)
+
+        def combine() -> str:
+            handle, path = tempfile.mkstemp(prefix=f"{dataset}-", suffix=".parquet")
+            os.close(handle)
+            with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+                for part in manifest["parts"]:
+                    part_file = pq.ParquetFile(os.path.join(directory, part["file"]))
+                    for index in range(part_file.num_row_groups):
+                        writer.write_table(part_file.read_row_group(index))
+            return path
+
+        return await asyncio.to_thread(combine)
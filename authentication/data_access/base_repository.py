@@ -3,6 +3,8 @@ import logging
 from contextlib import asynccontextmanager
 from typing import Optional
 from .database_pool import get_pool_manager, get_global_connection
+from .invalidation_bus import get_invalidation_bus, INVALIDATION_CHANNEL
+from .capacity_broadcaster import get_capacity_broadcaster
 
 logger = logging.getLogger(__name__)
 
@@ -109,6 +111,29 @@ class BaseRepository:
         else:
             logger.info(f"✅ {self._repository_name}: Column {column_name} already exists in {table_name}")
     
+    async def publish_invalidation(self, entity: str, entity_id=None, conn=None):
+        """
+        他ワーカーにキャッシュ無効化を通知（NOTIFY）
+        conn を渡すとそのトランザクションのコミット時に配信される。失敗してもTTLで回復するため例外は出さない
+        """
+        payload = get_invalidation_bus().build_payload(entity, entity_id)
+        try:
+            if conn is not None:
+                await conn.execute('SELECT pg_notify($1, $2)', INVALIDATION_CHANNEL, payload)
+            else:
+                async with self.get_connection() as notify_conn:
+                    await notify_conn.execute('SELECT pg_notify($1, $2)', INVALIDATION_CHANNEL, payload)
+        except Exception as e:
+            logger.warning(f"⚠️ {self._repository_name}: Failed to publish invalidation for {entity} {entity_id}: {e}")
+    
+    async def publish_capacity_change(self, event_id: int, conn=None):
+        """
+        残席数の変化を通知（予約枠の作成・解放など、キャッシュ無効化を伴わない書き込み用）
+        このワーカーの購読者へ直接、他ワーカーへは NOTIFY で届ける
+        """
+        get_capacity_broadcaster().notify(event_id)
+        await self.publish_invalidation("capacity", event_id, conn)
+    
     async def get_pool_status(self) -> dict:
         """プールの状態を取得"""
         return await self._pool_manager.get_pool_status()
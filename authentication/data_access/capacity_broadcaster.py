@@ -0,0 +1,111 @@
+# authentication/data_access/capacity_broadcaster.py
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+from .invalidation_bus import get_invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+# At most one push per event per window, however many registrations land inside it
+CAPACITY_COALESCE_SECONDS = float(os.getenv("CAPACITY_COALESCE_SECONDS", "0.5"))
+
+class CapacityBroadcaster:
+    """
+    残席数のプッシュ配信（SSE購読者向け）
+    登録・予約・キャンセルの書き込みで notify() され、同じイベントへの通知はウィンドウ内で1回にまとめる。
+    他ワーカーの書き込みは無効化バス経由で届く
+    """
+
+    def __init__(self, coalesce_seconds: float = CAPACITY_COALESCE_SECONDS):
+        self.coalesce_seconds = coalesce_seconds
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._pending: Dict[int, asyncio.Task] = {}
+        self._last_sent: Dict[int, Dict[str, Any]] = {}
+        self._notifications = 0
+        self._pushes = 0
+
+    def subscribe(self, event_id: int) -> asyncio.Queue:
+        """Queue that always holds only the newest snapshot for an event"""
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(event_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, event_id: int, queue: asyncio.Queue) -> None:
+        """Remove a subscriber (called when the stream closes)"""
+        queues = self._subscribers.get(event_id)
+        if not queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[event_id]
+            self._last_sent.pop(event_id, None)
+
+    def notify(self, event_id: Optional[int]) -> None:
+        """Mark an event's capacity as changed (None = every watched event)"""
+        self._notifications += 1
+        event_ids = list(self._subscribers) if event_id is None else [event_id]
+        for watched_id in event_ids:
+            if watched_id not in self._subscribers or watched_id in self._pending:
+                continue
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._pending[watched_id] = loop.create_task(self._flush(watched_id))
+
+    async def _flush(self, event_id: int) -> None:
+        """Wait out the coalescing window, then push one fresh snapshot"""
+        try:
+            await asyncio.sleep(self.coalesce_seconds)
+        finally:
+            # Changes arriving while the snapshot loads schedule the next push
+            self._pending.pop(event_id, None)
+
+        if event_id not in self._subscribers:
+            return
+        try:
+            snapshot = await load_capacity_snapshot(event_id)
+        except Exception as e:
+            logger.error(f"❌ Failed to load capacity snapshot for event {event_id}: {e}")
+            return
+        if snapshot is None or snapshot == self._last_sent.get(event_id):
+            return
+
+        self._last_sent[event_id] = snapshot
+        self._pushes += 1
+        for queue in list(self._subscribers.get(event_id, ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+
+    def get_stats(self) -> dict:
+        """配信の統計を取得"""
+        return {
+            "watchedEvents": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "notifications": self._notifications,
+            "pushes": self._pushes,
+            "coalesceSeconds": self.coalesce_seconds
+        }
+
+async def load_capacity_snapshot(event_id: int) -> Optional[Dict[str, Any]]:
+    """Current seats for an event, its tiers and sub-events"""
+    # Imported here: the event repository itself notifies this module on writes
+    from .event_repository import EventRepository
+    return await EventRepository().get_capacity_snapshot(event_id)
+
+# グローバルインスタンス
+_capacity_broadcaster = None
+
+def get_capacity_broadcaster() -> CapacityBroadcaster:
+    """グローバル残席ブロードキャスターを取得"""
+    global _capacity_broadcaster
+    if _capacity_broadcaster is None:
+        _capacity_broadcaster = CapacityBroadcaster()
+        # Registrations go through the event entity, reservation holds through "capacity"
+        bus = get_invalidation_bus()
+        bus.subscribe("event", _capacity_broadcaster.notify)
+        bus.subscribe("capacity", _capacity_broadcaster.notify)
+        bus.on_flush(lambda: _capacity_broadcaster.notify(None))
+    return _capacity_broadcaster
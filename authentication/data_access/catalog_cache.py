@@ -0,0 +1,145 @@
+# authentication/data_access/catalog_cache.py
+import os
+import copy
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+from .invalidation_bus import get_invalidation_bus
+
+# Scope used for entries that depend on every event (e.g. the public events list)
+CATALOG_SCOPE = "catalog"
+
+class CacheMiss:
+    """キャッシュミスを表す番兵（None もキャッシュ対象のため）"""
+    pass
+
+MISS = CacheMiss()
+
+class VersionedCache:
+    """
+    バージョン付きインメモリキャッシュ
+    無効化はスコープのバージョンを上げるだけ（O(1)）。読み込み開始前に取得したバージョンで
+    保存するため、読み込み中に無効化された値が後から書き込まれても配信されない
+    """
+
+    def __init__(self, name: str, ttl_seconds: Optional[float] = None, max_entries: int = 5000):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[Hashable, Tuple[int, int], Optional[float], Any]] = {}
+        self._versions: Dict[Hashable, int] = {}
+        self._epoch = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def version_of(self, scope: Hashable) -> Tuple[int, int]:
+        """Current version of a scope; capture this *before* loading the value"""
+        return (self._epoch, self._versions.get(scope, 0))
+
+    def get(self, key: Hashable) -> Any:
+        """Return a private copy of the cached value, or MISS"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            scope, version, expires_at, value = entry
+            fresh = version == self.version_of(scope) and (expires_at is None or expires_at > time.monotonic())
+            if fresh:
+                self._hits += 1
+                return copy.deepcopy(value)
+            del self._entries[key]
+        self._misses += 1
+        return MISS
+
+    def put(self, key: Hashable, value: Any, scope: Hashable, version: Tuple[int, int], ttl_seconds: Optional[float] = None) -> None:
+        """Store a value loaded while the scope was at `version` (dropped if already stale)"""
+        if version != self.version_of(scope):
+            return
+        if len(self._entries) >= self.max_entries:
+            # Entries are small and rebuilt cheaply on demand; a full reset keeps memory bounded
+            self._entries.clear()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (scope, version, expires_at, copy.deepcopy(value))
+
+    def invalidate(self, scope: Hashable) -> None:
+        """Invalidate every entry stored under a scope"""
+        self._versions[scope] = self._versions.get(scope, 0) + 1
+        self._invalidations += 1
+
+    def clear(self) -> None:
+        """Drop all entries (used when invalidations may have been missed)"""
+        self._epoch += 1
+        self._entries.clear()
+        self._invalidations += 1
+
+    def get_stats(self) -> dict:
+        """ヒット率などの統計を取得"""
+        lookups = self._hits + self._misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hitRatio": round(self._hits / lookups, 4) if lookups else None,
+            "invalidations": self._invalidations,
+            "ttlSeconds": self.ttl_seconds
+        }
+
+class EventCatalogCache:
+    """
+    イベントカタログ用キャッシュ
+    - catalog: イベント一覧・詳細・チケット情報（書き込み時にイベント単位で無効化）
+    - seats: 残席数など変動の激しい値（短いTTL）
+    - responses: シリアライズ済みレスポンス（チケット選択肢など、受講年度・大学のコホート単位）
+    """
+
+    def __init__(self):
+        catalog_ttl = float(os.getenv("EVENT_CACHE_TTL_SECONDS", "300"))
+        seat_ttl = float(os.getenv("SEAT_CACHE_TTL_SECONDS", "2"))
+        self.catalog = VersionedCache("event_catalog", ttl_seconds=catalog_ttl)
+        self.seats = VersionedCache("event_seats", ttl_seconds=seat_ttl)
+        self.responses = VersionedCache("event_responses", ttl_seconds=catalog_ttl)
+
+    def invalidate_event(self, event_id: Optional[int]) -> None:
+        """Invalidate one event's entries plus anything listing all events"""
+        if event_id is not None:
+            self.catalog.invalidate(event_id)
+            self.seats.invalidate(event_id)
+            self.responses.invalidate(event_id)
+        self.catalog.invalidate(CATALOG_SCOPE)
+        self.seats.invalidate(CATALOG_SCOPE)
+        self.responses.invalidate(CATALOG_SCOPE)
+
+    def invalidate_all(self) -> None:
+        """Invalidate everything"""
+        self.catalog.clear()
+        self.seats.clear()
+        self.responses.clear()
+
+    def get_stats(self) -> dict:
+        """キャッシュ統計を取得"""
+        return {
+            "catalog": self.catalog.get_stats(),
+            "seats": self.seats.get_stats(),
+            "responses": self.responses.get_stats()
+        }
+
+# グローバルインスタンス
+_event_cache = None
+
+def get_event_cache() -> EventCatalogCache:
+    """グローバルイベントキャッシュを取得"""
+    global _event_cache
+    if _event_cache is None:
+        _event_cache = EventCatalogCache()
+        # Writes on other workers arrive over the invalidation bus
+        bus = get_invalidation_bus()
+        bus.subscribe("event", _on_event_invalidated)
+        bus.on_flush(_event_cache.invalidate_all)
+    return _event_cache
+
+def _on_event_invalidated(event_id: Optional[int]) -> None:
+    """Bus handler for event writes made by another worker"""
+    if event_id is None:
+        _event_cache.invalidate_all()
+    else:
+        _event_cache.invalidate_event(event_id)
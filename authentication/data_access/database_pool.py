@@ -1,5 +1,6 @@
 # authentication/data_access/database_pool.py
 import os
+import asyncio
 import asyncpg
 import boto3
 import json
@@ -11,6 +12,10 @@ from contextlib import asynccontextmanager
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# LISTEN接続の死活確認間隔と再接続バックオフの上限（秒）
+LISTEN_HEALTHCHECK_SECONDS = float(os.getenv("DB_LISTEN_HEALTHCHECK_SECONDS", "10"))
+LISTEN_MAX_BACKOFF_SECONDS = 30
+
 class DatabasePoolManager:
     """
     グローバル接続プールマネージャー
@@ -31,6 +36,12 @@ class DatabasePoolManager:
         # シングルトンのため、初期化は一度だけ
         if not self._is_initialized:
             self._is_initialized = True
+            # 専用LISTEN接続（プール外で保持し、切断時は自動再接続）
+            self._listen_connection = None
+            self._listen_task = None
+            self._listen_channels = {}
+            self._listen_reconnect_handlers = []
+            self._listen_connects = 0
     
     @classmethod
     def get_instance(cls):
@@ -201,6 +212,77 @@ class DatabasePoolManager:
             self._pool = None
             logger.info("🔌 Global connection pool closed")
     
+    async def start_listener(self, channel: str, callback, on_reconnect=None) -> None:
+        """
+        専用接続でチャンネルをLISTENする
+        on_reconnect は（再）接続のたびに呼ばれる。切断中の通知は届かないため、
+        呼び出し側はここでキャッシュを全て破棄する
+        """
+        self._listen_channels[channel] = callback
+        if on_reconnect and on_reconnect not in self._listen_reconnect_handlers:
+            self._listen_reconnect_handlers.append(on_reconnect)
+        
+        if self._listen_task is None or self._listen_task.done():
+            self._listen_task = asyncio.create_task(self._listen_loop())
+        elif self._listen_connection is not None and not self._listen_connection.is_closed():
+            await self._listen_connection.add_listener(channel, callback)
+    
+    async def _listen_loop(self) -> None:
+        """LISTEN接続を維持（切断を検知したらバックオフ付きで再接続・再購読）"""
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(
+                    self._get_database_url(),
+                    server_settings={'application_name': 'utjn_backend_listener'}
+                )
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: lost.set())
+                for channel, callback in list(self._listen_channels.items()):
+                    await conn.add_listener(channel, callback)
+                
+                self._listen_connection = conn
+                self._listen_connects += 1
+                backoff = 1
+                logger.info(f"👂 Listening on {', '.join(self._listen_channels)} (connect #{self._listen_connects})")
+                
+                for handler in self._listen_reconnect_handlers:
+                    try:
+                        handler()
+                    except Exception as e:
+                        logger.error(f"❌ Listener reconnect handler failed: {e}")
+                
+                # Termination is reported immediately; silent drops are caught by the health check
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=LISTEN_HEALTHCHECK_SECONDS)
+                    except asyncio.TimeoutError:
+                        await conn.fetchval('SELECT 1')
+                logger.warning("⚠️ LISTEN connection terminated")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ LISTEN connection failed: {e}")
+            finally:
+                self._listen_connection = None
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+            
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, LISTEN_MAX_BACKOFF_SECONDS)
+    
+    async def stop_listener(self) -> None:
+        """LISTEN接続を停止"""
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+            logger.info("🔌 LISTEN connection closed")
+    
     async def get_pool_status(self) -> dict:
         """プールの状態を取得"""
         if not self._pool:
@@ -211,7 +293,12 @@ class DatabasePoolManager:
             "min_size": self._pool.get_min_size(),
             "max_size": self._pool.get_max_size(),
             "size": self._pool.get_size(),
-            "free_size": self._pool.get_free_size()
+            "free_size": self._pool.get_free_size(),
+            "listener": {
+                "connected": self._listen_connection is not None,
+                "channels": list(self._listen_channels),
+                "connects": self._listen_connects
+            }
         }
 
 # グローバルインスタンス
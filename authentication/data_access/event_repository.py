@@ -3,14 +3,145 @@ import os
 import sys
 import asyncpg
 import boto3
+import re
 import json
+import base64
 from typing import Optional, Dict, Any, List
-from datetime import datetime
+from datetime import datetime, timedelta
 from .base_repository import BaseRepository
+from .waitlist_repository import WaitlistRepository
+from .catalog_cache import get_event_cache, MISS, CATALOG_SCOPE
+from .capacity_broadcaster import get_capacity_broadcaster
+from .export_stream import select_list
+
+# Event list projections: "summary" is the public shape (no registration rows, so the payload
+# doesn't grow with sign-ups and carries no PII); "full" is the admin shape with registeredUsers
+EVENT_VIEWS = ("summary", "full")
+EVENT_SUMMARY_FIELDS = ("id", "name", "date", "image", "fee", "remainingSeats", "ticketTiers")
+# Non-PII event columns a summary request may also select with fields= (same row, no extra join)
+EVENT_PUBLIC_FIELDS = EVENT_SUMMARY_FIELDS + (
+    "description", "type", "targetYear", "capacity", "refundDeadline", "url", "isArchived", "isUofTOnly",
+    "enableAdvancedTicketing", "enableSubEvents", "subEvents"
+)
+TICKET_TIER_SUMMARY_FIELDS = ("id", "name", "price", "capacity", "registered_count", "remaining_capacity",
+                              "targetYear", "isAvailable", "availabilityReason", "nextTransitionAt")
+
+ALL_YEARS = "All years"
+UOFT_UNIVERSITY = "University of Toronto"
+# Keyset pagination for GET /events
+EVENT_PAGE_DEFAULT_LIMIT = 20
+EVENT_PAGE_MAX_LIMIT = 100
+EVENT_TIME_FILTERS = ("upcoming", "past", "all")
+# Registration export columns (name → SQL expression); the default matches the original CSV export
+REGISTRATION_EXPORT_COLUMNS = {
+    "registration_id": "er.id",
+    "registered_at": 'er."registeredAt"',
+    "payment_status": 'er."paymentStatus"',
+    "payment_id": 'er."paymentId"',
+    "final_price": 'er."finalPrice"',
+    "payment_email": 'er."paymentEmail"',
+    "user_id": "u.id",
+    "first_name": 'u."firstName"',
+    "last_name": 'u."lastName"',
+    "user_email": "u.email",
+    "user_major": "u.major",
+    "graduation_year": 'u."graduationYear"',
+    "current_year": 'u."currentYear"',
+    "university": "u.university",
+    "tier_name": "tt.name",
+    "sub_event_name": "se.name",
+}
+DEFAULT_REGISTRATION_EXPORT_COLUMNS = (
+    "first_name", "last_name", "user_email", "user_major", "graduation_year", "current_year", "university"
+)
+
+# Upper bound on IDs per list for POST /events/capacity:batch
+CAPACITY_BATCH_MAX_IDS = 500
+
+# Full-text search document. Kept as an indexed expression rather than a stored column so the many
+# `SELECT *` event reads don't start returning a tsvector. 'simple' config: names mix Japanese and
+# English, so no language-specific stemming; prefix matching covers partial words.
+EVENT_SEARCH_VECTOR_TEMPLATE = (
+    "(setweight(to_tsvector('simple', COALESCE({p}name, '')), 'A') || "
+    "setweight(to_tsvector('simple', COALESCE({p}type, '')), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE({p}description, '')), 'C'))"
+)
+EVENT_SEARCH_VECTOR = EVENT_SEARCH_VECTOR_TEMPLATE.format(p="e.")
+
+# "1st year, 2nd year" → {"1st year","2nd year"}. Stored generated column, so Postgres keeps it in
+# sync with targetYear on every write and eligibility can use a GIN index instead of string splitting
+TARGET_YEARS_EXPRESSION = (
+    "string_to_array(btrim(regexp_replace(COALESCE(\"targetYear\", 'All years'), "
+    "'[[:space:]]*,[[:space:]]*', ',', 'g')), ',')"
+)
+
+# Ticket-tier progression, evaluated for a batch of events in one statement. Rules per tier:
+#   - date window: startDate <= now <= endDate (either bound optional)
+#   - unlockAfterTier: opens as soon as the named tier of the same event sells out, regardless of dates
+#   - capacity: a tier with no seats left is never available
+# nextTransitionAt is the next moment the result can change by time alone; caches expire then.
+# db_now is the LOCALTIMESTAMP those comparisons used, so TTLs are measured on the database clock.
+# Helper columns (in_window, unlocked, unlocked_by, is_eligible, db_now) are popped by the caller.
+TIER_AVAILABILITY_QUERY = """
+WITH tiers AS (
+    SELECT
+        tt.*,
+        COUNT(er.id) AS registered_count,
+        (tt.capacity - COUNT(er.id)) AS remaining_capacity
+    FROM "TicketTier" tt
+    LEFT JOIN "EventRegistration" er ON tt.id = er."ticketTierId"
+    WHERE tt."eventId" = ANY($1::int[]) AND tt."isActive" = TRUE
+    GROUP BY tt.id
+), evaluated AS (
+    SELECT
+        t.*,
+        ((t."startDate" IS NULL OR t."startDate" <= LOCALTIMESTAMP)
+            AND (t."endDate" IS NULL OR t."endDate" >= LOCALTIMESTAMP)) AS in_window,
+        COALESCE(u.remaining_capacity <= 0, FALSE) AS unlocked,
+        u.name AS unlocked_by
+    FROM tiers t
+    LEFT JOIN LATERAL (
+        SELECT p.name, p.remaining_capacity
+        FROM tiers p
+        WHERE p."eventId" = t."eventId" AND p.id <> t.id
+        AND lower(p.name) = lower(t."unlockAfterTier")
+        LIMIT 1
+    ) u ON TRUE
+)
+SELECT
+    evaluated.*,
+    ((unlocked OR in_window) AND remaining_capacity > 0) AS "isAvailable",
+    CASE
+        WHEN remaining_capacity <= 0 THEN 'Sold out'
+        WHEN unlocked THEN unlocked_by || ' sold out - ' || name || ' now available'
+        WHEN "startDate" IS NOT NULL AND "startDate" > LOCALTIMESTAMP THEN 'Not yet available'
+        WHEN "endDate" IS NOT NULL AND "endDate" < LOCALTIMESTAMP THEN 'Registration period ended'
+        ELSE ''
+    END AS "availabilityReason",
+    LEAST(
+        CASE WHEN "startDate" > LOCALTIMESTAMP THEN "startDate" END,
+        CASE WHEN "endDate" > LOCALTIMESTAMP THEN "endDate" END
+    ) AS "nextTransitionAt",
+    ($2::text IS NULL OR "targetYears" && ARRAY['All years', $2::text]) AS is_eligible,
+    LOCALTIMESTAMP AS db_now
+FROM evaluated
+ORDER BY "eventId", "sortOrder", price, id
+"""
+TIER_HELPER_COLUMNS = ("in_window", "unlocked", "unlocked_by", "is_eligible", "db_now")
+
+# Database clock (LOCALTIMESTAMP) minus this process's clock, refreshed by every tier query
+_db_clock_offset = timedelta(0)
+
+def _sync_db_clock(rows) -> None:
+    """Record how far the database clock is from ours, using a tier row's db_now"""
+    global _db_clock_offset
+    if rows:
+        _db_clock_offset = rows[0]['db_now'] - datetime.now()
 
 class EventRepository(BaseRepository):
     def __init__(self):
         super().__init__()
+        self._cache = get_event_cache()
     
     def list_available_secrets(self):
         """List all available secrets in AWS Secrets Manager"""
@@ -416,27 +547,435 @@ class EventRepository(BaseRepository):
                     print("✅ EventReservation table created")
                 else:
                     print("✅ EventReservation table already exists")
+            
+                # Normalized target years for SQL-side eligibility filtering
+                for table_name in ("Event", "TicketTier"):
+                    target_years_exists = await conn.fetchval("""
+                        SELECT EXISTS (
+                            SELECT FROM information_schema.columns 
+                            WHERE table_schema = 'public' 
+                            AND table_name = $1
+                            AND column_name = 'targetYears'
+                        );
+                    """, table_name)
+                    
+                    if not target_years_exists:
+                        print(f"🆕 Adding targetYears column to {table_name} table...")
+                        await conn.execute(f"""
+                            ALTER TABLE "{table_name}"
+                            ADD COLUMN "targetYears" TEXT[] GENERATED ALWAYS AS ({TARGET_YEARS_EXPRESSION}) STORED;
+                        """)
+                        print(f"✅ targetYears column added to {table_name} table")
+                    
+                    await conn.execute(f"""
+                        CREATE INDEX IF NOT EXISTS "idx_{table_name}_targetYears"
+                        ON "{table_name}" USING GIN ("targetYears");
+                    """)
+            
+                # Explicit tier ordering and progression rules
+                sort_order_exists = await conn.fetchval("""
+                    SELECT EXISTS (
+                        SELECT FROM information_schema.columns 
+                        WHERE table_schema = 'public' 
+                        AND table_name = 'TicketTier' 
+                        AND column_name = 'sortOrder'
+                    );
+                """)
+                
+                if not sort_order_exists:
+                    print("🆕 Adding sortOrder / unlockAfterTier columns to TicketTier table...")
+                    await conn.execute("""
+                        ALTER TABLE "TicketTier"
+                        ADD COLUMN "sortOrder" INTEGER DEFAULT 0,
+                        ADD COLUMN "unlockAfterTier" TEXT;
+                    """)
+                    # Backfill: keep the old price ordering and the hardcoded Early Bird → Regular rule
+                    await conn.execute("""
+                        UPDATE "TicketTier" tt
+                        SET "sortOrder" = ranked.position
+                        FROM (
+                            SELECT id, ROW_NUMBER() OVER (PARTITION BY "eventId" ORDER BY price, id) - 1 AS position
+                            FROM "TicketTier"
+                        ) ranked
+                        WHERE tt.id = ranked.id;
+                    """)
+                    await conn.execute("""
+                        UPDATE "TicketTier" regular
+                        SET "unlockAfterTier" = early.name
+                        FROM "TicketTier" early
+                        WHERE early."eventId" = regular."eventId"
+                        AND lower(early.name) = 'early bird'
+                        AND lower(regular.name) = 'regular';
+                    """)
+                    print("✅ sortOrder / unlockAfterTier columns added to TicketTier table")
+                
+                # Keyset pagination index for the events listing
+                await conn.execute('CREATE INDEX IF NOT EXISTS "idx_Event_date_id" ON "Event"(date, id);')
+                
+                # Catalog fingerprint: latest event edit, and the next tier boundaries
+                await conn.execute('CREATE INDEX IF NOT EXISTS "idx_Event_updatedAt" ON "Event"("updatedAt");')
+                await conn.execute('CREATE INDEX IF NOT EXISTS "idx_TicketTier_startDate" ON "TicketTier"("startDate");')
+                await conn.execute('CREATE INDEX IF NOT EXISTS "idx_TicketTier_endDate" ON "TicketTier"("endDate");')
+                
+                # Advanced after every committed inventory write (events, tiers, sub-events, registrations).
+                # A sequence takes no row locks, so writers for different events never wait on each other
+                await conn.execute('CREATE SEQUENCE IF NOT EXISTS "InventoryVersionSeq";')
+                
+                # Keyset pagination index for a user's registrations (profile page)
+                await conn.execute("""
+                    CREATE INDEX IF NOT EXISTS "idx_EventRegistration_user_registeredAt"
+                    ON "EventRegistration"("userId", "registeredAt" DESC, id DESC);
+                """)
+                
+                # Full-text search index (same expression the search query uses)
+                search_vector = EVENT_SEARCH_VECTOR_TEMPLATE.format(p="")
+                await conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_Event_search" ON "Event" USING GIN ({search_vector});')
+            
+            # Waitlist depends on Event/User/EventReservation, so it is ensured last
+            await WaitlistRepository().ensure_tables_exist()
                     
         except Exception as e:
             print(f"❌ Error ensuring tables exist: {e}")
             raise e
     
-    async def get_all_events(self) -> List[Dict[str, Any]]:
-        """Get all events with registration counts and registered users"""
+    async def _invalidate_event(self, event_id: Optional[int]) -> None:
+        """After a committed write: evict an event here and tell the other workers to do the same"""
+        await self._publish_event_change(event_id)
+        await self._evict_event(event_id)
+    
+    async def _publish_event_change(self, event_id: Optional[int], conn=None) -> None:
+        """Tell the other workers an event changed; with conn, delivered when its transaction commits"""
+        await self.publish_invalidation("event", event_id, conn)
+    
+    async def _evict_event(self, event_id: Optional[int]) -> None:
+        """
+        Advance the catalog version, evict an event from this worker's cache and wake its capacity
+        subscribers. Call it only after the write has committed: the bus skips our own notifications,
+        so nothing evicts again later, and a read between an early eviction and the commit would
+        re-cache old rows (or tag them with the new version).
+        """
+        await self._bump_inventory_version()
+        self._cache.invalidate_event(event_id)
+        get_capacity_broadcaster().notify(event_id)
+    
+    async def _bump_inventory_version(self) -> None:
+        """Advance the catalog fingerprint's version (nextval takes no lock; a failure keeps the old ETag until the next write)"""
         try:
+            async with self.get_connection() as conn:
+                await conn.execute("""SELECT nextval('"InventoryVersionSeq"')""")
+        except Exception as e:
+            print(f"⚠️ Failed to bump inventory version: {e}")
+    
+    async def get_catalog_fingerprint(self, user_email: str = None) -> Optional[tuple]:
+        """
+        Cheap change marker for the events list, used as the ETag source (index lookups only).
+        The inventory version advances after every committed event, tier, sub-event and
+        registration write (including deletes, which no MAX() can see); the next
+        upcoming event date and tier start/end change as those boundaries pass, so availability
+        flips change the tag even without a write.
+        """
+        try:
+            async with self.get_connection() as conn:
+                row = await conn.fetchrow("""
+                    SELECT
+                        (SELECT last_value FROM "InventoryVersionSeq") AS "inventoryVersion",
+                        (SELECT MAX("updatedAt") FROM "Event") AS "eventsUpdatedAt",
+                        (SELECT MIN(date) FROM "Event" WHERE date >= LOCALTIMESTAMP) AS "nextEventDate",
+                        (SELECT MIN("startDate") FROM "TicketTier" WHERE "startDate" > LOCALTIMESTAMP) AS "nextTierStart",
+                        (SELECT MIN("endDate") FROM "TicketTier" WHERE "endDate" >= LOCALTIMESTAMP) AS "nextTierEnd",
+                        (SELECT ROW("currentYear", university)::text FROM "User" WHERE email = $1) AS "userCohort"
+                """, user_email)
+                return tuple(row)
+        except Exception as e:
+            print(f"❌ Error getting catalog fingerprint: {e}")
+            return None
+    
+    async def get_event_fingerprint(self, event_id: int, user_email: str = None) -> Optional[tuple]:
+        """Cheap change marker for one event's detail / ticket options (None if the event doesn't exist)"""
+        try:
+            async with self.get_connection() as conn:
+                row = await conn.fetchrow("""
+                    SELECT
+                        e."updatedAt",
+                        (SELECT COUNT(*) FROM "EventRegistration" WHERE "eventId" = e.id) AS registrations,
+                        (SELECT MAX(id) FROM "EventRegistration" WHERE "eventId" = e.id) AS "lastRegistrationId",
+                        (SELECT COUNT(*) FROM "TicketTier" WHERE "eventId" = e.id) AS tiers,
+                        (SELECT MAX(id) FROM "TicketTier" WHERE "eventId" = e.id) AS "lastTierId",
+                        (SELECT COUNT(*) FROM "TicketTier" WHERE "eventId" = e.id AND "startDate" <= LOCALTIMESTAMP) AS "startedTiers",
+                        (SELECT COUNT(*) FROM "TicketTier" WHERE "eventId" = e.id AND "endDate" < LOCALTIMESTAMP) AS "endedTiers",
+                        (SELECT MAX(id) FROM "SubEvent" WHERE "eventId" = e.id) AS "lastSubEventId",
+                        (SELECT ROW("currentYear", university)::text FROM "User" WHERE email = $2) AS "userCohort"
+                    FROM "Event" e
+                    WHERE e.id = $1
+                """, event_id, user_email)
+                return tuple(row) if row else None
+        except Exception as e:
+            print(f"❌ Error getting event fingerprint: {e}")
+            return None
+    
+    def _eligibility_clause(self, cohort: Optional[tuple], first_param: int = 1) -> tuple:
+        """
+        SQL predicate (on alias e) for events a student can see, plus its parameters.
+        cohort is (university, currentYear); None means no filtering.
+        The clause is only emitted when needed so the planner can use the targetYears GIN index.
+        """
+        if cohort is None:
+            return "TRUE", []
+        
+        university, current_year = cohort
+        clauses = [f'(NOT COALESCE(e."isUofTOnly", FALSE) OR ${first_param}::text = \'{UOFT_UNIVERSITY}\')']
+        params = [university]
+        if current_year:
+            clauses.append(f'e."targetYears" && ARRAY[\'{ALL_YEARS}\', ${first_param + 1}::text]')
+            params.append(current_year)
+        return " AND ".join(clauses), params
+    
+    async def get_all_events(self, use_cache: bool = True, view: str = "full",
+                             cohort: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """
+        Get all events in the requested projection (cached per projection and cohort).
+        cohort = (university, currentYear) restricts the list to events that student is eligible for.
+        """
+        cache = self._cache.catalog
+        key = ("events", view, cohort)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not MISS:
+                return cached
+        
+        version = cache.version_of(CATALOG_SCOPE)
+        where, params = self._eligibility_clause(cohort)
+        if view == "summary":
+            events = await self._fetch_event_summaries(where, params)
+        else:
+            events = await self._fetch_all_events(use_cache, where, params)
+        tiers = [tier for event in events for tier in event.get('ticketTiers') or []]
+        cache.put(key, events, CATALOG_SCOPE, version, ttl_seconds=self.transition_ttl(cache, tiers))
+        return events
+    
+    async def get_events_page(self, view: str = "full", cohort: Optional[tuple] = None,
+                              when: str = "all", event_type: str = None, archived: Optional[bool] = None,
+                              search: str = None, cursor: str = None,
+                              limit: int = EVENT_PAGE_DEFAULT_LIMIT) -> Dict[str, Any]:
+        """
+        One page of events ordered by (date, id), ascending (descending for when="past").
+        Keyset pagination: the cursor carries the last (date, id), so every page is an index
+        range scan of at most `limit` + 1 rows however many archived events exist.
+        """
+        if when not in EVENT_TIME_FILTERS:
+            raise ValueError(f"when must be one of: {', '.join(EVENT_TIME_FILTERS)}")
+        limit = max(1, min(int(limit), EVENT_PAGE_MAX_LIMIT))
+        descending = when == "past"
+        
+        where, params = self._eligibility_clause(cohort)
+        clauses = [where]
+        
+        def bind(value) -> str:
+            params.append(value)
+            return f"${len(params)}"
+        
+        if when == "upcoming":
+            clauses.append("e.date >= LOCALTIMESTAMP")
+        elif when == "past":
+            clauses.append("e.date < LOCALTIMESTAMP")
+        if event_type:
+            clauses.append(f"e.type = {bind(event_type)}")
+        if archived is not None:
+            clauses.append(f'COALESCE(e."isArchived", FALSE) = {bind(archived)}')
+        if search:
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            placeholder = bind(pattern)
+            clauses.append(f"(e.name ILIKE {placeholder} OR e.description ILIKE {placeholder})")
+        if cursor:
+            after_date, after_id = self._decode_event_cursor(cursor, descending)
+            comparison = "<" if descending else ">"
+            clauses.append(f"(e.date, e.id) {comparison} ({bind(after_date)}, {bind(after_id)})")
+        
+        direction = "DESC" if descending else "ASC"
+        order = f"e.date {direction}, e.id {direction}"
+        where = " AND ".join(clauses)
+        
+        # Fetch one extra row to know whether another page exists
+        if view == "summary":
+            events = await self._fetch_event_summaries(where, params, order, limit + 1)
+        else:
+            events = await self._fetch_all_events(True, where, params, order, limit + 1)
+        
+        has_more = len(events) > limit
+        events = events[:limit]
+        next_cursor = None
+        if has_more:
+            last = events[-1]
+            next_cursor = self._encode_event_cursor(last['date'], last['id'], descending)
+        
+        return {"events": events, "nextCursor": next_cursor, "hasMore": has_more}
+    
+    def _encode_event_cursor(self, date: datetime, event_id: int, descending: bool) -> str:
+        """Opaque cursor for the last row of a page"""
+        raw = json.dumps({"d": date.isoformat(), "i": event_id, "o": "desc" if descending else "asc"})
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    
+    def _decode_event_cursor(self, cursor: str, descending: bool) -> tuple:
+        """Decode a cursor; raises ValueError if it is malformed or from a different ordering"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            after_date = datetime.fromisoformat(data["d"])
+            after_id = int(data["i"])
+            order = data.get("o", "asc")
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if order != ("desc" if descending else "asc"):
+            raise ValueError("Cursor does not match the requested ordering")
+        return after_date, after_id
+    
+    def _build_prefix_tsquery(self, text: str) -> Optional[str]:
+        """'career fair' → 'career:* & fair:*' (user input never reaches tsquery syntax)"""
+        terms = [term for term in re.split(r"\W+", text or "") if term]
+        if not terms:
+            return None
+        return " & ".join(f"{term}:*" for term in terms[:10])
+    
+    async def search_events(self, text: str, cohort: Optional[tuple] = None, cursor: str = None,
+                            limit: int = EVENT_PAGE_DEFAULT_LIMIT) -> Dict[str, Any]:
+        """
+        Ranked full-text search over name/type/description with prefix matching.
+        Paged by (rank, id) keyset, so matches come from the GIN index and rows are returned in summary shape.
+        """
+        tsquery = self._build_prefix_tsquery(text)
+        if not tsquery:
+            raise ValueError("Search query must contain at least one word")
+        limit = max(1, min(int(limit), EVENT_PAGE_MAX_LIMIT))
+        
+        where, params = self._eligibility_clause(cohort)
+        params.append(tsquery)
+        query_param = f"${len(params)}"
+        
+        keyset = "TRUE"
+        if cursor:
+            after_rank, after_id = self._decode_search_cursor(cursor)
+            params.extend([after_rank, after_id])
+            keyset = f"(ranked.rank, ranked.id) < (${len(params) - 1}::real, ${len(params)}::int)"
+        
+        try:
+            async with self.get_connection() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT ranked.id, ranked.rank
+                    FROM (
+                        SELECT e.id, ts_rank_cd({EVENT_SEARCH_VECTOR}, query) AS rank
+                        FROM "Event" e, to_tsquery('simple', {query_param}) query
+                        WHERE {EVENT_SEARCH_VECTOR} @@ query AND {where}
+                    ) ranked
+                    WHERE {keyset}
+                    ORDER BY ranked.rank DESC, ranked.id DESC
+                    LIMIT {limit + 1}
+                """, *params)
+        except Exception as e:
+            print(f"❌ Error searching events: {e}")
+            raise e
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        ranks = {row['id']: row['rank'] for row in rows}
+        
+        events = []
+        if rows:
+            loaded = await self._fetch_event_summaries('e.id = ANY($1::int[])', [list(ranks)])
+            by_id = {event['id']: event for event in loaded}
+            for row in rows:
+                event = by_id.get(row['id'])
+                if event:
+                    event['rank'] = float(row['rank'])
+                    events.append(event)
+        
+        next_cursor = None
+        if has_more:
+            raw = json.dumps({"r": float(rows[-1]['rank']), "i": rows[-1]['id']})
+            next_cursor = base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+        
+        return {"events": events, "nextCursor": next_cursor, "hasMore": has_more}
+    
+    def _decode_search_cursor(self, cursor: str) -> tuple:
+        """Decode a search cursor; raises ValueError if it is malformed"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            return float(data["r"]), int(data["i"])
+        except Exception:
+            raise ValueError("Invalid cursor")
+    
+    async def _fetch_event_summaries(self, where: str = "TRUE", params: list = None,
+                                     order: str = "e.date ASC", limit: int = None) -> List[Dict[str, Any]]:
+        """
+        Load the public event summary: two queries in total regardless of catalog size
+        (events with seat counts, then every active tier for those events).
+        """
+        try:
+            limit_sql = f"LIMIT {int(limit)}" if limit else ""
+            async with self.get_connection() as conn:
+                event_rows = await conn.fetch(f"""
+                    SELECT
+                        e.id, e.name, e.date, e.image, e.fee, e.capacity,
+                        e.description, e.type, e."refundDeadline", e.url, e."isArchived",
+                        e."enableAdvancedTicketing", e."isUofTOnly", e."targetYear",
+                        (SELECT COUNT(*) FROM "EventRegistration" er WHERE er."eventId" = e.id) AS registration_count
+                    FROM "Event" e
+                    WHERE {where}
+                    ORDER BY {order}
+                    {limit_sql}
+                """, *(params or []))
+                
+                ticketed_ids = [row['id'] for row in event_rows if row['enableAdvancedTicketing']]
+                tiers_by_event = {}
+                if ticketed_ids:
+                    tier_rows = await conn.fetch(TIER_AVAILABILITY_QUERY, ticketed_ids, None)
+                    _sync_db_clock(tier_rows)
+                    for row in tier_rows:
+                        tiers_by_event.setdefault(row['eventId'], []).append(dict(row))
+            
+            events = []
+            for row in event_rows:
+                event = dict(row)
+                tiers = tiers_by_event.get(event['id'], [])
+                
+                if event['enableAdvancedTicketing'] and tiers:
+                    registered = sum(tier.get('registered_count', 0) for tier in tiers)
+                else:
+                    registered = event['registration_count']
+                event['remainingSeats'] = event['capacity'] - registered
+                event['ticketTiers'] = [
+                    {field: tier.get(field) for field in TICKET_TIER_SUMMARY_FIELDS}
+                    for tier in tiers
+                ]
+                # SubEvents disabled by policy (same as the full view)
+                event['subEvents'] = []
+                event['enableSubEvents'] = False
+                events.append(event)
+            return events
+        except Exception as e:
+            print(f"❌ Error getting event summaries: {e}")
+            raise e
+    
+    async def _fetch_all_events(self, use_cache: bool = True, where: str = "TRUE", params: list = None,
+                                order: str = "e.date ASC", limit: int = None) -> List[Dict[str, Any]]:
+        """Load all events with registration counts and registered users from the database"""
+        try:
+            limit_sql = f"LIMIT {int(limit)}" if limit else ""
             async with self.get_connection() as conn:
                 # First get all events
-                events_query = """
+                events_query = f"""
                 SELECT 
                     e.*,
                     COUNT(er.id) as registration_count
                 FROM "Event" e
                 LEFT JOIN "EventRegistration" er ON e.id = er."eventId"
+                WHERE {where}
                 GROUP BY e.id
-                ORDER BY e.date ASC
+                ORDER BY {order}
+                {limit_sql}
                 """
                 
-                event_rows = await conn.fetch(events_query)
+                event_rows = await conn.fetch(events_query, *(params or []))
                 
                 events = []
                 for row in event_rows:
@@ -469,7 +1008,7 @@ class EventRepository(BaseRepository):
                     
                     # Get ticket tiers if advanced ticketing is enabled
                     if event_dict.get('enableAdvancedTicketing'):
-                        tiers = await self.get_available_ticket_tiers(event_id)
+                        tiers = await self.get_available_ticket_tiers(event_id, use_cache=use_cache)
                         event_dict['ticketTiers'] = tiers
                         print(f"🎫 Event {event_id} has {len(tiers)} ticket tiers")
                     
@@ -595,7 +1134,10 @@ class EventRepository(BaseRepository):
                 event_dict['registeredUsers'] = []
                 event_dict['remainingSeats'] = event_dict['capacity']
                 
-                return event_dict
+                await self._publish_event_change(event_dict['id'], conn)
+            
+            await self._evict_event(event_dict['id'])
+            return event_dict
         except Exception as e:
             print(f"❌ Error creating event: {e}")
             raise e
@@ -605,11 +1147,16 @@ class EventRepository(BaseRepository):
         try:
             async with self.get_connection() as conn:
                 query = """
-                INSERT INTO "TicketTier" ("eventId", name, price, capacity, "targetYear", "startDate", "endDate", "isActive", "subEventPrices", "subEventCapacities")
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                INSERT INTO "TicketTier" ("eventId", name, price, capacity, "targetYear", "startDate", "endDate", "isActive", "subEventPrices", "subEventCapacities", "sortOrder", "unlockAfterTier")
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
                 RETURNING *
                 """
                 
+                # Regular opens when Early Bird sells out unless the admin configured another rule
+                unlock_after_tier = tier_data.get("unlockAfterTier")
+                if unlock_after_tier is None and tier_data["name"].strip().lower() == "regular":
+                    unlock_after_tier = "Early Bird"
+                
                 start_date = None
                 end_date = None
                 if tier_data.get("startDate"):
@@ -639,10 +1186,15 @@ class EventRepository(BaseRepository):
                     end_date,
                     tier_data.get("isActive", True),
                     sub_event_prices_json,
-                    sub_event_capacities_json
+                    sub_event_capacities_json,
+                    int(tier_data.get("sortOrder") or 0),
+                    unlock_after_tier or None
                 )
                 
-                return dict(row)
+                await self._publish_event_change(tier_data["eventId"], conn)
+            
+            await self._evict_event(tier_data["eventId"])
+            return dict(row)
         except Exception as e:
             print(f"Error creating ticket tier: {e}")
             raise e
@@ -668,7 +1220,10 @@ class EventRepository(BaseRepository):
                     sub_event_data.get("isComboOption", False)
                 )
                 
-                return dict(row)
+                await self._publish_event_change(sub_event_data["eventId"], conn)
+            
+            await self._evict_event(sub_event_data["eventId"])
+            return dict(row)
         except Exception as e:
             print(f"Error creating sub-event: {e}")
             raise e
@@ -720,35 +1275,42 @@ class EventRepository(BaseRepository):
             print(f"Error getting ticket tiers: {e}")
             raise e
     
-    async def get_available_ticket_tiers(self, event_id: int) -> List[Dict[str, Any]]:
-        """Get available ticket tiers with automatic progression logic"""
+    async def get_available_ticket_tiers(self, event_id: int, use_cache: bool = True,
+                                         current_year: str = None) -> List[Dict[str, Any]]:
+        """
+        Get available ticket tiers with automatic progression logic (cached).
+        current_year limits the result to tiers targeting that year.
+        """
+        cache = self._cache.catalog
+        key = ("tiers", event_id, current_year)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not MISS:
+                return cached
+        
+        version = cache.version_of(event_id)
+        tiers = await self._fetch_available_ticket_tiers(event_id, current_year)
+        cache.put(key, tiers, event_id, version, ttl_seconds=self.transition_ttl(cache, tiers))
+        return tiers
+    
+    async def _fetch_available_ticket_tiers(self, event_id: int, current_year: str = None) -> List[Dict[str, Any]]:
+        """Load ticket tiers with availability and progression evaluated in SQL"""
         try:
-            from datetime import datetime
-            
             async with self.get_connection() as conn:
-                # Get all tiers with current registration counts
-                query = """
-                SELECT 
-                    tt.*,
-                    COUNT(er.id) as registered_count,
-                    (tt.capacity - COUNT(er.id)) as remaining_capacity
-                FROM "TicketTier" tt
-                LEFT JOIN "EventRegistration" er ON tt.id = er."ticketTierId"
-                WHERE tt."eventId" = $1 AND tt."isActive" = TRUE
-                GROUP BY tt.id
-                ORDER BY tt.price ASC
-                """
-                rows = await conn.fetch(query, event_id)
+                rows = await conn.fetch(TIER_AVAILABILITY_QUERY, [event_id], current_year)
+                _sync_db_clock(rows)
                 
                 tiers = []
-                current_time = datetime.now()
-                
                 for row in rows:
                     tier = dict(row)
+                    # Ineligible tiers still take part in progression (an unlock tier may target another year)
+                    if not tier['is_eligible']:
+                        continue
+                    for column in TIER_HELPER_COLUMNS:
+                        tier.pop(column, None)
                     
                     # Parse subEventPrices and subEventCapacities JSON if present
                     if tier.get('subEventPrices'):
-                        import json
                         try:
                             tier['subEventPrices'] = json.loads(tier['subEventPrices'])
                         except (json.JSONDecodeError, TypeError):
@@ -757,7 +1319,6 @@ class EventRepository(BaseRepository):
                         tier['subEventPrices'] = None
                     
                     if tier.get('subEventCapacities'):
-                        import json
                         try:
                             tier['subEventCapacities'] = json.loads(tier['subEventCapacities'])
                         except (json.JSONDecodeError, TypeError):
@@ -765,54 +1326,31 @@ class EventRepository(BaseRepository):
                     else:
                         tier['subEventCapacities'] = None
                     
-                    # Check if tier is within date range
-                    is_date_available = True
-                    if tier['startDate'] and current_time < tier['startDate']:
-                        is_date_available = False
-                    if tier['endDate'] and current_time > tier['endDate']:
-                        is_date_available = False
-                    
-                    # Check if tier has capacity
-                    has_capacity = tier['remaining_capacity'] > 0
-                    
-                    # Tier is available if it's within date range AND has capacity
-                    tier['isAvailable'] = is_date_available and has_capacity
-                    tier['availabilityReason'] = ''
-                    
-                    # Debug: Log availability details
-                    print(f"🔍 Tier '{tier['name']}' availability check:")
-                    print(f"  - Date available: {is_date_available} (start: {tier['startDate']}, end: {tier['endDate']}, current: {current_time})")
-                    print(f"  - Has capacity: {has_capacity} (remaining: {tier['remaining_capacity']}, total: {tier['capacity']})")
-                    print(f"  - Final availability: {tier['isAvailable']}")
-                    
-                    if not is_date_available:
-                        if tier['startDate'] and current_time < tier['startDate']:
-                            tier['availabilityReason'] = 'Not yet available'
-                        elif tier['endDate'] and current_time > tier['endDate']:
-                            tier['availabilityReason'] = 'Registration period ended'
-                    elif not has_capacity:
-                        tier['availabilityReason'] = 'Sold out'
-                    
                     tiers.append(tier)
                 
-                # Apply automatic progression logic: Early Bird → Regular
-                # If Early Bird is sold out, automatically make Regular available
-                if len(tiers) >= 2:
-                    early_bird = next((t for t in tiers if t['name'].lower() == 'early bird'), None)
-                    regular = next((t for t in tiers if t['name'].lower() == 'regular'), None)
-                    
-                    if early_bird and regular:
-                        # If Early Bird is sold out, make Regular available regardless of date
-                        if early_bird['remaining_capacity'] <= 0:
-                            regular['isAvailable'] = True
-                            regular['availabilityReason'] = 'Early Bird sold out - Regular now available'
-                            print(f"🔄 Auto-progression: Early Bird sold out, Regular now available for event {event_id}")
-                
                 return tiers
         except Exception as e:
             print(f"Error getting available ticket tiers: {e}")
             raise e
     
+    def next_tier_transition(self, tiers: List[Dict[str, Any]]) -> Optional[datetime]:
+        """Earliest precomputed nextTransitionAt among the tiers (None if nothing changes by time alone)"""
+        transitions = [tier['nextTransitionAt'] for tier in tiers if tier.get('nextTransitionAt')]
+        return min(transitions) if transitions else None
+    
+    def transition_ttl(self, cache, tiers: List[Dict[str, Any]]) -> Optional[float]:
+        """
+        Cache TTL that expires an entry exactly when one of its tiers opens or closes.
+        nextTransitionAt is on the database clock (LOCALTIMESTAMP), so "now" is read from it too.
+        """
+        next_transition = self.next_tier_transition(tiers)
+        if next_transition is None:
+            return None
+        ttl = max((next_transition - (datetime.now() + _db_clock_offset)).total_seconds(), 0)
+        if cache.ttl_seconds is not None:
+            ttl = min(ttl, cache.ttl_seconds)
+        return ttl
+    
     async def get_sub_events(self, event_id: int) -> List[Dict[str, Any]]:
         """Get all sub-events for an event"""
         try:
@@ -828,8 +1366,22 @@ class EventRepository(BaseRepository):
             print(f"Error getting sub-events: {e}")
             raise e
     
-    async def get_available_sub_events(self, event_id: int) -> List[Dict[str, Any]]:
-        """Get available sub-events with capacity information"""
+    async def get_available_sub_events(self, event_id: int, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Get available sub-events with capacity information (cached)"""
+        cache = self._cache.catalog
+        key = ("sub_events", event_id)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not MISS:
+                return cached
+        
+        version = cache.version_of(event_id)
+        sub_events = await self._fetch_available_sub_events(event_id)
+        cache.put(key, sub_events, event_id, version)
+        return sub_events
+    
+    async def _fetch_available_sub_events(self, event_id: int) -> List[Dict[str, Any]]:
+        """Load sub-events with capacity information from the database"""
         try:
             async with self.get_connection() as conn:
                 # Get all sub-events with current registration counts
@@ -862,8 +1414,23 @@ class EventRepository(BaseRepository):
             print(f"Error getting available sub-events: {e}")
             raise e
     
-    async def get_available_capacity(self, tier_id: int = None, sub_event_id: int = None) -> int:
-        """Get remaining capacity for a ticket tier or sub-event"""
+    async def get_available_capacity(self, tier_id: int = None, sub_event_id: int = None, use_cache: bool = True) -> int:
+        """Get remaining capacity for a ticket tier or sub-event (short-TTL cached)"""
+        cache = self._cache.seats
+        key = ("capacity", tier_id, sub_event_id)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not MISS:
+                return cached
+        
+        # Tiers and sub-events don't know their event here, so they live under the catalog scope
+        version = cache.version_of(CATALOG_SCOPE)
+        capacity = await self._fetch_available_capacity(tier_id, sub_event_id)
+        cache.put(key, capacity, CATALOG_SCOPE, version)
+        return capacity
+    
+    async def _fetch_available_capacity(self, tier_id: int = None, sub_event_id: int = None) -> int:
+        """Load remaining capacity for a ticket tier or sub-event from the database"""
         try:
             async with self.get_connection() as conn:
                 if tier_id:
@@ -899,6 +1466,67 @@ class EventRepository(BaseRepository):
             print(f"Error getting available capacity: {e}")
             return 0
     
+    async def get_capacity_batch(self, event_ids: List[int] = None, tier_ids: List[int] = None,
+                                 sub_event_ids: List[int] = None, use_cache: bool = True) -> Dict[str, Dict[int, int]]:
+        """
+        Remaining capacity for many events, tiers and sub-events at once.
+        Entries still in the seats cache are reused (tiers/sub-events share keys with get_available_capacity);
+        everything else comes from one grouped query. Unknown IDs are left out of the result.
+        """
+        cache = self._cache.seats
+        requested = {
+            "events": [(("event_capacity", event_id), event_id, event_id) for event_id in dict.fromkeys(event_ids or [])],
+            "tiers": [(("capacity", tier_id, None), CATALOG_SCOPE, tier_id) for tier_id in dict.fromkeys(tier_ids or [])],
+            "subEvents": [(("capacity", None, sub_id), CATALOG_SCOPE, sub_id) for sub_id in dict.fromkeys(sub_event_ids or [])]
+        }
+        result = {kind: {} for kind in requested}
+        missing = {kind: [] for kind in requested}
+        
+        for kind, entries in requested.items():
+            for key, scope, item_id in entries:
+                cached = cache.get(key) if use_cache else MISS
+                if cached is MISS:
+                    missing[kind].append((key, scope, item_id, cache.version_of(scope)))
+                else:
+                    result[kind][item_id] = cached
+        
+        if not any(missing.values()):
+            return result
+        
+        try:
+            async with self.get_connection() as conn:
+                rows = await conn.fetch("""
+                    SELECT 'events' AS kind, e.id,
+                           GREATEST(e.capacity - COUNT(er.id), 0) AS available
+                    FROM "Event" e
+                    LEFT JOIN "EventRegistration" er ON er."eventId" = e.id
+                    WHERE e.id = ANY($1::int[])
+                    GROUP BY e.id
+                    UNION ALL
+                    SELECT 'tiers', tt.id, tt.capacity - COUNT(er.id)
+                    FROM "TicketTier" tt
+                    LEFT JOIN "EventRegistration" er ON er."ticketTierId" = tt.id
+                    WHERE tt.id = ANY($2::int[])
+                    GROUP BY tt.id
+                    UNION ALL
+                    SELECT 'subEvents', se.id, se.capacity - COUNT(er.id)
+                    FROM "SubEvent" se
+                    LEFT JOIN "EventRegistration" er ON er."subEventId" = se.id
+                    WHERE se.id = ANY($3::int[])
+                    GROUP BY se.id
+                """, *[[item_id for _, _, item_id, _ in missing[kind]] for kind in ("events", "tiers", "subEvents")])
+        except Exception as e:
+            print(f"❌ Error getting batch capacity: {e}")
+            raise e
+        
+        loaded = {(row['kind'], row['id']): row['available'] for row in rows}
+        for kind, entries in missing.items():
+            for key, scope, item_id, version in entries:
+                if (kind, item_id) in loaded:
+                    result[kind][item_id] = loaded[(kind, item_id)]
+                    cache.put(key, loaded[(kind, item_id)], scope, version)
+        return result
+    
     async def delete_ticket_tiers_by_event(self, event_id: int):
         """Delete all ticket tiers for an event"""
         try:
@@ -906,6 +1534,7 @@ class EventRepository(BaseRepository):
                 await conn.execute("""
                     DELETE FROM "TicketTier" WHERE "eventId" = $1
                 """, event_id)
+            await self._invalidate_event(event_id)
         except Exception as e:
             print(f"Error deleting ticket tiers: {e}")
             raise e
@@ -917,12 +1546,28 @@ class EventRepository(BaseRepository):
                 await conn.execute("""
                     DELETE FROM "SubEvent" WHERE "eventId" = $1
                 """, event_id)
+            await self._invalidate_event(event_id)
         except Exception as e:
             print(f"Error deleting sub-events: {e}")
             raise e
     
-    async def get_event_with_tiers_and_subevents(self, event_id: int) -> Dict[str, Any]:
-        """Get event with its ticket tiers and sub-events"""
+    async def get_event_with_tiers_and_subevents(self, event_id: int, use_cache: bool = True) -> Dict[str, Any]:
+        """Get event with its ticket tiers and sub-events (cached)"""
+        cache = self._cache.catalog
+        key = ("event", event_id)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not MISS:
+                return cached
+        
+        version = cache.version_of(event_id)
+        event = await self._fetch_event_with_tiers_and_subevents(event_id, use_cache)
+        tiers = event['ticketTiers'] if event else []
+        cache.put(key, event, event_id, version, ttl_seconds=self.transition_ttl(cache, tiers))
+        return event
+    
+    async def _fetch_event_with_tiers_and_subevents(self, event_id: int, use_cache: bool = True) -> Dict[str, Any]:
+        """Load event with its ticket tiers and sub-events from the database"""
         try:
             async with self.get_connection() as conn:
                 # Get the main event
@@ -937,7 +1582,7 @@ class EventRepository(BaseRepository):
                 event = dict(event_row)
                 
                 # Get ticket tiers with availability information
-                tiers = await self.get_available_ticket_tiers(event_id)
+                tiers = await self.get_available_ticket_tiers(event_id, use_cache=use_cache)
                 event['ticketTiers'] = tiers
                 
                 # Get sub-events
@@ -992,7 +1637,10 @@ class EventRepository(BaseRepository):
                 if not row:
                     return None
                 
-                return dict(row)
+                await self._publish_event_change(event_id, conn)
+            
+            await self._evict_event(event_id)
+            return dict(row)
         except Exception as e:
             print(f"❌ Error updating event: {e}")
             raise e
@@ -1005,7 +1653,10 @@ class EventRepository(BaseRepository):
                     'DELETE FROM "Event" WHERE id = $1',
                     event_id
                 )
-                return result == "DELETE 1"
+                await self._publish_event_change(event_id, conn)
+            
+            await self._evict_event(event_id)
+            return result == "DELETE 1"
         except Exception as e:
             print(f"❌ Error deleting event: {e}")
             raise e
@@ -1140,19 +1791,21 @@ class EventRepository(BaseRepository):
                         RETURNING *
                     """, user_id, event_id, ticket_tier_id, sub_event_id, final_price, payment_id, payment_email)
                 print(f"✅ Advanced registration created with ID: {registration['id']}")
-                
-                return {
-                    'id': registration['id'],
-                    'userId': registration['userId'],
-                    'eventId': registration['eventId'],
-                    'ticketTierId': registration['ticketTierId'],
-                    'subEventId': registration['subEventId'],
-                    'finalPrice': float(registration['finalPrice']) if registration['finalPrice'] else None,
-                    'registeredAt': registration['registeredAt'].isoformat(),
-                    'paymentStatus': registration['paymentStatus'],
-                    'paymentId': registration['paymentId'],
-                    'paymentEmail': registration['paymentEmail']
-                }
+                await self._publish_event_change(event_id, conn)
+            
+            await self._evict_event(event_id)
+            return {
+                'id': registration['id'],
+                'userId': registration['userId'],
+                'eventId': registration['eventId'],
+                'ticketTierId': registration['ticketTierId'],
+                'subEventId': registration['subEventId'],
+                'finalPrice': float(registration['finalPrice']) if registration['finalPrice'] else None,
+                'registeredAt': registration['registeredAt'].isoformat(),
+                'paymentStatus': registration['paymentStatus'],
+                'paymentId': registration['paymentId'],
+                'paymentEmail': registration['paymentEmail']
+            }
         except Exception as e:
             print(f"❌ Error in advanced registration: {e}")
             raise e
@@ -1196,16 +1849,18 @@ class EventRepository(BaseRepository):
                     RETURNING *
                 """, user_id, event_id, payment_id, payment_email)
                 print(f"✅ Registration created with paymentId: {registration['paymentId']}")
-                
-                return {
-                    'id': registration['id'],
-                    'userId': registration['userId'],
-                    'eventId': registration['eventId'],
-                    'registeredAt': registration['registeredAt'].isoformat(),
-                    'paymentStatus': registration['paymentStatus'],
-                    'paymentId': registration['paymentId'],
-                    'fee': float(event['fee'])
-                }
+                await self._publish_event_change(event_id, conn)
+            
+            await self._evict_event(event_id)
+            return {
+                'id': registration['id'],
+                'userId': registration['userId'],
+                'eventId': registration['eventId'],
+                'registeredAt': registration['registeredAt'].isoformat(),
+                'paymentStatus': registration['paymentStatus'],
+                'paymentId': registration['paymentId'],
+                'fee': float(event['fee'])
+            }
         except Exception as e:
             print(f"❌ Error registering for event: {e}")
             raise e
@@ -1232,19 +1887,137 @@ class EventRepository(BaseRepository):
             print(f"❌ Error getting payment ID: {e}")
             return None
 
-    async def get_registration_count(self, event_id: int) -> int:
-        """Get the current number of registrations for an event"""
+    async def get_registration_count(self, event_id: int, use_cache: bool = True) -> int:
+        """Get the current number of registrations for an event (short-TTL cached)"""
         try:
+            cache = self._cache.seats
+            key = ("registration_count", event_id)
+            if use_cache:
+                cached = cache.get(key)
+                if cached is not MISS:
+                    return cached
+            
+            version = cache.version_of(event_id)
             async with self.get_connection() as conn:
                 count = await conn.fetchval(
                     'SELECT COUNT(*) FROM "EventRegistration" WHERE "eventId" = $1',
                     event_id
                 )
-                return count or 0
+            count = count or 0
+            cache.put(key, count, event_id, version)
+            return count
         except Exception as e:
             print(f"❌ Error getting registration count: {e}")
             return 0
 
+    async def get_capacity_snapshot(self, event_id: int) -> Optional[Dict[str, Any]]:
+        """Remaining seats for an event and each of its tiers / sub-events in one query (live stream payload)"""
+        try:
+            async with self.get_connection() as conn:
+                row = await conn.fetchrow("""
+                    SELECT
+                        e.id AS "eventId",
+                        e.capacity AS "totalCapacity",
+                        (SELECT COUNT(*) FROM "EventRegistration" er WHERE er."eventId" = e.id) AS "registrationCount",
+                        (SELECT COUNT(*) FROM "EventReservation" r
+                         WHERE r."eventId" = e.id AND r."expiresAt" > NOW()) AS "heldCount",
+                        COALESCE((
+                            SELECT json_agg(json_build_object(
+                                'id', tt.id,
+                                'name', tt.name,
+                                'availableCapacity', GREATEST(tt.capacity - (
+                                    SELECT COUNT(*) FROM "EventRegistration" er WHERE er."ticketTierId" = tt.id
+                                ), 0)
+                            ) ORDER BY tt."sortOrder", tt.price, tt.id)
+                            FROM "TicketTier" tt
+                            WHERE tt."eventId" = e.id AND tt."isActive" = TRUE
+                        ), '[]') AS "ticketTiers",
+                        COALESCE((
+                            SELECT json_agg(json_build_object(
+                                'id', se.id,
+                                'name', se.name,
+                                'availableCapacity', GREATEST(se.capacity - (
+                                    SELECT COUNT(*) FROM "EventRegistration" er WHERE er."subEventId" = se.id
+                                ), 0)
+                            ) ORDER BY se.id)
+                            FROM "SubEvent" se
+                            WHERE se."eventId" = e.id
+                        ), '[]') AS "subEvents"
+                    FROM "Event" e
+                    WHERE e.id = $1
+                """, event_id)
+                
+                if not row:
+                    return None
+                
+                snapshot = dict(row)
+                snapshot['ticketTiers'] = json.loads(snapshot['ticketTiers'])
+                snapshot['subEvents'] = json.loads(snapshot['subEvents'])
+                snapshot['availableCapacity'] = max(
+                    0, snapshot['totalCapacity'] - snapshot['registrationCount'] - snapshot['heldCount']
+                )
+                return snapshot
+        except Exception as e:
+            print(f"❌ Error getting capacity snapshot: {e}")
+            raise e
+
+    async def get_user_registrations(self, user_id: int, cursor: str = None,
+                                     limit: int = EVENT_PAGE_DEFAULT_LIMIT) -> Dict[str, Any]:
+        """
+        A user's registrations, newest first, with event summary, tier, payment details and the
+        latest refund request status. Keyset-paginated on (registeredAt, id).
+        Raises ValueError for a malformed cursor.
+        """
+        params = [user_id]
+        keyset = ""
+        if cursor:
+            after_date, after_id = self._decode_event_cursor(cursor, descending=True)
+            params += [after_date, after_id]
+            keyset = 'AND (er."registeredAt", er.id) < ($2, $3)'
+        params.append(limit + 1)
+        
+        try:
+            async with self.get_connection() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT
+                        er.id, er."eventId", er."registeredAt", er."paymentStatus",
+                        er."paymentId", er."paymentEmail", er."finalPrice",
+                        e.name AS "eventName", e.date AS "eventDate", e.image AS "eventImage",
+                        e.type AS "eventType", e."refundDeadline", e."isArchived",
+                        tt.id AS "tierId", tt.name AS "tierName",
+                        rr.id AS "refundRequestId", rr.status AS "refundStatus", rr."requestDate" AS "refundRequestedAt"
+                    FROM "EventRegistration" er
+                    JOIN "Event" e ON e.id = er."eventId"
+                    LEFT JOIN "TicketTier" tt ON tt.id = er."ticketTierId"
+                    LEFT JOIN LATERAL (
+                        SELECT r.id, r.status, r."requestDate"
+                        FROM "RefundRequest" r
+                        WHERE r."userId" = er."userId" AND r."eventId" = er."eventId"
+                        ORDER BY r."requestDate" DESC
+                        LIMIT 1
+                    ) rr ON TRUE
+                    WHERE er."userId" = $1 {keyset}
+                    ORDER BY er."registeredAt" DESC, er.id DESC
+                    LIMIT ${len(params)}
+                """, *params)
+        except Exception as e:
+            print(f"❌ Error getting user registrations: {e}")
+            raise e
+        
+        registrations = [dict(row) for row in rows]
+        for registration in registrations:
+            if registration['finalPrice'] is not None:
+                registration['finalPrice'] = float(registration['finalPrice'])
+        
+        has_more = len(registrations) > limit
+        registrations = registrations[:limit]
+        next_cursor = None
+        if has_more:
+            last = registrations[-1]
+            next_cursor = self._encode_event_cursor(last['registeredAt'], last['id'], descending=True)
+        
+        return {"registrations": registrations, "nextCursor": next_cursor, "hasMore": has_more}
+
     async def check_existing_registration(self, user_id: int, event_id: int) -> bool:
         """Check if user is already registered for an event"""
         try:
@@ -1266,10 +2039,15 @@ class EventRepository(BaseRepository):
             import uuid
             reservation_id = str(uuid.uuid4())
 
+            waitlist_repo = WaitlistRepository()
             async with self.get_connection() as conn:
                 # First, clean up expired reservations
-                await conn.execute('DELETE FROM "EventReservation" WHERE "expiresAt" < NOW()')
-                
+                freed_event_ids = await waitlist_repo.release_expired_holds(conn)
+
+            # Freed seats go to the waitlist before new reservations (promotion takes its own connection)
+            await waitlist_repo.promote_for_events(freed_event_ids)
+
+            async with self.get_connection() as conn:
                 # ATOMIC reservation creation with capacity check to prevent race conditions
                 result = await conn.fetchrow("""
                     WITH capacity_check AS (
@@ -1296,6 +2074,7 @@ class EventRepository(BaseRepository):
                 if not result:
                     raise Exception("Event is full - cannot create reservation")
 
+                await self.publish_capacity_change(event_id, conn)
                 print(f"✅ Reservation created with atomic capacity check: {reservation_id}")
                 return reservation_id
 
@@ -1303,6 +2082,39 @@ class EventRepository(BaseRepository):
             print(f"❌ Error creating reservation: {e}")
             raise e
 
+    async def claim_active_hold(self, user_id: int, event_id: int, tier_id: int = None,
+                                sub_event_ids: List[int] = None, final_price: float = None,
+                                payment_email: str = None) -> Optional[Dict]:
+        """
+        Return the user's unexpired hold on an event (e.g. a waitlist promotion), filled in
+        with the tier, sub-events and price from the checkout. None when the user has no hold.
+        """
+        try:
+            async with self.get_connection() as conn:
+                result = await conn.fetchrow("""
+                    UPDATE "EventReservation"
+                    SET "tierId" = COALESCE($3, "tierId"),
+                        "subEventIds" = COALESCE($4, "subEventIds"),
+                        "finalPrice" = COALESCE($5, "finalPrice"),
+                        "paymentEmail" = COALESCE($6, "paymentEmail")
+                    WHERE id = (
+                        SELECT id FROM "EventReservation"
+                        WHERE "userId" = $1 AND "eventId" = $2 AND "expiresAt" > NOW()
+                        ORDER BY "expiresAt" DESC
+                        LIMIT 1
+                    )
+                    RETURNING id, "expiresAt"
+                """, user_id, event_id, tier_id, sub_event_ids or None, final_price, payment_email)
+
+                if not result:
+                    return None
+
+                await self.publish_capacity_change(event_id, conn)
+                return {"id": result["id"], "expiresAt": result["expiresAt"]}
+        except Exception as e:
+            print(f"❌ Error claiming reservation hold: {e}")
+            raise e
+
     async def get_user_email(self, user_id: int) -> Optional[str]:
         """Get user's email address by user ID"""
         try:
@@ -1319,15 +2131,18 @@ class EventRepository(BaseRepository):
     async def get_reservation(self, reservation_id: str, user_id: int) -> Optional[Dict]:
         """Get reservation by ID and user ID"""
         try:
+            waitlist_repo = WaitlistRepository()
             async with self.get_connection() as conn:
                 # First, clean up expired reservations
-                await conn.execute('DELETE FROM "EventReservation" WHERE "expiresAt" < NOW()')
+                freed_event_ids = await waitlist_repo.release_expired_holds(conn)
                 
                 result = await conn.fetchrow(
                     'SELECT * FROM "EventReservation" WHERE id = $1 AND "userId" = $2 AND "expiresAt" > NOW()',
                     reservation_id, user_id
                 )
-                return dict(result) if result else None
+            
+            await waitlist_repo.promote_for_events(freed_event_ids)
+            return dict(result) if result else None
         except Exception as e:
             print(f"❌ Error getting reservation: {e}")
             return None
@@ -1347,20 +2162,29 @@ class EventRepository(BaseRepository):
                     return False
                 
                 # Delete reservation
-                await conn.execute(
-                    'DELETE FROM "EventReservation" WHERE id = $1 AND "userId" = $2',
+                event_id = await conn.fetchval(
+                    'DELETE FROM "EventReservation" WHERE id = $1 AND "userId" = $2 RETURNING "eventId"',
                     reservation_id, user_id
                 )
                 
-                print(f"✅ Reservation {reservation_id} cancelled for user {user_id}")
-                return True
+                waitlist_repo = WaitlistRepository()
+                await waitlist_repo.mark_hold_finished(conn, reservation_id, 'cancelled')
+                
+            print(f"✅ Reservation {reservation_id} cancelled for user {user_id}")
+            
+            # The released seat goes to the next waitlisted user
+            if event_id is not None:
+                await self.publish_capacity_change(event_id)
+                await waitlist_repo.promote_for_events([event_id])
+            return True
                     
         except Exception as e:
             print(f"❌ Error cancelling reservation: {e}")
             return False
 
-    async def convert_reservation_to_registration(self, reservation_id: str, payment_id: str, payment_email: str) -> Dict:
-        """Convert a reservation to a registration"""
+    async def convert_reservation_to_registration(self, reservation_id: str, payment_id: str, payment_email: str,
+                                                  final_price: float = None) -> Dict:
+        """Convert a reservation to a registration; final_price is the verified payment amount when known"""
         try:
             async with self.get_connection() as conn:
                 # Get reservation details
@@ -1380,25 +2204,29 @@ class EventRepository(BaseRepository):
                     RETURNING *
                 """, reservation['userId'], reservation['eventId'], reservation['tierId'], 
                     reservation['subEventIds'][0] if reservation['subEventIds'] else None,
-                    reservation['finalPrice'], payment_id, payment_email)
+                    final_price if final_price is not None else reservation['finalPrice'],
+                    payment_id, payment_email)
                 
                 # Delete the reservation
                 await conn.execute('DELETE FROM "EventReservation" WHERE id = $1', reservation_id)
+                await WaitlistRepository().mark_hold_finished(conn, reservation_id, 'registered')
                 
                 print(f"✅ Reservation {reservation_id} converted to registration {registration['id']}")
-                
-                return {
-                    'id': registration['id'],
-                    'userId': registration['userId'],
-                    'eventId': registration['eventId'],
-                    'ticketTierId': registration['ticketTierId'],
-                    'subEventId': registration['subEventId'],
-                    'finalPrice': float(registration['finalPrice']) if registration['finalPrice'] else None,
-                    'registeredAt': registration['registeredAt'].isoformat(),
-                    'paymentStatus': registration['paymentStatus'],
-                    'paymentId': registration['paymentId'],
-                    'paymentEmail': registration['paymentEmail']
-                }
+                await self._publish_event_change(registration['eventId'], conn)
+            
+            await self._evict_event(registration['eventId'])
+            return {
+                'id': registration['id'],
+                'userId': registration['userId'],
+                'eventId': registration['eventId'],
+                'ticketTierId': registration['ticketTierId'],
+                'subEventId': registration['subEventId'],
+                'finalPrice': float(registration['finalPrice']) if registration['finalPrice'] else None,
+                'registeredAt': registration['registeredAt'].isoformat(),
+                'paymentStatus': registration['paymentStatus'],
+                'paymentId': registration['paymentId'],
+                'paymentEmail': registration['paymentEmail']
+            }
                 
         except Exception as e:
             print(f"❌ Error converting reservation to registration: {e}")
@@ -1433,7 +2261,13 @@ class EventRepository(BaseRepository):
                     'DELETE FROM "EventRegistration" WHERE "userId" = $1 AND "eventId" = $2',
                     user_id, event_id
                 )
-                return result == "DELETE 1"
+            
+            cancelled = result == "DELETE 1"
+            if cancelled:
+                await self._invalidate_event(event_id)
+                # The freed seat goes to the next waitlisted user
+                await WaitlistRepository().promote_for_events([event_id])
+            return cancelled
         except Exception as e:
             print(f"❌ Error canceling registration: {e}")
             raise e
@@ -1566,6 +2400,29 @@ class EventRepository(BaseRepository):
             print(f"❌ Error getting system stats: {e}")
             raise e 
 
+    async def event_exists(self, event_id: int) -> bool:
+        """Cheap existence check (no registrations loaded)"""
+        try:
+            async with self.get_connection() as conn:
+                return await conn.fetchval('SELECT EXISTS (SELECT 1 FROM "Event" WHERE id = $1)', event_id)
+        except Exception as e:
+            print(f"❌ Error checking event existence: {e}")
+            raise e
+    
+    def registration_export_query(self, event_id: int, columns: List[str]) -> tuple:
+        """(query, params) streaming an event's registrations with the chosen export columns"""
+        query = f"""
+        SELECT
+            {select_list(columns, REGISTRATION_EXPORT_COLUMNS)}
+        FROM "EventRegistration" er
+        JOIN "User" u ON er."userId" = u.id
+        LEFT JOIN "TicketTier" tt ON er."ticketTierId" = tt.id
+        LEFT JOIN "SubEvent" se ON er."subEventId" = se.id
+        WHERE er."eventId" = $1
+        ORDER BY er."registeredAt" ASC, er.id ASC
+        """
+        return query, [event_id]
+    
     async def get_event_registrations_detailed(self, event_id: int) -> List[Dict[str, Any]]:
         """Get detailed registrations for an event including user and ticket info"""
         try:
@@ -0,0 +1,56 @@
+# authentication/data_access/form_cache.py
+import os
+from typing import Optional
+from .catalog_cache import VersionedCache
+from .invalidation_bus import get_invalidation_bus
+
+# Scope for entries looked up by access token (the form ID isn't known until they are loaded)
+FORMS_SCOPE = "forms"
+
+class FormDefinitionCache:
+    """
+    フォーム定義キャッシュ
+    - definitions: get_form_by_token / get_form_by_id の結果（トークン・フォームID単位）
+    - responses: 公開フォームページのシリアライズ済みレスポンス（フィンガープリントと一緒に保存）
+    公開後のフォームはほとんど変わらないため、update_form / delete_form とバス経由でのみ無効化する
+    """
+
+    def __init__(self):
+        ttl = float(os.getenv("FORM_CACHE_TTL_SECONDS", "3600"))
+        self.definitions = VersionedCache("form_definitions", ttl_seconds=ttl)
+        self.responses = VersionedCache("form_responses", ttl_seconds=ttl)
+
+    def invalidate_form(self, form_id: Optional[int]) -> None:
+        """Invalidate one form (token entries can't be told apart, so they all go)"""
+        if form_id is None:
+            self.invalidate_all()
+            return
+        for cache in (self.definitions, self.responses):
+            cache.invalidate(form_id)
+            cache.invalidate(FORMS_SCOPE)
+
+    def invalidate_all(self) -> None:
+        """Invalidate everything"""
+        self.definitions.clear()
+        self.responses.clear()
+
+    def get_stats(self) -> dict:
+        """キャッシュ統計を取得"""
+        return {
+            "definitions": self.definitions.get_stats(),
+            "responses": self.responses.get_stats()
+        }
+
+# グローバルインスタンス
+_form_cache = None
+
+def get_form_cache() -> FormDefinitionCache:
+    """グローバルフォームキャッシュを取得"""
+    global _form_cache
+    if _form_cache is None:
+        _form_cache = FormDefinitionCache()
+        # Form edits on other workers arrive over the invalidation bus
+        bus = get_invalidation_bus()
+        bus.subscribe("form", _form_cache.invalidate_form)
+        bus.on_flush(_form_cache.invalidate_all)
+    return _form_cache
@@ -4,12 +4,190 @@ import sys
 import asyncpg
 import boto3
 import json
+import base64
+import math
+from datetime import datetime
 from typing import Optional, Dict, Any, List
 from .base_repository import BaseRepository
+from .catalog_cache import MISS
+from .form_cache import get_form_cache, FORMS_SCOPE
+
+# Whole submission in one round trip. Unknown field IDs block both inserts; a duplicate
+# (formId, userId) inserts nothing and comes back with a NULL id. $5-$7 are the answers' aggregate
+# buckets (see response_buckets), one candidate per field type group; only the group matching the
+# field's type is counted into FormFieldAggregate, in the submitter's shard ($8 shards) so a burst
+# of submissions to one form doesn't queue on the same counter rows.
+SUBMIT_FORM_QUERY = """
+WITH answers AS (
+    SELECT a."fieldId", a.value, ff.id AS "validFieldId"
+    FROM unnest($3::int[], $4::text[]) AS a("fieldId", value)
+    LEFT JOIN "FormField" ff ON ff.id = a."fieldId" AND ff."formId" = $1
+), submission AS (
+    INSERT INTO "FormSubmission" ("formId", "userId")
+    SELECT $1, $2
+    WHERE NOT EXISTS (SELECT 1 FROM answers WHERE "validFieldId" IS NULL)
+    ON CONFLICT ("formId", "userId") DO NOTHING
+    RETURNING id, "formId", "userId", "submittedAt"
+), inserted AS (
+    INSERT INTO "FormResponse" ("submissionId", "fieldId", value)
+    SELECT s.id, a."fieldId", a.value
+    FROM submission s CROSS JOIN answers a
+    RETURNING id, "submissionId", "fieldId", value
+), buckets AS (
+    SELECT b."fieldId", b.bucket
+    FROM submission s
+    CROSS JOIN unnest($5::int[], $6::text[], $7::text[]) AS b("fieldId", "typeGroup", bucket)
+    JOIN "FormField" ff ON ff.id = b."fieldId" AND ff."formId" = $1
+    WHERE b."typeGroup" = 'any' OR b."typeGroup" = CASE
+        WHEN ff.type IN ('checkbox', 'checkboxes') THEN 'multi'
+        WHEN ff.type IN ('select', 'dropdown', 'radio', 'multiplechoice') THEN 'choice'
+        WHEN ff.type IN ('number', 'rating', 'ratingscale') THEN 'numeric'
+    END
+), aggregated AS (
+    -- Sorted so concurrent submissions lock aggregate rows in the same order
+    INSERT INTO "FormFieldAggregate" ("formId", "fieldId", bucket, shard, count)
+    SELECT $1, "fieldId", bucket, abs(hashtext($2::text)::bigint) % $8, COUNT(*) FROM buckets
+    GROUP BY "fieldId", bucket
+    ORDER BY "fieldId", bucket
+    ON CONFLICT ("fieldId", bucket, shard) DO UPDATE SET count = "FormFieldAggregate".count + EXCLUDED.count
+)
+SELECT
+    s.id, s."formId", s."userId", s."submittedAt",
+    (SELECT COALESCE(json_agg(i ORDER BY i.id), '[]') FROM inserted i) AS responses,
+    (SELECT array_agg("fieldId") FROM answers WHERE "validFieldId" IS NULL) AS "invalidFieldIds"
+FROM (SELECT 1) AS one
+LEFT JOIN submission s ON TRUE
+"""
+
+# Per-user auto-coupons for an event's trigger coupons. A coupon crossing its threshold is stamped
+# with thresholdReachedAt and issued to every submitter at once; after that only the submitters in
+# $2 are considered ($2 NULL = everyone, used by the manual trigger). The submission count is an
+# InitPlan, so it only runs while some coupon is still below its threshold.
+AUTO_COUPON_QUERY = """
+WITH crossed AS (
+    UPDATE "Coupon" c SET "thresholdReachedAt" = CURRENT_TIMESTAMP
+    WHERE c."autoGenerated" = true AND c."triggerEventId" = $1 AND c."isActive" = true
+    AND c."thresholdReachedAt" IS NULL
+    AND (
+        SELECT COUNT(*) FROM "FormSubmission" fs
+        JOIN "Form" f ON f.id = fs."formId"
+        WHERE f."eventId" = $1
+    ) >= COALESCE(c."requiredSubmissions", 1)
+    RETURNING c.*
+), reached AS (
+    SELECT c.*, false AS "justCrossed" FROM "Coupon" c
+    WHERE c."autoGenerated" = true AND c."triggerEventId" = $1 AND c."isActive" = true
+    AND c."thresholdReachedAt" IS NOT NULL
+    UNION ALL
+    SELECT crossed.*, true FROM crossed
+), recipients AS (
+    SELECT DISTINCT r.id AS "couponId", fs."userId", r.code || '-' || fs."userId" AS code
+    FROM reached r
+    JOIN "Form" f ON f."eventId" = $1
+    JOIN "FormSubmission" fs ON fs."formId" = f.id
+    WHERE r."justCrossed" OR $2::int[] IS NULL OR fs."userId" = ANY($2::int[])
+), inserted AS (
+    INSERT INTO "Coupon" (
+        code, name, description, "discountType", "discountValue",
+        "minAmount", "maxUses", "isActive", "expiresAt", "autoGenerated"
+    )
+    SELECT rc.code, r.name || ' - ' || u."firstName", 'Auto-generated for ' || u."firstName" || ' ' || u."lastName",
+           r."discountType", r."discountValue", r."minAmount", 1, true, r."expiresAt", true
+    FROM recipients rc
+    JOIN reached r ON r.id = rc."couponId"
+    JOIN "User" u ON u.id = rc."userId"
+    ON CONFLICT (code) DO NOTHING
+    RETURNING *
+)
+SELECT i.*, rc."userId", u.email AS "userEmail"
+FROM inserted i
+JOIN recipients rc ON rc.code = i.code
+JOIN "User" u ON u.id = rc."userId"
+"""
+
+# Field type groups for decoding and analytics (the public form renders several aliases of each)
+MULTI_CHOICE_FIELD_TYPES = ("checkbox", "checkboxes")
+CHOICE_FIELD_TYPES = ("select", "dropdown", "radio", "multiplechoice")
+NUMERIC_FIELD_TYPES = ("number", "rating", "ratingscale")
+# Numeric fields with more distinct values than this are binned into equal-width ranges
+ANALYTICS_HISTOGRAM_BINS = 10
+# Counter rows per (field, bucket); submissions spread over them and reads sum them
+FORM_AGGREGATE_SHARDS = int(os.getenv("FORM_AGGREGATE_SHARDS", "16"))
+
+# Fixed leading columns of the pivoted submission export (one column per field follows)
+SUBMISSION_EXPORT_COLUMNS = {
+    "submission_id": "fs.id",
+    "submitted_at": 'fs."submittedAt"',
+    "user_id": "u.id",
+    "first_name": 'u."firstName"',
+    "last_name": 'u."lastName"',
+    "user_email": "u.email",
+}
+
+# Keyset pagination for GET /forms/{id}/submissions
+SUBMISSION_PAGE_MAX_LIMIT = 500
+
+def decode_response_value(field_type: str, value: Optional[str]) -> Any:
+    """
+    Stored FormResponse.value (TEXT) → typed value by FormField.type.
+    Multi-choice answers are stored as JSON arrays, numeric ones as text; everything else stays a string.
+    """
+    if value is None:
+        return None
+    if field_type in MULTI_CHOICE_FIELD_TYPES:
+        try:
+            decoded = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return [value] if value else []
+        return decoded if isinstance(decoded, list) else [decoded]
+    if field_type in NUMERIC_FIELD_TYPES:
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        return int(number) if number.is_integer() else number
+    return value
+
+def response_buckets(field_type: str, value: Optional[str]) -> List[str]:
+    """
+    FormFieldAggregate buckets one stored answer counts towards: "" (answered) plus, for choice
+    fields, each selected option and, for numeric fields, the normalized number.
+    """
+    if value is None or value in ("", "[]"):
+        return []
+    buckets = [""]
+    if field_type in MULTI_CHOICE_FIELD_TYPES:
+        buckets += [str(option) for option in decode_response_value(field_type, value)]
+    elif field_type in CHOICE_FIELD_TYPES:
+        buckets.append(value)
+    elif field_type in NUMERIC_FIELD_TYPES:
+        number = decode_response_value(field_type, value)
+        if isinstance(number, (int, float)) and math.isfinite(number):
+            buckets.append(str(number))
+    return buckets
+
+def _numeric_histogram(counts: Dict[float, int]) -> List[Dict[str, Any]]:
+    """Value → count pairs as histogram bins (one bin per value when there are few)"""
+    values = sorted(counts)
+    if len(values) <= ANALYTICS_HISTOGRAM_BINS:
+        return [{"min": value, "max": value, "count": counts[value]} for value in values]
+    low, high = values[0], values[-1]
+    width = (high - low) / ANALYTICS_HISTOGRAM_BINS
+    bins = [{"min": low + i * width, "max": low + (i + 1) * width, "count": 0}
+            for i in range(ANALYTICS_HISTOGRAM_BINS)]
+    for value, count in counts.items():
+        bins[min(int((value - low) / width), ANALYTICS_HISTOGRAM_BINS - 1)]["count"] += count
+    return bins
 
 class FormRepository(BaseRepository):
     def __init__(self):
         super().__init__()
+        self._cache = get_form_cache()
+    
+    async def _invalidate_form(self, form_id: int, conn=None) -> None:
+        """Evict a form from this worker's cache and tell the other workers to do the same"""
+        self._cache.invalidate_form(form_id)
+        await self.publish_invalidation("form", form_id, conn)
     
     def list_available_secrets(self):
         """List all available secrets in AWS Secrets Manager"""
@@ -107,6 +285,8 @@ class FormRepository(BaseRepository):
                         UNIQUE("eventId")
                     )
                 """)
+                # Bumped on every effective edit; caches and ETags key on it
+                await conn.execute('ALTER TABLE "Form" ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1')
                 
                 # Create FormField table
                 await conn.execute("""
@@ -161,9 +341,11 @@ class FormRepository(BaseRepository):
                         "createdAt" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         "autoGenerated" BOOLEAN DEFAULT false,
                         "triggerEventId" INTEGER,
-                        "requiredSubmissions" INTEGER
+                        "requiredSubmissions" INTEGER,
+                        "thresholdReachedAt" TIMESTAMP
                     )
                 """)
+                await conn.execute('ALTER TABLE "Coupon" ADD COLUMN IF NOT EXISTS "thresholdReachedAt" TIMESTAMP')
                 
                 # Create CouponUsage table
                 await conn.execute("""
@@ -282,6 +464,43 @@ class FormRepository(BaseRepository):
                 except Exception as e:
                     print(f"❌ Error migrating CreditAward.creditsAwarded: {e}")
                 
+                # Per-field answer counts maintained by submit_form (bucket "" = answered), sharded
+                aggregates_existed = await conn.fetchval("SELECT to_regclass('\"FormFieldAggregate\"') IS NOT NULL")
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS "FormFieldAggregate" (
+                        "formId" INTEGER NOT NULL REFERENCES "Form"(id) ON DELETE CASCADE,
+                        "fieldId" INTEGER NOT NULL REFERENCES "FormField"(id) ON DELETE CASCADE,
+                        bucket TEXT NOT NULL,
+                        shard SMALLINT NOT NULL DEFAULT 0,
+                        count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY ("fieldId", bucket, shard)
+                    )
+                """)
+                shard_exists = await conn.fetchval("""
+                    SELECT EXISTS (
+                        SELECT FROM information_schema.columns
+                        WHERE table_name = 'FormFieldAggregate' AND column_name = 'shard'
+                    )
+                """)
+                if not shard_exists:
+                    # Unsharded table from before: existing counts become shard 0
+                    await conn.execute("""
+                        ALTER TABLE "FormFieldAggregate"
+                        ADD COLUMN shard SMALLINT NOT NULL DEFAULT 0,
+                        DROP CONSTRAINT "FormFieldAggregate_pkey",
+                        ADD PRIMARY KEY ("fieldId", bucket, shard)
+                    """)
+                    print("✅ FormFieldAggregate sharded")
+                if not aggregates_existed:
+                    # First run: aggregate the submissions collected so far
+                    await self.rebuild_form_aggregates(conn=conn)
+                
+                # Keyset pagination over a form's submissions (newest first)
+                await conn.execute("""
+                    CREATE INDEX IF NOT EXISTS "idx_FormSubmission_form_submittedAt"
+                    ON "FormSubmission"("formId", "submittedAt" DESC, id DESC)
+                """)
+                
                 print("✅ Form tables ensured to exist")
         except Exception as e:
             print(f"❌ Error ensuring form tables exist: {e}")
@@ -301,7 +520,7 @@ class FormRepository(BaseRepository):
                     form_query = """
                         INSERT INTO "Form" ("eventId", title, description, "isActive", "isRequired", "accessToken", "allowPublicAccess")
                         VALUES ($1, $2, $3, $4, $5, $6, $7)
-                        RETURNING id, "eventId", title, description, "isActive", "isRequired", "accessToken", "allowPublicAccess", "createdAt", "updatedAt"
+                        RETURNING id, "eventId", title, description, "isActive", "isRequired", "accessToken", "allowPublicAccess", "createdAt", "updatedAt", version
                     """
                     form_row = await conn.fetchrow(
                         form_query,
@@ -353,11 +572,18 @@ class FormRepository(BaseRepository):
                         )
                         credit_award = dict(credit_award_row)
                     
-                    return {
+                    # Drops a "not found" cached for the new token (or form ID) before it existed;
+                    # delivered to the other workers on commit
+                    await self.publish_invalidation("form", form_row["id"], conn)
+                    result = {
                         **dict(form_row),
                         "fields": fields,
                         "creditAward": credit_award
                     }
+                
+                # Evicted only after commit, so a concurrent read can't re-cache the old state
+                self._cache.invalidate_form(form_row["id"])
+                return result
         except Exception as e:
             print(f"❌ Error creating form: {e}")
             raise e
@@ -368,7 +594,7 @@ class FormRepository(BaseRepository):
             async with self.get_connection() as conn:
                 # Get form
                 form_query = """
-                    SELECT id, "eventId", title, description, "isActive", "isRequired", "createdAt", "updatedAt"
+                    SELECT id, "eventId", title, description, "isActive", "isRequired", "createdAt", "updatedAt", version
                     FROM "Form"
                     WHERE "eventId" = $1
                 """
@@ -432,76 +658,139 @@ class FormRepository(BaseRepository):
             print(f"❌ Full traceback: {traceback.format_exc()}")
             raise e
     
-    async def update_form(self, form_id: int, form_data: dict) -> Dict[str, Any]:
-        """Update a form and its fields"""
+    async def update_form(self, form_id: int, form_data: dict) -> Optional[Dict[str, Any]]:
+        """
+        Update a form by diffing its fields: fields are matched by ID (and keep it, so existing
+        answers stay attached), changed ones are updated, new ones inserted and missing ones deleted,
+        each kind in one batched statement. The credit award is upserted. The form's version is
+        bumped only when something actually changed. Returns None if the form does not exist.
+        """
         try:
             async with self.get_connection() as conn:
                 async with conn.transaction():
-                    # Update form
-                    form_query = """
-                        UPDATE "Form" 
-                        SET title = $2, description = $3, "isActive" = $4, "isRequired" = $5, "updatedAt" = CURRENT_TIMESTAMP
-                        WHERE id = $1
-                        RETURNING id, "eventId", title, description, "isActive", "isRequired", "createdAt", "updatedAt"
-                    """
-                    form_row = await conn.fetchrow(
-                        form_query,
-                        form_id,
-                        form_data["title"],
-                        form_data.get("description"),
-                        form_data.get("isActive", True),
-                        form_data.get("isRequired", False)
-                    )
+                    # Serializes concurrent edits of the same form
+                    current = await conn.fetchrow('SELECT id FROM "Form" WHERE id = $1 FOR UPDATE', form_id)
+                    if not current:
+                        return None
                     
-                    # Delete existing fields
-                    await conn.execute('DELETE FROM "FormField" WHERE "formId" = $1', form_id)
+                    existing_ids = {row["id"] for row in await conn.fetch(
+                        'SELECT id FROM "FormField" WHERE "formId" = $1', form_id
+                    )}
+                    columns = {"id": [], "type": [], "question": [], "description": [],
+                               "isRequired": [], "options": [], "order": []}
+                    updates = {key: [] for key in columns}
+                    inserts = {key: [] for key in columns}
+                    for i, field_data in enumerate(form_data.get("fields") or []):
+                        target = updates if field_data.get("id") in existing_ids else inserts
+                        target["id"].append(field_data.get("id"))
+                        target["type"].append(field_data["type"])
+                        target["question"].append(field_data["question"])
+                        target["description"].append(field_data.get("description"))
+                        target["isRequired"].append(field_data.get("isRequired", False))
+                        target["options"].append(json.dumps(field_data.get("options")) if field_data.get("options") else None)
+                        target["order"].append(field_data.get("order", i))
                     
-                    # Create new fields
-                    fields = []
-                    if "fields" in form_data:
-                        for i, field_data in enumerate(form_data["fields"]):
-                            field_query = """
-                                INSERT INTO "FormField" ("formId", type, question, description, "isRequired", options, "order")
-                                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                                RETURNING id, "formId", type, question, description, "isRequired", options, "order"
-                            """
-                            field_row = await conn.fetchrow(
-                                field_query,
-                                form_id,
-                                field_data["type"],
-                                field_data["question"],
-                                field_data.get("description"),
-                                field_data.get("isRequired", False),
-                                json.dumps(field_data.get("options")) if field_data.get("options") else None,
-                                field_data.get("order", i)
-                            )
-                            fields.append(dict(field_row))
+                    deleted = await conn.fetch("""
+                        DELETE FROM "FormField"
+                        WHERE "formId" = $1 AND NOT (id = ANY($2::int[]))
+                        RETURNING id
+                    """, form_id, updates["id"])
                     
-                    # Update credit award settings
-                    credit_award = None
-                    # First delete existing credit award
-                    await conn.execute('DELETE FROM "CreditAward" WHERE "formId" = $1', form_id)
+                    # prev is the row as it was before this statement, so the update can report
+                    # whether the answers' bucketing (type, options) changed
+                    updated = await conn.fetch("""
+                        UPDATE "FormField" ff
+                        SET type = u.type, question = u.question, description = u.description,
+                            "isRequired" = u."isRequired", options = u.options, "order" = u."order"
+                        FROM unnest($2::int[], $3::text[], $4::text[], $5::text[], $6::bool[], $7::text[], $8::int[])
+                             AS u(id, type, question, description, "isRequired", options, "order"),
+                             "FormField" prev
+                        WHERE ff.id = u.id AND ff."formId" = $1 AND prev.id = ff.id
+                        AND (ff.type, ff.question, ff.description, ff."isRequired", ff.options, ff."order")
+                            IS DISTINCT FROM (u.type, u.question, u.description, u."isRequired", u.options, u."order")
+                        RETURNING ff.id, (prev.type, prev.options) IS DISTINCT FROM (u.type, u.options) AS "bucketsChanged"
+                    """, form_id, updates["id"], updates["type"], updates["question"], updates["description"],
+                        updates["isRequired"], updates["options"], updates["order"])
                     
-                    # Create new credit award if provided
-                    if "creditAward" in form_data and form_data["creditAward"]:
-                        credit_award_query = """
+                    inserted = await conn.fetch("""
+                        INSERT INTO "FormField" ("formId", type, question, description, "isRequired", options, "order")
+                        SELECT $1, u.type, u.question, u.description, u."isRequired", u.options, u."order"
+                        FROM unnest($2::text[], $3::text[], $4::text[], $5::bool[], $6::text[], $7::int[])
+                             AS u(type, question, description, "isRequired", options, "order")
+                        RETURNING id
+                    """, form_id, inserts["type"], inserts["question"], inserts["description"],
+                        inserts["isRequired"], inserts["options"], inserts["order"])
+                    
+                    # Credit award: upsert (a no-op when unchanged) or remove
+                    credit_award_data = form_data.get("creditAward")
+                    if credit_award_data:
+                        award_changed = await conn.fetchval("""
                             INSERT INTO "CreditAward" ("formId", "creditsAwarded", "isActive")
                             VALUES ($1, $2, $3)
-                            RETURNING id, "formId", "creditsAwarded", "isActive", "createdAt", "updatedAt"
-                        """
-                        credit_award_row = await conn.fetchrow(
-                            credit_award_query,
-                            form_id,
-                            form_data["creditAward"]["creditsAwarded"],
-                            form_data["creditAward"]["isActive"]
+                            ON CONFLICT ("formId") DO UPDATE
+                            SET "creditsAwarded" = EXCLUDED."creditsAwarded", "isActive" = EXCLUDED."isActive",
+                                "updatedAt" = CURRENT_TIMESTAMP
+                            WHERE ("CreditAward"."creditsAwarded", "CreditAward"."isActive")
+                                IS DISTINCT FROM (EXCLUDED."creditsAwarded", EXCLUDED."isActive")
+                            RETURNING id
+                        """, form_id, credit_award_data["creditsAwarded"], credit_award_data["isActive"])
+                    else:
+                        award_changed = await conn.fetchval(
+                            'DELETE FROM "CreditAward" WHERE "formId" = $1 RETURNING id', form_id
                         )
-                        credit_award = dict(credit_award_row)
                     
-                    return {
+                    children_changed = bool(deleted or updated or inserted or award_changed)
+                    form_row = await conn.fetchrow("""
+                        UPDATE "Form"
+                        SET title = $2, description = $3, "isActive" = $4, "isRequired" = $5,
+                            version = version + 1, "updatedAt" = CURRENT_TIMESTAMP
+                        WHERE id = $1
+                        AND ($6 OR (title, description, "isActive", "isRequired")
+                                   IS DISTINCT FROM ($2::varchar, $3::text, $4::bool, $5::bool))
+                        RETURNING id, "eventId", title, description, "isActive", "isRequired", "createdAt", "updatedAt", version
+                    """, form_id, form_data["title"], form_data.get("description"),
+                        form_data.get("isActive", True), form_data.get("isRequired", False), children_changed)
+                    
+                    rebucketed = [row["id"] for row in updated if row["bucketsChanged"]]
+                    if rebucketed:
+                        # Only a new type or option list changes how a field's answers are bucketed
+                        await self.rebuild_form_aggregates(form_id, conn, field_ids=rebucketed)
+                    
+                    if form_row:
+                        print(f"✅ Form {form_id} updated to version {form_row['version']} "
+                              f"(fields: {len(inserted)} added, {len(updated)} changed, {len(deleted)} removed)")
+                        await self.publish_invalidation("form", form_id, conn)
+                    else:
+                        form_row = await conn.fetchrow("""
+                            SELECT id, "eventId", title, description, "isActive", "isRequired", "createdAt", "updatedAt", version
+                            FROM "Form" WHERE id = $1
+                        """, form_id)
+                        print(f"ℹ️ Form {form_id} unchanged (version {form_row['version']})")
+                    
+                    fields = [dict(row) for row in await conn.fetch("""
+                        SELECT id, "formId", type, question, description, "isRequired", options, "order"
+                        FROM "FormField"
+                        WHERE "formId" = $1
+                        ORDER BY "order", id
+                    """, form_id)]
+                    for field in fields:
+                        if field["options"]:
+                            field["options"] = json.loads(field["options"])
+                    credit_award_row = await conn.fetchrow("""
+                        SELECT id, "formId", "creditsAwarded", "isActive", "createdAt", "updatedAt"
+                        FROM "CreditAward"
+                        WHERE "formId" = $1
+                    """, form_id)
+                    
+                    result = {
                         **dict(form_row),
                         "fields": fields,
-                        "creditAward": credit_award
+                        "creditAward": dict(credit_award_row) if credit_award_row else None
                     }
+                
+                # Evicted only after commit, so a concurrent read can't re-cache the old definition
+                self._cache.invalidate_form(form_id)
+                return result
         except Exception as e:
             print(f"❌ Error updating form: {e}")
             raise e
@@ -511,166 +800,432 @@ class FormRepository(BaseRepository):
         try:
             async with self.get_connection() as conn:
                 result = await conn.execute('DELETE FROM "Form" WHERE id = $1', form_id)
+                await self._invalidate_form(form_id, conn)
                 return result == "DELETE 1"
         except Exception as e:
             print(f"❌ Error deleting form: {e}")
             raise e
     
     # Form submission operations
-    async def submit_form(self, submission_data: dict) -> Dict[str, Any]:
-        """Submit a form"""
-        try:
+    async def submit_form(self, submission_data: dict, conn=None) -> Dict[str, Any]:
+        """
+        Submit a form in a single statement: the submission row (duplicates rejected by the
+        (formId, userId) unique constraint) plus every response via unnest. Field IDs must belong
+        to the form; otherwise nothing is written and ValueError is raised.
+        Pass conn to run inside the caller's transaction.
+        """
+        if conn is None:
             async with self.get_connection() as conn:
-                async with conn.transaction():
-                    # Check if submission already exists
-                    existing_query = """
-                        SELECT id FROM "FormSubmission" 
-                        WHERE "formId" = $1 AND "userId" = $2
-                    """
-                    existing_submission = await conn.fetchrow(
-                        existing_query,
-                        submission_data["formId"],
-                        submission_data["userId"]
-                    )
-                    
-                    if existing_submission:
-                        raise Exception("You have already submitted this form")
-                    
-                    # Create new submission
-                    submission_query = """
-                        INSERT INTO "FormSubmission" ("formId", "userId")
-                        VALUES ($1, $2)
-                        RETURNING id, "formId", "userId", "submittedAt"
-                    """
-                    submission_row = await conn.fetchrow(
-                        submission_query,
-                        submission_data["formId"],
-                        submission_data["userId"]
-                    )
-                    
-                    submission_id = submission_row["id"]
-                    
-                    # Create responses
-                    responses = []
-                    if "responses" in submission_data:
-                        for response_data in submission_data["responses"]:
-                            response_query = """
-                                INSERT INTO "FormResponse" ("submissionId", "fieldId", value)
-                                VALUES ($1, $2, $3)
-                                RETURNING id, "submissionId", "fieldId", value
-                            """
-                            response_row = await conn.fetchrow(
-                                response_query,
-                                submission_id,
-                                response_data["fieldId"],
-                                json.dumps(response_data["value"]) if isinstance(response_data["value"], (list, dict)) else str(response_data["value"])
-                            )
-                            responses.append(dict(response_row))
-                    
-                    return {
-                        **dict(submission_row),
-                        "responses": responses
-                    }
+                return await self.submit_form(submission_data, conn)
+        
+        # One answer per field (last one wins), encoded the same way as before
+        answers = {}
+        for response_data in submission_data.get("responses") or []:
+            value = response_data["value"]
+            answers[int(response_data["fieldId"])] = json.dumps(value) if isinstance(value, (list, dict)) else str(value)
+        
+        # Aggregate buckets for every type group; the query keeps the group matching each field
+        bucket_fields, bucket_groups, bucket_values = [], [], []
+        for field_id, value in answers.items():
+            candidates = [("any", bucket) for bucket in response_buckets("text", value)]
+            for group, field_type in (("multi", "checkbox"), ("choice", "select"), ("numeric", "number")):
+                candidates += [(group, bucket) for bucket in response_buckets(field_type, value)[1:]]
+            for group, bucket in candidates:
+                bucket_fields.append(field_id)
+                bucket_groups.append(group)
+                bucket_values.append(bucket)
+        
+        try:
+            row = await conn.fetchrow(SUBMIT_FORM_QUERY, submission_data["formId"], submission_data["userId"],
+                                      list(answers.keys()), list(answers.values()),
+                                      bucket_fields, bucket_groups, bucket_values, FORM_AGGREGATE_SHARDS)
+            
+            if row["invalidFieldIds"]:
+                raise ValueError(f"Fields do not belong to this form: {sorted(row['invalidFieldIds'])}")
+            if row["id"] is None:
+                raise Exception("You have already submitted this form")
+            
+            submission = dict(row)
+            submission.pop("invalidFieldIds")
+            submission["responses"] = json.loads(submission["responses"])
+            return submission
         except Exception as e:
             print(f"❌ Error submitting form: {e}")
             raise e
     
-    async def award_credits_for_form_submission(self, form_id: int, user_id: int) -> float:
-        """Award credits to user for completing a form"""
-        try:
+    async def award_credits_for_form_submission(self, form_id: int, user_id: int, conn=None) -> float:
+        """Award credits to user for completing a form (pass conn to join the caller's transaction)"""
+        if conn is None:
             async with self.get_connection() as conn:
-                # Check if this form has credit awards configured
-                credit_award_query = """
-                    SELECT ca.* FROM "CreditAward" ca 
-                    WHERE ca."formId" = $1 AND ca."isActive" = true
-                """
-                credit_award = await conn.fetchrow(credit_award_query, form_id)
-                
-                if not credit_award:
-                    print(f"ℹ️ No credit award configured for form {form_id}")
-                    return 0
-                
-                credits_to_award = credit_award["creditsAwarded"]
-                if credits_to_award <= 0:
-                    print(f"ℹ️ No credits to award for form {form_id}")
-                    return 0
-                
-                # Check if user already received credits for this form
-                existing_transaction = await conn.fetchrow("""
-                    SELECT id FROM "CreditTransaction" 
-                    WHERE "userId" = $1 AND "relatedFormId" = $2 AND type = 'earned'
-                """, user_id, form_id)
-                
-                if existing_transaction:
-                    print(f"ℹ️ User {user_id} already received credits for form {form_id}")
-                    return 0
-                
                 async with conn.transaction():
-                    # Update user's credit balance
-                    await conn.execute("""
-                        UPDATE "User" 
-                        SET credits = credits + $1, "totalCreditsEarned" = "totalCreditsEarned" + $1
-                        WHERE id = $2
-                    """, credits_to_award, user_id)
-                    
-                    # Record the credit transaction
-                    await conn.execute("""
-                        INSERT INTO "CreditTransaction" ("userId", type, amount, description, "relatedFormId")
-                        VALUES ($1, 'earned', $2, $3, $4)
-                    """, user_id, credits_to_award, f"Form completion reward", form_id)
-                    
-                    print(f"💰 Awarded {credits_to_award} credits to user {user_id} for form {form_id}")
-                    return credits_to_award
+                    return await self.award_credits_for_form_submission(form_id, user_id, conn)
+        
+        try:
+            # Check if this form has credit awards configured
+            credit_award_query = """
+                SELECT ca.* FROM "CreditAward" ca 
+                WHERE ca."formId" = $1 AND ca."isActive" = true
+            """
+            credit_award = await conn.fetchrow(credit_award_query, form_id)
+            
+            if not credit_award:
+                print(f"ℹ️ No credit award configured for form {form_id}")
+                return 0
+            
+            credits_to_award = credit_award["creditsAwarded"]
+            if credits_to_award <= 0:
+                print(f"ℹ️ No credits to award for form {form_id}")
+                return 0
+            
+            # Check if user already received credits for this form
+            existing_transaction = await conn.fetchrow("""
+                SELECT id FROM "CreditTransaction" 
+                WHERE "userId" = $1 AND "relatedFormId" = $2 AND type = 'earned'
+            """, user_id, form_id)
+            
+            if existing_transaction:
+                print(f"ℹ️ User {user_id} already received credits for form {form_id}")
+                return 0
+            
+            # Update user's credit balance
+            await conn.execute("""
+                UPDATE "User" 
+                SET credits = credits + $1, "totalCreditsEarned" = "totalCreditsEarned" + $1
+                WHERE id = $2
+            """, credits_to_award, user_id)
+            
+            # Record the credit transaction
+            await conn.execute("""
+                INSERT INTO "CreditTransaction" ("userId", type, amount, description, "relatedFormId")
+                VALUES ($1, 'earned', $2, $3, $4)
+            """, user_id, credits_to_award, f"Form completion reward", form_id)
+            
+            print(f"💰 Awarded {credits_to_award} credits to user {user_id} for form {form_id}")
+            return credits_to_award
                     
         except Exception as e:
             print(f"❌ Error awarding credits: {e}")
             raise e
     
-    async def get_form_submissions(self, form_id: int) -> List[Dict[str, Any]]:
-        """Get all submissions for a form"""
+    async def submit_public_form(self, access_token: str, responses: List[Dict[str, Any]],
+                                 user_id: Optional[int] = None, guest_email: Optional[str] = None,
+                                 guest_name: Optional[str] = None, conn=None) -> Optional[Dict[str, Any]]:
+        """
+        Public submission pipeline in one transaction: resolve the token, upsert the guest user,
+        record the submission and responses, award credits. Any failure rolls all of it back.
+        Returns None when the token is not publicly accessible; raises ValueError for bad input.
+        Pass conn to run inside the caller's transaction (the submission buffer batches these).
+        """
+        if conn is None:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    return await self.submit_public_form(access_token, responses, user_id,
+                                                         guest_email, guest_name, conn)
+        
+        try:
+            form = await conn.fetchrow("""
+                SELECT id, "eventId" FROM "Form"
+                WHERE "accessToken" = $1 AND "isActive" = true AND "allowPublicAccess" = true
+            """, access_token)
+            if not form:
+                return None
+            
+            if not user_id and guest_email:
+                user_id = await self.find_or_create_guest_user(guest_email, guest_name or "Guest User", conn)
+            if not user_id:
+                raise ValueError("User identification required")
+            
+            submission = await self.submit_form(
+                {"formId": form["id"], "userId": user_id, "responses": responses}, conn
+            )
+            credits_awarded = await self.award_credits_for_form_submission(form["id"], user_id, conn)
+            
+            return {
+                "formId": form["id"],
+                "eventId": form["eventId"],
+                "submission": submission,
+                "creditsAwarded": credits_awarded
+            }
+        except Exception as e:
+            print(f"❌ Error in public form submission: {e}")
+            raise e
+    
+    async def get_form_submissions(self, form_id: int, cursor: str = None,
+                                   limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Submissions for a form (newest first) with their responses aggregated in the same query.
+        Without limit every submission is returned; with limit the page is keyset-paginated on
+        (submittedAt, id). Raises ValueError for a malformed cursor.
+        """
+        params: List[Any] = [form_id]
+        keyset = ""
+        if cursor:
+            after_date, after_id = self._decode_submission_cursor(cursor)
+            params += [after_date, after_id]
+            keyset = 'AND (fs."submittedAt", fs.id) < ($2, $3)'
+        limit_sql = ""
+        if limit:
+            params.append(limit + 1)
+            limit_sql = f"LIMIT ${len(params)}"
+        
         try:
             async with self.get_connection() as conn:
-                query = """
+                rows = await conn.fetch(f"""
                     SELECT 
                         fs.id, fs."formId", fs."userId", fs."submittedAt",
-                        u."firstName", u."lastName", u.email
+                        u."firstName", u."lastName", u.email,
+                        COALESCE(
+                            json_agg(json_build_object(
+                                'id', fr.id,
+                                'fieldId', fr."fieldId",
+                                'value', fr.value,
+                                'question', ff.question,
+                                'type', ff.type
+                            ) ORDER BY ff."order", ff.id) FILTER (WHERE ff.id IS NOT NULL),
+                            '[]'
+                        ) AS responses
                     FROM "FormSubmission" fs
                     JOIN "User" u ON fs."userId" = u.id
-                    WHERE fs."formId" = $1
-                    ORDER BY fs."submittedAt" DESC
-                """
-                submission_rows = await conn.fetch(query, form_id)
-                
-                submissions = []
-                for submission_row in submission_rows:
-                    # Get responses for this submission
-                    responses_query = """
-                        SELECT fr.id, fr."fieldId", fr.value, ff.question, ff.type
-                        FROM "FormResponse" fr
-                        JOIN "FormField" ff ON fr."fieldId" = ff.id
-                        WHERE fr."submissionId" = $1
-                        ORDER BY ff."order", ff.id
-                    """
-                    response_rows = await conn.fetch(responses_query, submission_row["id"])
-                    
-                    responses = []
-                    for response_row in response_rows:
-                        response = dict(response_row)
-                        try:
-                            response["value"] = json.loads(response["value"])
-                        except:
-                            pass  # Keep as string if not JSON
-                        responses.append(response)
-                    
-                    submissions.append({
-                        **dict(submission_row),
-                        "responses": responses
-                    })
-                
-                return submissions
+                    LEFT JOIN "FormResponse" fr ON fr."submissionId" = fs.id
+                    LEFT JOIN "FormField" ff ON ff.id = fr."fieldId"
+                    WHERE fs."formId" = $1 {keyset}
+                    GROUP BY fs.id, u.id
+                    ORDER BY fs."submittedAt" DESC, fs.id DESC
+                    {limit_sql}
+                """, *params)
         except Exception as e:
             print(f"❌ Error getting form submissions: {e}")
             raise e
+        
+        submissions = []
+        for row in rows:
+            submission = dict(row)
+            responses = json.loads(submission["responses"])
+            for response in responses:
+                response["value"] = decode_response_value(response["type"], response["value"])
+            submission["responses"] = responses
+            submissions.append(submission)
+        
+        has_more = bool(limit) and len(submissions) > limit
+        if limit:
+            submissions = submissions[:limit]
+        next_cursor = None
+        if has_more:
+            last = submissions[-1]
+            next_cursor = self._encode_submission_cursor(last["submittedAt"], last["id"])
+        
+        return {"submissions": submissions, "nextCursor": next_cursor, "hasMore": has_more}
+    
+    async def count_form_submissions(self, form_id: int) -> int:
+        """Total number of submissions for a form"""
+        try:
+            async with self.get_connection() as conn:
+                return await conn.fetchval(
+                    'SELECT COUNT(*) FROM "FormSubmission" WHERE "formId" = $1',
+                    form_id
+                )
+        except Exception as e:
+            print(f"❌ Error counting form submissions: {e}")
+            raise e
+    
+    async def rebuild_form_aggregates(self, form_id: Optional[int] = None, conn=None,
+                                      field_ids: Optional[List[int]] = None) -> None:
+        """
+        Recompute FormFieldAggregate from the stored responses for one form, or every form when
+        form_id is None; field_ids narrows it to those fields. Reads one row per distinct
+        (field, value); the recomputed counts go into shard 0.
+        """
+        if conn is None:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    return await self.rebuild_form_aggregates(form_id, conn, field_ids)
+        
+        try:
+            rows = await conn.fetch("""
+                SELECT ff."formId", fr."fieldId", ff.type, fr.value, COUNT(*) AS count
+                FROM "FormResponse" fr
+                JOIN "FormField" ff ON ff.id = fr."fieldId"
+                WHERE ($1::int IS NULL OR ff."formId" = $1)
+                AND ($2::int[] IS NULL OR fr."fieldId" = ANY($2::int[]))
+                GROUP BY ff."formId", fr."fieldId", ff.type, fr.value
+            """, form_id, field_ids)
+            counts: Dict[tuple, int] = {}
+            for row in rows:
+                for bucket in response_buckets(row["type"], row["value"]):
+                    key = (row["formId"], row["fieldId"], bucket)
+                    counts[key] = counts.get(key, 0) + row["count"]
+            
+            await conn.execute("""
+                DELETE FROM "FormFieldAggregate"
+                WHERE ($1::int IS NULL OR "formId" = $1)
+                AND ($2::int[] IS NULL OR "fieldId" = ANY($2::int[]))
+            """, form_id, field_ids)
+            if counts:
+                keys = sorted(counts)
+                await conn.execute("""
+                    INSERT INTO "FormFieldAggregate" ("formId", "fieldId", bucket, count)
+                    SELECT * FROM unnest($1::int[], $2::int[], $3::text[], $4::int[])
+                """, [key[0] for key in keys], [key[1] for key in keys], [key[2] for key in keys],
+                    [counts[key] for key in keys])
+            scope = f"fields {field_ids} of form {form_id}" if field_ids else (form_id or "all forms")
+            print(f"✅ Rebuilt form aggregates ({len(counts)} buckets) for {scope}")
+        except Exception as e:
+            print(f"❌ Error rebuilding form aggregates: {e}")
+            raise e
+    
+    async def get_form_analytics(self, form_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Per-field analytics from FormFieldAggregate: response counts and rates, option counts for
+        choice fields, histogram and summary statistics for numeric fields. None if the form does not exist.
+        """
+        try:
+            async with self.get_connection() as conn:
+                # Counted on read (index-only over the (formId, userId) key) so submissions never
+                # update a shared per-form row
+                form_row = await conn.fetchrow("""
+                    SELECT id, title, version,
+                           (SELECT COUNT(*) FROM "FormSubmission" WHERE "formId" = $1) AS "submissionCount"
+                    FROM "Form" WHERE id = $1
+                """, form_id)
+                if not form_row:
+                    return None
+                rows = await conn.fetch("""
+                    SELECT ff.id, ff.type, ff.question, ff.options, ff."order", agg.bucket, agg.count
+                    FROM "FormField" ff
+                    LEFT JOIN (
+                        SELECT "fieldId", bucket, SUM(count)::int AS count
+                        FROM "FormFieldAggregate"
+                        WHERE "fieldId" IN (SELECT id FROM "FormField" WHERE "formId" = $1)
+                        GROUP BY "fieldId", bucket
+                    ) agg ON agg."fieldId" = ff.id
+                    WHERE ff."formId" = $1
+                    ORDER BY ff."order", ff.id
+                """, form_id)
+        except Exception as e:
+            print(f"❌ Error getting form analytics: {e}")
+            raise e
+        
+        submissions = form_row["submissionCount"]
+        fields: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            field = fields.get(row["id"])
+            if field is None:
+                field = fields[row["id"]] = {
+                    "fieldId": row["id"],
+                    "type": row["type"],
+                    "question": row["question"],
+                    "order": row["order"],
+                    "responses": 0,
+                    "_options": json.loads(row["options"]) if row["options"] else [],
+                    "_buckets": {}
+                }
+            if row["bucket"] == "":
+                field["responses"] = row["count"]
+            elif row["bucket"] is not None:
+                field["_buckets"][row["bucket"]] = row["count"]
+        
+        for field in fields.values():
+            options, buckets = field.pop("_options"), field.pop("_buckets")
+            field["responseRate"] = round(field["responses"] / submissions, 4) if submissions else 0.0
+            if field["type"] in MULTI_CHOICE_FIELD_TYPES or field["type"] in CHOICE_FIELD_TYPES:
+                # Configured options first (including unpicked ones), then any other submitted values
+                names = list(dict.fromkeys([str(option) for option in options] + list(buckets)))
+                field["options"] = [
+                    {"option": name, "count": buckets.get(name, 0),
+                     "share": round(buckets.get(name, 0) / field["responses"], 4) if field["responses"] else 0.0}
+                    for name in names
+                ]
+            elif field["type"] in NUMERIC_FIELD_TYPES:
+                values = {float(bucket): count for bucket, count in buckets.items()}
+                total = sum(values.values())
+                field["histogram"] = _numeric_histogram(values) if values else []
+                field["stats"] = {
+                    "count": total,
+                    "mean": round(sum(value * count for value, count in values.items()) / total, 4) if total else None,
+                    "min": min(values) if values else None,
+                    "max": max(values) if values else None
+                }
+        
+        return {
+            "formId": form_row["id"],
+            "title": form_row["title"],
+            "version": form_row["version"],
+            "submissions": submissions,
+            "fields": list(fields.values())
+        }
+    
+    async def submission_export_query(self, form_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Pivoted export of a form's submissions: one row per submission, one column per FormField
+        (in field order) picked out of the submission's responses with FILTER. Each submission's
+        responses are aggregated in a LATERAL subquery over the (submissionId, fieldId) index, so
+        rows stream in submission order without sorting the whole result.
+        Returns query, params, columns, headers and per-column decoders; None if the form does not exist.
+        """
+        try:
+            async with self.get_connection() as conn:
+                if not await conn.fetchval('SELECT EXISTS (SELECT 1 FROM "Form" WHERE id = $1)', form_id):
+                    return None
+                field_rows = await conn.fetch("""
+                    SELECT id, type, question FROM "FormField"
+                    WHERE "formId" = $1
+                    ORDER BY "order", id
+                """, form_id)
+        except Exception as e:
+            print(f"❌ Error preparing form submission export: {e}")
+            raise e
+        
+        columns = list(SUBMISSION_EXPORT_COLUMNS)
+        headers = list(SUBMISSION_EXPORT_COLUMNS)
+        select = [f'{expression} AS "{name}"' for name, expression in SUBMISSION_EXPORT_COLUMNS.items()]
+        pivot = []
+        decoders = {}
+        seen_questions = set()
+        for field in field_rows:
+            # Aliases use the field ID (questions are free text); the question becomes the header
+            alias = f"field_{int(field['id'])}"
+            columns.append(alias)
+            question = field["question"]
+            headers.append(question if question not in seen_questions else f"{question} [{field['id']}]")
+            seen_questions.add(question)
+            select.append(f'r."{alias}"')
+            pivot.append(f'MAX(fr.value) FILTER (WHERE fr."fieldId" = {int(field["id"])}) AS "{alias}"')
+            decoders[alias] = lambda value, field_type=field["type"]: decode_response_value(field_type, value)
+        
+        responses = ""
+        if pivot:
+            pivot_list = ",\n                    ".join(pivot)
+            responses = f"""
+            CROSS JOIN LATERAL (
+                SELECT
+                    {pivot_list}
+                FROM "FormResponse" fr
+                WHERE fr."submissionId" = fs.id
+            ) r"""
+        select_columns = ",\n            ".join(select)
+        query = f"""
+        SELECT
+            {select_columns}
+        FROM "FormSubmission" fs
+        LEFT JOIN "User" u ON u.id = fs."userId"{responses}
+        WHERE fs."formId" = $1
+        ORDER BY fs."submittedAt" ASC, fs.id ASC
+        """
+        return {"query": query, "params": [form_id], "columns": columns, "headers": headers, "decoders": decoders}
+    
+    def _encode_submission_cursor(self, submitted_at: datetime, submission_id: int) -> str:
+        """Opaque cursor for the last submission of a page"""
+        raw = json.dumps({"d": submitted_at.isoformat(), "i": submission_id})
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    
+    def _decode_submission_cursor(self, cursor: str) -> tuple:
+        """Decode a cursor; raises ValueError if it is malformed"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            return datetime.fromisoformat(data["d"]), int(data["i"])
+        except Exception:
+            raise ValueError("Invalid cursor")
     
     # Coupon operations
     async def create_coupon(self, coupon_data: dict) -> Dict[str, Any]:
@@ -770,88 +1325,46 @@ class FormRepository(BaseRepository):
             print(f"❌ Error using coupon: {e}")
             raise e
     
-    async def check_and_generate_auto_coupons(self, event_id: int) -> List[Dict[str, Any]]:
-        """Check if auto-coupons should be generated based on form submissions"""
+    async def check_and_generate_auto_coupons(self, event_id: int,
+                                              user_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Issue per-user auto-coupons for an event's trigger coupons (see AUTO_COUPON_QUERY).
+        user_ids limits issuing to the new submitters once a threshold has been crossed; None
+        re-checks every submitter. Existing codes are skipped, so repeated runs are harmless.
+        """
         try:
             async with self.get_connection() as conn:
-                # Get events that trigger coupons based on this event's submissions
-                query = """
-                    SELECT c.*, COUNT(fs.id) as submission_count
-                    FROM "Coupon" c
-                    LEFT JOIN "Form" f ON c."triggerEventId" = f."eventId"
-                    LEFT JOIN "FormSubmission" fs ON f.id = fs."formId"
-                    WHERE c."autoGenerated" = true 
-                    AND c."triggerEventId" = $1
-                    AND c."isActive" = true
-                    GROUP BY c.id
-                """
-                coupon_rows = await conn.fetch(query, event_id)
-                
-                generated_coupons = []
-                for coupon_row in coupon_rows:
-                    coupon = dict(coupon_row)
-                    required_submissions = coupon.get("requiredSubmissions", 1)
-                    current_submissions = coupon["submission_count"]
-                    
-                    if current_submissions >= required_submissions:
-                        # Generate individual coupons for users who submitted forms
-                        users_query = """
-                            SELECT DISTINCT fs."userId", u.email, u."firstName", u."lastName"
-                            FROM "FormSubmission" fs
-                            JOIN "Form" f ON fs."formId" = f.id
-                            JOIN "User" u ON fs."userId" = u.id
-                            WHERE f."eventId" = $1
-                        """
-                        user_rows = await conn.fetch(users_query, event_id)
-                        
-                        for user_row in user_rows:
-                            user_coupon_code = f"{coupon['code']}-{user_row['userId']}"
-                            
-                            # Check if user already has this coupon
-                            existing_check = await conn.fetchrow(
-                                'SELECT id FROM "Coupon" WHERE code = $1',
-                                user_coupon_code
-                            )
-                            
-                            if not existing_check:
-                                user_coupon_query = """
-                                    INSERT INTO "Coupon" (
-                                        code, name, description, "discountType", "discountValue",
-                                        "minAmount", "maxUses", "isActive", "expiresAt", "autoGenerated"
-                                    )
-                                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-                                    RETURNING *
-                                """
-                                # Ensure discount values are float
-                                discount_value = float(coupon["discountValue"])
-                                min_amount = float(coupon["minAmount"]) if coupon["minAmount"] else None
-                                
-                                user_coupon = await conn.fetchrow(
-                                    user_coupon_query,
-                                    user_coupon_code,
-                                    f"{coupon['name']} - {user_row['firstName']}",
-                                    f"Auto-generated for {user_row['firstName']} {user_row['lastName']}",
-                                    coupon["discountType"],
-                                    discount_value,
-                                    min_amount,
-                                    1,  # maxUses = 1 for individual coupons
-                                    True,
-                                    coupon["expiresAt"],
-                                    True
-                                )
-                                generated_coupons.append({
-                                    **dict(user_coupon),
-                                    "userId": user_row["userId"],
-                                    "userEmail": user_row["email"]
-                                })
-                
-                return generated_coupons
+                async with conn.transaction():
+                    # Lock the coupons still below threshold first: a concurrent run then waits and
+                    # sees the crossing (and its submitters) in the next statement's snapshot
+                    await conn.execute("""
+                        SELECT id FROM "Coupon"
+                        WHERE "autoGenerated" = true AND "triggerEventId" = $1 AND "isActive" = true
+                        AND "thresholdReachedAt" IS NULL
+                        FOR UPDATE
+                    """, event_id)
+                    rows = await conn.fetch(AUTO_COUPON_QUERY, event_id, user_ids)
+                return [dict(row) for row in rows]
         except Exception as e:
             print(f"❌ Error checking auto-coupons: {e}")
             raise e
     
-    async def get_form_by_token(self, access_token: str) -> Optional[Dict[str, Any]]:
-        """Get form by access token for public access"""
+    async def get_form_by_token(self, access_token: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Get form by access token for public access (cached)"""
+        cache = self._cache.definitions
+        key = ("token", access_token)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not MISS:
+                return cached
+        
+        version = cache.version_of(FORMS_SCOPE)
+        form = await self._fetch_form_by_token(access_token)
+        cache.put(key, form, FORMS_SCOPE, version)
+        return form
+    
+    async def _fetch_form_by_token(self, access_token: str) -> Optional[Dict[str, Any]]:
+        """Load a publicly accessible form and its fields from the database"""
         try:
             async with self.get_connection() as conn:
                 query = """
@@ -889,6 +1402,39 @@ class FormRepository(BaseRepository):
             print(f"❌ Error getting form by token: {e}")
             raise e
     
+    async def get_public_form_fingerprint(self, access_token: str) -> Optional[tuple]:
+        """Cheap change marker for a public form and its event (None if not publicly accessible)"""
+        try:
+            async with self.get_connection() as conn:
+                row = await conn.fetchrow("""
+                    SELECT f.id, f.version, e."updatedAt" AS "eventUpdatedAt"
+                    FROM "Form" f
+                    LEFT JOIN "Event" e ON e.id = f."eventId"
+                    WHERE f."accessToken" = $1
+                    AND f."isActive" = true
+                    AND f."allowPublicAccess" = true
+                """, access_token)
+                return tuple(row) if row else None
+        except Exception as e:
+            print(f"❌ Error getting public form fingerprint: {e}")
+            return None
+    
+    async def get_form_qr_targets(self, form_ids: List[int]) -> List[Dict[str, Any]]:
+        """Access token, title and event name/date for each form, in one query (missing forms are skipped)"""
+        try:
+            async with self.get_connection() as conn:
+                rows = await conn.fetch("""
+                    SELECT f.id, f.title, f."accessToken", e.name AS "eventName", e.date AS "eventDate"
+                    FROM "Form" f
+                    LEFT JOIN "Event" e ON e.id = f."eventId"
+                    WHERE f.id = ANY($1::int[])
+                    ORDER BY array_position($1::int[], f.id)
+                """, form_ids)
+                return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"❌ Error getting form QR targets: {e}")
+            raise e
+    
     async def get_event_by_id(self, event_id: int) -> Optional[Dict[str, Any]]:
         """Get event by ID"""
         try:
@@ -900,48 +1446,68 @@ class FormRepository(BaseRepository):
             print(f"❌ Error getting event by ID: {e}")
             raise e
     
-    async def find_or_create_guest_user(self, email: str, name: str) -> int:
-        """Find existing user by email or create a guest user entry"""
-        try:
+    async def find_or_create_guest_user(self, email: str, name: str, conn=None) -> int:
+        """Find existing user by email or create a guest user entry (single upsert on the email key)"""
+        if conn is None:
             async with self.get_connection() as conn:
-                # First try to find existing user by email
-                existing_user_query = 'SELECT id FROM "User" WHERE email = $1'
-                existing_user = await conn.fetchrow(existing_user_query, email)
-                
-                if existing_user:
-                    return existing_user["id"]
-                
-                # Create guest user if not found
-                name_parts = name.split(' ', 1)
-                first_name = name_parts[0]
-                last_name = name_parts[1] if len(name_parts) > 1 else ""
-                
-                guest_user_query = """
+                return await self.find_or_create_guest_user(email, name, conn)
+        
+        try:
+            name_parts = name.split(' ', 1)
+            first_name = name_parts[0]
+            last_name = name_parts[1] if len(name_parts) > 1 else ""
+            
+            # DO NOTHING + fallback SELECT: returning users don't rewrite their row
+            guest_user_query = """
+                WITH created AS (
                     INSERT INTO "User" (
                         email, "firstName", "lastName", major, "graduationYear", 
                         "currentYear", university, "cognitoSub"
                     )
                     VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                    ON CONFLICT (email) DO NOTHING
                     RETURNING id
-                """
-                guest_user = await conn.fetchrow(
-                    guest_user_query,
-                    email,
-                    first_name,
-                    last_name,
-                    "Unknown",  # major
-                    2024,  # graduationYear - default
-                    "Guest",  # currentYear
-                    "Unknown",  # university
-                    f"guest-{email}"  # cognitoSub - unique identifier for guests
                 )
-                return guest_user["id"]
+                SELECT id FROM created
+                UNION ALL
+                SELECT id FROM "User" WHERE email = $1
+                LIMIT 1
+            """
+            user_id = await conn.fetchval(
+                guest_user_query,
+                email,
+                first_name,
+                last_name,
+                "Unknown",  # major
+                2024,  # graduationYear - default
+                "Guest",  # currentYear
+                "Unknown",  # university
+                f"guest-{email}"  # cognitoSub - unique identifier for guests
+            )
+            if user_id is None:
+                # A concurrent insert committed after this statement's snapshot was taken
+                user_id = await conn.fetchval('SELECT id FROM "User" WHERE email = $1', email)
+            return user_id
         except Exception as e:
             print(f"❌ Error finding or creating guest user: {e}")
             raise e
     
-    async def get_form_by_id(self, form_id: int) -> Optional[Dict[str, Any]]:
-        """Get form by ID"""
+    async def get_form_by_id(self, form_id: int, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Get form by ID (cached)"""
+        cache = self._cache.definitions
+        key = ("id", form_id)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not MISS:
+                return cached
+        
+        version = cache.version_of(form_id)
+        form = await self._fetch_form_by_id(form_id)
+        cache.put(key, form, form_id, version)
+        return form
+    
+    async def _fetch_form_by_id(self, form_id: int) -> Optional[Dict[str, Any]]:
+        """Load a form and its fields from the database"""
         try:
             async with self.get_connection() as conn:
                 query = """
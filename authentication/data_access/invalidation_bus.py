@@ -0,0 +1,106 @@
+# authentication/data_access/invalidation_bus.py
+import os
+import json
+import uuid
+import logging
+from typing import Any, Callable, Dict, List, Optional
+from .database_pool import get_pool_manager
+
+logger = logging.getLogger(__name__)
+
+# Channel shared by every worker / container connected to the same database
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "utjn_cache_invalidation")
+
+class InvalidationBus:
+    """
+    キャッシュ無効化バス（Postgres LISTEN/NOTIFY）
+    書き込み側は pg_notify で {entity, id, origin} を送り、各ワーカーが該当キーを破棄する。
+    LISTEN 接続が切れていた間の通知は失われるため、再接続時はキャッシュを全て破棄する
+    """
+
+    def __init__(self):
+        # Identifies this process so it can skip its own notifications (already evicted locally)
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Callable[[Optional[Any]], None]]] = {}
+        self._flush_handlers: List[Callable[[], None]] = []
+        self._received = 0
+        self._flushes = 0
+        self._started = False
+
+    def subscribe(self, entity: str, handler: Callable[[Optional[Any]], None]) -> None:
+        """Register a handler called with the entity id (None means every entity of that type)"""
+        self._handlers.setdefault(entity, []).append(handler)
+
+    def on_flush(self, handler: Callable[[], None]) -> None:
+        """Register a handler that drops a whole cache after a reconnect gap"""
+        self._flush_handlers.append(handler)
+
+    def build_payload(self, entity: str, entity_id: Optional[Any] = None) -> str:
+        """NOTIFY payload for an entity change"""
+        return json.dumps({"entity": entity, "id": entity_id, "origin": self.origin})
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        """asyncpg listener callback"""
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ Ignoring malformed invalidation payload: {payload!r}")
+            return
+
+        if message.get("origin") == self.origin:
+            return
+
+        self._received += 1
+        for handler in self._handlers.get(message.get("entity"), []):
+            try:
+                handler(message.get("id"))
+            except Exception as e:
+                logger.error(f"❌ Invalidation handler failed for {message}: {e}")
+
+    def flush_all(self) -> None:
+        """Drop every registered cache"""
+        self._flushes += 1
+        for handler in self._flush_handlers:
+            try:
+                handler()
+            except Exception as e:
+                logger.error(f"❌ Cache flush handler failed: {e}")
+        logger.info("🔄 Caches flushed after (re)subscribing to invalidation channel")
+
+    async def start(self) -> None:
+        """Open the dedicated LISTEN connection (reconnects automatically)"""
+        await get_pool_manager().start_listener(INVALIDATION_CHANNEL, self._on_notification, self.flush_all)
+        self._started = True
+
+    async def stop(self) -> None:
+        """Close the LISTEN connection"""
+        await get_pool_manager().stop_listener()
+        self._started = False
+
+    def get_stats(self) -> dict:
+        """バスの統計を取得"""
+        return {
+            "channel": INVALIDATION_CHANNEL,
+            "started": self._started,
+            "entities": sorted(self._handlers.keys()),
+            "received": self._received,
+            "flushes": self._flushes
+        }
+
+# グローバルインスタンス
+_invalidation_bus = None
+
+def get_invalidation_bus() -> InvalidationBus:
+    """グローバル無効化バスを取得"""
+    global _invalidation_bus
+    if _invalidation_bus is None:
+        _invalidation_bus = InvalidationBus()
+    return _invalidation_bus
+
+async def start_invalidation_bus() -> None:
+    """無効化バスを開始"""
+    await get_invalidation_bus().start()
+
+async def stop_invalidation_bus() -> None:
+    """無効化バスを停止"""
+    await get_invalidation_bus().stop()
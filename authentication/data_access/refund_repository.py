@@ -166,6 +166,12 @@ class RefundRepository(BaseRepository):
                         print("✅ paymentId column added to RefundRequest table")
                     else:
                         print("✅ paymentId column already exists in RefundRequest table")
+                
+                # Latest request per registration (profile page refund status lookup)
+                await conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_refund_user_event_date
+                    ON "RefundRequest"("userId", "eventId", "requestDate" DESC);
+                """)
                     
             except Exception as e:
                 print(f"❌ Error ensuring refund tables exist: {e}")
@@ -0,0 +1,385 @@
+# authentication/data_access/submission_buffer.py
+import os
+import json
+import uuid
+import fcntl
+import asyncio
+import logging
+import asyncpg
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from .database_pool import get_global_connection
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: public submissions are acknowledged with a receipt and written in batches
+SUBMISSION_BUFFER_ENABLED = os.getenv("SUBMISSION_BUFFER_ENABLED", "false").lower() == "true"
+# One append log per worker lives here (must survive restarts: mount a volume in production)
+SUBMISSION_BUFFER_DIR = os.getenv("SUBMISSION_BUFFER_DIR", "buffer/submissions")
+# Submissions held at once; beyond this the endpoint answers 503 instead of growing without bound
+SUBMISSION_BUFFER_MAX_PENDING = int(os.getenv("SUBMISSION_BUFFER_MAX_PENDING", "5000"))
+SUBMISSION_BUFFER_FLUSH_MS = int(os.getenv("SUBMISSION_BUFFER_FLUSH_MS", "200"))
+# Submissions per database transaction
+SUBMISSION_BUFFER_BATCH_SIZE = int(os.getenv("SUBMISSION_BUFFER_BATCH_SIZE", "200"))
+# Database errors are usually transient (deadlock, cancelled query): retry an entry this many times before failing it
+SUBMISSION_BUFFER_MAX_ATTEMPTS = int(os.getenv("SUBMISSION_BUFFER_MAX_ATTEMPTS", "5"))
+# Finished receipts kept for GET /forms/public/receipts/{id}
+SUBMISSION_RECEIPT_HISTORY = int(os.getenv("SUBMISSION_RECEIPT_HISTORY", "20000"))
+
+class SubmissionBufferFull(Exception):
+    """The pending queue is at SUBMISSION_BUFFER_MAX_PENDING"""
+    pass
+
+class DuplicateBufferedSubmission(Exception):
+    """The same person already has a submission for this form waiting in the buffer"""
+    pass
+
+def submission_key(access_token: str, user_id: Optional[int], guest_email: Optional[str]) -> Optional[str]:
+    """Who is submitting which form (None when the request identifies nobody)"""
+    if user_id:
+        return f"{access_token}:user:{user_id}"
+    if guest_email:
+        return f"{access_token}:guest:{guest_email.strip().lower()}"
+    return None
+
+class SubmissionBuffer:
+    """
+    公開フォーム送信のライトビハインドバッファ（チェックイン時の集中アクセス用）
+    送信はまず追記ログに fsync してから受付IDを返し、flush_ms ごとにまとめて1トランザクションで書き込む。
+    書き込みは (formId, userId) の一意制約で冪等なので、クラッシュ後はログに残った未完了分を再送するだけでよい
+    """
+
+    def __init__(self, log_dir: str = SUBMISSION_BUFFER_DIR, max_pending: int = SUBMISSION_BUFFER_MAX_PENDING,
+                 flush_ms: int = SUBMISSION_BUFFER_FLUSH_MS, batch_size: int = SUBMISSION_BUFFER_BATCH_SIZE):
+        self.log_dir = log_dir
+        self.max_pending = max_pending
+        self.flush_ms = flush_ms
+        self.batch_size = batch_size
+        self.log_path = os.path.join(log_dir, f"submissions-{uuid.uuid4().hex}.log")
+        self._log_file = None
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._keys: Dict[str, str] = {}
+        self._receipts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._log_waiters: List[tuple] = []
+        self._log_task: Optional[asyncio.Task] = None
+        self._log_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._stats = {"accepted": 0, "duplicates": 0, "rejectedFull": 0, "written": 0,
+                       "batches": 0, "failedBatches": 0, "retried": 0, "failed": 0, "recovered": 0}
+
+    # ─── append log ─────────────────────────────────────
+    def _open_log(self) -> None:
+        os.makedirs(self.log_dir, exist_ok=True)
+        # Created and locked under a name recovery ignores, so no other worker ever sees it unlocked
+        tmp_path = self.log_path + ".tmp"
+        log_file = open(tmp_path, "a", encoding="utf-8")
+        try:
+            # Held for the life of the process; an unlocked log belongs to a worker that died
+            fcntl.flock(log_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.rename(tmp_path, self.log_path)
+        except Exception:
+            log_file.close()
+            raise
+        self._log_file = log_file
+
+    def _write_lines(self, lines: List[str], sync: bool) -> None:
+        self._log_file.write("".join(lines))
+        self._log_file.flush()
+        if sync:
+            os.fsync(self._log_file.fileno())
+
+    async def _append_log(self, record: Dict[str, Any], sync: bool = True) -> None:
+        """Append one record; concurrent callers share a single write + fsync (group commit)"""
+        record = {key: value for key, value in record.items() if key != "durable"}
+        future = asyncio.get_running_loop().create_future()
+        self._log_waiters.append((json.dumps(record, default=str) + "\n", sync, future))
+        if self._log_task is None or self._log_task.done():
+            self._log_task = asyncio.create_task(self._drain_log())
+        await future
+
+    async def _drain_log(self) -> None:
+        async with self._log_lock:
+            while self._log_waiters:
+                waiters, self._log_waiters = self._log_waiters, []
+                try:
+                    await asyncio.to_thread(self._write_lines, [line for line, _, _ in waiters],
+                                            any(sync for _, sync, _ in waiters))
+                except Exception as e:
+                    for _, _, future in waiters:
+                        future.set_exception(e)
+                    continue
+                for _, _, future in waiters:
+                    future.set_result(None)
+
+    async def _compact_log(self) -> None:
+        """Truncate the log once nothing is pending (everything in it has been written)"""
+        async with self._log_lock:
+            if self._pending or self._log_waiters:
+                return
+            await asyncio.to_thread(self._log_file.truncate, 0)
+
+    def _read_log(self, path: str) -> List[Dict[str, Any]]:
+        """Entries in a log that were enqueued but never marked done (a torn last line is skipped)"""
+        entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ Skipping torn submission log line in {path}")
+                    continue
+                if record.get("op") == "enqueue":
+                    entries[record["receiptId"]] = record
+                elif record.get("op") == "done":
+                    for receipt_id in record.get("receiptIds", []):
+                        entries.pop(receipt_id, None)
+        return list(entries.values())
+
+    async def _recover(self) -> None:
+        """Adopt logs left behind by crashed workers: re-log their pending entries here, then delete them"""
+        for name in sorted(os.listdir(self.log_dir)):
+            path = os.path.join(self.log_dir, name)
+            if path == self.log_path or not name.endswith(".log"):
+                continue
+            try:
+                orphan = open(path)
+            except FileNotFoundError:
+                continue  # another worker adopted it first
+            with orphan:
+                try:
+                    fcntl.flock(orphan.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # a live worker owns it
+                try:
+                    if os.stat(path).st_ino != os.fstat(orphan.fileno()).st_ino:
+                        continue  # adopted and removed between our open and lock
+                except FileNotFoundError:
+                    continue
+                entries = await asyncio.to_thread(self._read_log, path)
+                for entry in entries:
+                    self._track(entry)
+                    await self._append_log(entry)
+                    entry["durable"] = True
+                os.remove(path)
+            if entries:
+                self._stats["recovered"] += len(entries)
+                print(f"♻️ Recovered {len(entries)} buffered submissions from {name}")
+
+    # ─── queue ──────────────────────────────────────────
+    def _track(self, entry: Dict[str, Any]) -> None:
+        entry["durable"] = False
+        self._pending[entry["receiptId"]] = entry
+        if entry.get("key"):
+            self._keys[entry["key"]] = entry["receiptId"]
+
+    def _untrack(self, entry: Dict[str, Any]) -> None:
+        self._pending.pop(entry["receiptId"], None)
+        if entry.get("key") and self._keys.get(entry["key"]) == entry["receiptId"]:
+            del self._keys[entry["key"]]
+
+    async def enqueue(self, access_token: str, responses: List[Dict[str, Any]], user_id: Optional[int] = None,
+                      guest_email: Optional[str] = None, guest_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Accept a public submission. Returns the receipt once the entry is on disk.
+        Raises ValueError without user identification, DuplicateBufferedSubmission if the same
+        person is already queued for the form, SubmissionBufferFull when the queue is at capacity.
+        """
+        key = submission_key(access_token, user_id, guest_email)
+        if key is None:
+            raise ValueError("User identification required")
+        if key in self._keys:
+            self._stats["duplicates"] += 1
+            raise DuplicateBufferedSubmission("You have already submitted this form")
+        if len(self._pending) >= self.max_pending:
+            self._stats["rejectedFull"] += 1
+            raise SubmissionBufferFull("Submission queue is full, please retry shortly")
+
+        entry = {
+            "op": "enqueue",
+            "receiptId": uuid.uuid4().hex,
+            "key": key,
+            "accessToken": access_token,
+            "responses": responses,
+            "userId": user_id,
+            "guestEmail": guest_email,
+            "guestName": guest_name,
+            "queuedAt": datetime.now().isoformat()
+        }
+        # Tracked before logging so a concurrent compaction can't truncate the line away
+        self._track(entry)
+        try:
+            await self._append_log(entry)
+        except Exception as e:
+            self._untrack(entry)
+            print(f"❌ Error writing submission log: {e}")
+            raise e
+        entry["durable"] = True
+        self._stats["accepted"] += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return {"receiptId": entry["receiptId"], "status": "queued", "queuedAt": entry["queuedAt"]}
+
+    def get_receipt(self, receipt_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a receipt issued by this worker (None if unknown or expired)"""
+        entry = self._pending.get(receipt_id)
+        if entry is not None:
+            return {"receiptId": receipt_id, "status": "queued", "queuedAt": entry["queuedAt"]}
+        return self._receipts.get(receipt_id)
+
+    def _finish(self, entry: Dict[str, Any], status: str, **details) -> None:
+        self._receipts[entry["receiptId"]] = {"receiptId": entry["receiptId"], "status": status,
+                                              "queuedAt": entry["queuedAt"], **details}
+        while len(self._receipts) > SUBMISSION_RECEIPT_HISTORY:
+            self._receipts.popitem(last=False)
+
+    # ─── flushing ───────────────────────────────────────
+    async def _flush_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Write a batch in one transaction; each submission gets a savepoint so one bad entry can't sink the rest"""
+        # Imported here: the form repository pulls in the cache modules this one is imported from
+        from .form_repository import FormRepository
+        form_repo = FormRepository()
+        outcomes = []
+        async with get_global_connection() as conn:
+            async with conn.transaction():
+                for entry in batch:
+                    try:
+                        async with conn.transaction():
+                            result = await form_repo.submit_public_form(
+                                entry["accessToken"], entry["responses"], user_id=entry["userId"],
+                                guest_email=entry["guestEmail"], guest_name=entry["guestName"], conn=conn
+                            )
+                        if result is None:
+                            outcomes.append((entry, "not_found", {"detail": "Form not found or not accessible"}))
+                        else:
+                            outcomes.append((entry, "submitted", {
+                                "eventId": result["eventId"],
+                                "submission": result["submission"],
+                                "creditsAwarded": result["creditsAwarded"]
+                            }))
+                    except ValueError as e:
+                        outcomes.append((entry, "rejected", {"detail": str(e)}))
+                    except asyncpg.PostgresError as e:
+                        outcomes.append((entry, "retry", {"detail": str(e)}))
+                    except Exception as e:
+                        if "You have already submitted this form" not in str(e):
+                            raise e
+                        outcomes.append((entry, "duplicate", {"detail": "You have already submitted this form"}))
+
+        # Committed: a crash before the done record only replays entries the unique constraint absorbs
+        submitters: Dict[int, List[int]] = {}
+        done = []
+        for entry, status, details in outcomes:
+            if status == "retry":
+                entry["attempts"] = entry.get("attempts", 0) + 1
+                if entry["attempts"] < SUBMISSION_BUFFER_MAX_ATTEMPTS:
+                    # Stays pending (and in the log) for the next tick
+                    self._stats["retried"] += 1
+                    continue
+                status = "failed"
+                self._stats["failed"] += 1
+                print(f"❌ Giving up on buffered submission {entry['receiptId']} after {entry['attempts']} attempts: {details['detail']}")
+            self._untrack(entry)
+            self._finish(entry, status, **details)
+            done.append(entry["receiptId"])
+            if status == "submitted" and details["eventId"]:
+                submitters.setdefault(details["eventId"], []).append(details["submission"]["userId"])
+        self._stats["written"] += len(done)
+        self._stats["batches"] += 1
+        if done:
+            await self._append_log({"op": "done", "receiptIds": done}, sync=False)
+
+        for event_id, user_ids in submitters.items():
+            try:
+                generated_coupons = await form_repo.check_and_generate_auto_coupons(event_id, user_ids)
+                if generated_coupons:
+                    print(f"🎟️ Generated {len(generated_coupons)} auto-coupons for buffered submissions")
+            except Exception as e:
+                print(f"❌ Auto-coupon generation failed for event {event_id}: {e}")
+
+    async def flush(self) -> None:
+        """Write every durable pending entry, batch by batch (each entry is tried at most once per call)"""
+        attempted = set()
+        while True:
+            batch = [entry for entry in self._pending.values()
+                     if entry["durable"] and entry["receiptId"] not in attempted][:self.batch_size]
+            if not batch:
+                break
+            attempted.update(entry["receiptId"] for entry in batch)
+            try:
+                await self._flush_batch(batch)
+            except Exception as e:
+                # Entries stay pending and are retried on the next tick
+                self._stats["failedBatches"] += 1
+                print(f"❌ Error flushing {len(batch)} buffered submissions: {e}")
+                return
+        if not self._pending:
+            await self._compact_log()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    @property
+    def started(self) -> bool:
+        return self._log_file is not None
+
+    async def start(self) -> None:
+        """Open this worker's log, replay orphaned logs, start the flush loop"""
+        self._open_log()
+        await self._recover()
+        self._flusher = asyncio.create_task(self._run())
+        print(f"✅ Submission buffer started ({self.log_path}, every {self.flush_ms}ms)")
+
+    async def stop(self) -> None:
+        """Stop the loop and write what is left; anything still pending stays in the log for the next start"""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+            if not self._pending:
+                os.remove(self.log_path)
+
+    def get_stats(self) -> dict:
+        """バッファの統計を取得"""
+        return {
+            "enabled": SUBMISSION_BUFFER_ENABLED,
+            "pending": len(self._pending),
+            "maxPending": self.max_pending,
+            "flushMs": self.flush_ms,
+            "batchSize": self.batch_size,
+            **self._stats
+        }
+
+# グローバルインスタンス
+_submission_buffer = None
+
+def get_submission_buffer() -> SubmissionBuffer:
+    """グローバル送信バッファを取得"""
+    global _submission_buffer
+    if _submission_buffer is None:
+        _submission_buffer = SubmissionBuffer()
+    return _submission_buffer
+
+async def start_submission_buffer() -> None:
+    """Start the buffer when SUBMISSION_BUFFER_ENABLED is set"""
+    if SUBMISSION_BUFFER_ENABLED:
+        await get_submission_buffer().start()
+
+async def stop_submission_buffer() -> None:
+    """Flush and close the buffer if it was started"""
+    if _submission_buffer is not None and _submission_buffer.started:
+        await _submission_buffer.stop()
@@ -0,0 +1,369 @@
+# authentication/data_access/waitlist_repository.py
+import os
+import asyncio
+from typing import Optional, Dict, Any, List
+from .base_repository import BaseRepository
+
+# How long a promoted user's seat is held before it is offered to the next person
+WAITLIST_HOLD_MINUTES = int(os.getenv("WAITLIST_HOLD_MINUTES", "60"))
+
+# Namespace for pg_advisory_xact_lock so promotions for the same event never overlap
+WAITLIST_LOCK_NAMESPACE = 26
+
+# How often expired holds are released and their seats offered to the queue, even with no traffic
+WAITLIST_SWEEP_SECONDS = int(os.getenv("WAITLIST_SWEEP_SECONDS", "60"))
+
+class WaitlistRepository(BaseRepository):
+    """
+    イベントのキャンセル待ちリスト
+    満席時はリトライさせずに一度だけ登録し、席が空いたら先頭から予約枠に昇格させる
+    """
+
+    def __init__(self):
+        super().__init__()
+
+    async def ensure_tables_exist(self):
+        """Ensure EventWaitlist table and its queue index exist"""
+        try:
+            async with self.get_connection() as conn:
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS "EventWaitlist" (
+                        id SERIAL PRIMARY KEY,
+                        "eventId" INTEGER NOT NULL REFERENCES "Event"(id) ON DELETE CASCADE,
+                        "userId" INTEGER NOT NULL REFERENCES "User"(id) ON DELETE CASCADE,
+                        "tierId" INTEGER,
+                        "paymentEmail" TEXT,
+                        status VARCHAR(20) NOT NULL DEFAULT 'waiting',
+                        "reservationId" VARCHAR(255),
+                        "queuedAt" TIMESTAMP NOT NULL DEFAULT NOW(),
+                        "promotedAt" TIMESTAMP,
+                        UNIQUE ("eventId", "userId")
+                    )
+                """)
+                # Partial index: popping the head of an event's queue is an index seek, not a scan
+                await conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_waitlist_queue
+                    ON "EventWaitlist"("eventId", "queuedAt", id)
+                    WHERE status = 'waiting'
+                """)
+                await conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_waitlist_reservation
+                    ON "EventWaitlist"("reservationId")
+                    WHERE "reservationId" IS NOT NULL
+                """)
+        except Exception as e:
+            print(f"❌ Error ensuring waitlist table exists: {e}")
+            raise e
+
+    async def join_waitlist(self, event_id: int, user_id: int, tier_id: int = None,
+                            payment_email: str = None) -> Dict[str, Any]:
+        """Add a user to the back of an event's waitlist (idempotent)"""
+        try:
+            async with self.get_connection() as conn:
+                # Re-joining after a cancelled/expired entry moves the user to the back of the queue;
+                # an entry that is still waiting or promoted is returned unchanged
+                row = await conn.fetchrow("""
+                    INSERT INTO "EventWaitlist" ("eventId", "userId", "tierId", "paymentEmail")
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT ("eventId", "userId") DO UPDATE
+                    SET status = 'waiting', "tierId" = EXCLUDED."tierId",
+                        "paymentEmail" = EXCLUDED."paymentEmail", "queuedAt" = NOW(),
+                        "reservationId" = NULL, "promotedAt" = NULL
+                    WHERE "EventWaitlist".status NOT IN ('waiting', 'promoted')
+                    RETURNING *
+                """, event_id, user_id, tier_id, payment_email)
+
+                if not row:
+                    row = await conn.fetchrow(
+                        'SELECT * FROM "EventWaitlist" WHERE "eventId" = $1 AND "userId" = $2',
+                        event_id, user_id
+                    )
+
+                entry = dict(row)
+                entry['position'] = await self._get_position(conn, entry)
+                print(f"✅ User {user_id} is on the waitlist for event {event_id} (status: {entry['status']}, position: {entry['position']})")
+                return entry
+        except Exception as e:
+            print(f"❌ Error joining waitlist: {e}")
+            raise e
+
+    async def leave_waitlist(self, event_id: int, user_id: int) -> bool:
+        """Remove a user from the waitlist; a held seat is released to the next person"""
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    row = await conn.fetchrow("""
+                        UPDATE "EventWaitlist"
+                        SET status = 'cancelled'
+                        WHERE "eventId" = $1 AND "userId" = $2 AND status IN ('waiting', 'promoted')
+                        RETURNING status, "reservationId"
+                    """, event_id, user_id)
+
+                    if not row:
+                        return False
+
+                    if row['reservationId']:
+                        await conn.execute(
+                            'DELETE FROM "EventReservation" WHERE id = $1',
+                            row['reservationId']
+                        )
+
+            if row['reservationId']:
+                await self.publish_capacity_change(event_id)
+                await self.promote_waitlisted(event_id)
+            return True
+        except Exception as e:
+            print(f"❌ Error leaving waitlist: {e}")
+            raise e
+
+    async def get_waitlist_entry(self, event_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get a user's waitlist entry with queue position and held reservation"""
+        try:
+            async with self.get_connection() as conn:
+                row = await conn.fetchrow("""
+                    SELECT w.*, r."expiresAt" AS "holdExpiresAt"
+                    FROM "EventWaitlist" w
+                    LEFT JOIN "EventReservation" r ON r.id = w."reservationId"
+                    WHERE w."eventId" = $1 AND w."userId" = $2
+                """, event_id, user_id)
+
+                if not row:
+                    return None
+
+                entry = dict(row)
+                entry['position'] = await self._get_position(conn, entry)
+                return entry
+        except Exception as e:
+            print(f"❌ Error getting waitlist entry: {e}")
+            raise e
+
+    async def get_event_waitlist(self, event_id: int) -> List[Dict[str, Any]]:
+        """Get all active waitlist entries for an event in queue order (admin view)"""
+        try:
+            async with self.get_connection() as conn:
+                rows = await conn.fetch("""
+                    SELECT w.*, u."firstName", u."lastName", u.email
+                    FROM "EventWaitlist" w
+                    JOIN "User" u ON u.id = w."userId"
+                    WHERE w."eventId" = $1 AND w.status IN ('waiting', 'promoted')
+                    ORDER BY w.status DESC, w."queuedAt", w.id
+                """, event_id)
+                return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"❌ Error getting event waitlist: {e}")
+            raise e
+
+    async def _get_position(self, conn, entry: Dict[str, Any]) -> Optional[int]:
+        """1-based queue position for a waiting entry (None once promoted or removed)"""
+        if entry['status'] != 'waiting':
+            return None
+        return await conn.fetchval("""
+            SELECT COUNT(*) FROM "EventWaitlist"
+            WHERE "eventId" = $1 AND status = 'waiting'
+            AND ("queuedAt", id) <= ($2, $3)
+        """, entry['eventId'], entry['queuedAt'], entry['id'])
+
+    async def promote_waitlisted(self, event_id: int) -> List[Dict[str, Any]]:
+        """
+        Promote as many waiting users as there are free seats into reservation holds.
+        Free seats = capacity - registrations - active reservations, so existing holds
+        (including earlier promotions) are respected. Users waiting for a ticket tier are only
+        promoted while that tier has seats too; the hold carries the tier's (or event's) price.
+        """
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    # Serialize promotions per event so two releases can't hand out the same seat
+                    await conn.execute(
+                        'SELECT pg_advisory_xact_lock($1, $2)',
+                        WAITLIST_LOCK_NAMESPACE, event_id
+                    )
+
+                    rows = await conn.fetch("""
+                        WITH free AS (
+                            SELECT GREATEST(
+                                e.capacity
+                                - (SELECT COUNT(*) FROM "EventRegistration" WHERE "eventId" = $1)
+                                - (SELECT COUNT(*) FROM "EventReservation" WHERE "eventId" = $1 AND "expiresAt" > NOW()),
+                                0
+                            ) AS seats
+                            FROM "Event" e
+                            WHERE e.id = $1
+                        ),
+                        tier_free AS (
+                            -- Free seats per tier of the event, computed once
+                            SELECT tt.id AS "tierId",
+                                   GREATEST(tt.capacity - COALESCE(r.registered, 0) - COALESCE(h.held, 0), 0) AS seats
+                            FROM "TicketTier" tt
+                            LEFT JOIN (
+                                SELECT "ticketTierId", COUNT(*) AS registered
+                                FROM "EventRegistration"
+                                WHERE "eventId" = $1
+                                GROUP BY "ticketTierId"
+                            ) r ON r."ticketTierId" = tt.id
+                            LEFT JOIN (
+                                SELECT "tierId", COUNT(*) AS held
+                                FROM "EventReservation"
+                                WHERE "eventId" = $1 AND "expiresAt" > NOW()
+                                GROUP BY "tierId"
+                            ) h ON h."tierId" = tt.id
+                            WHERE tt."eventId" = $1
+                        ),
+                        -- Each pop is a LIMITed seek on idx_waitlist_queue: only rows that can be promoted are read and locked
+                        untiered AS (
+                            SELECT w.id, w."queuedAt"
+                            FROM "EventWaitlist" w
+                            WHERE w."eventId" = $1 AND w.status = 'waiting' AND w."tierId" IS NULL
+                            ORDER BY w."queuedAt", w.id
+                            LIMIT (SELECT seats FROM free)
+                            FOR UPDATE SKIP LOCKED
+                        ),
+                        tiered AS (
+                            SELECT popped.id, popped."queuedAt"
+                            FROM tier_free tf
+                            CROSS JOIN LATERAL (
+                                SELECT w.id, w."queuedAt"
+                                FROM "EventWaitlist" w
+                                WHERE w."eventId" = $1 AND w.status = 'waiting' AND w."tierId" = tf."tierId"
+                                ORDER BY w."queuedAt", w.id
+                                LIMIT LEAST(tf.seats, (SELECT seats FROM free))
+                                FOR UPDATE SKIP LOCKED
+                            ) popped
+                            WHERE tf.seats > 0
+                        ),
+                        next_up AS (
+                            SELECT id
+                            FROM (SELECT * FROM untiered UNION ALL SELECT * FROM tiered) c
+                            ORDER BY "queuedAt", id
+                            LIMIT (SELECT seats FROM free)
+                        ),
+                        promoted AS (
+                            UPDATE "EventWaitlist" w
+                            SET status = 'promoted', "promotedAt" = NOW(),
+                                "reservationId" = gen_random_uuid()::text
+                            FROM next_up
+                            WHERE w.id = next_up.id
+                            RETURNING w.*
+                        ),
+                        held AS (
+                            INSERT INTO "EventReservation" ("id", "userId", "eventId", "tierId", "finalPrice",
+                                                           "paymentEmail", "createdAt", "expiresAt")
+                            SELECT p."reservationId", p."userId", p."eventId", p."tierId", COALESCE(tt.price, e.fee),
+                                   p."paymentEmail", NOW(), NOW() + make_interval(mins => $2)
+                            FROM promoted p
+                            JOIN "Event" e ON e.id = p."eventId"
+                            LEFT JOIN "TicketTier" tt ON tt.id = p."tierId"
+                            RETURNING id, "expiresAt"
+                        )
+                        SELECT p.*, h."expiresAt" AS "holdExpiresAt",
+                               COALESCE(p."paymentEmail", u.email) AS "notifyEmail",
+                               e.name AS "eventName"
+                        FROM promoted p
+                        JOIN held h ON h.id = p."reservationId"
+                        JOIN "User" u ON u.id = p."userId"
+                        JOIN "Event" e ON e.id = p."eventId"
+                    """, event_id, WAITLIST_HOLD_MINUTES)
+
+            promoted = [dict(row) for row in rows]
+            if promoted:
+                await self.publish_capacity_change(event_id)
+                print(f"🎟️ Promoted {len(promoted)} waitlisted user(s) for event {event_id}")
+                self._notify_promoted(promoted)
+            return promoted
+        except Exception as e:
+            print(f"❌ Error promoting waitlisted users: {e}")
+            raise e
+
+    async def release_expired_holds(self, conn) -> List[int]:
+        """
+        Delete expired reservations on the caller's connection and return the events
+        whose seats were freed. Lapsed waitlist promotions are marked expired.
+        """
+        rows = await conn.fetch("""
+            WITH expired AS (
+                DELETE FROM "EventReservation"
+                WHERE "expiresAt" < NOW()
+                RETURNING id, "eventId"
+            ),
+            lapsed AS (
+                UPDATE "EventWaitlist" w
+                SET status = 'expired'
+                FROM expired
+                WHERE w."reservationId" = expired.id AND w.status = 'promoted'
+            )
+            SELECT DISTINCT "eventId" FROM expired
+        """)
+        event_ids = [row['eventId'] for row in rows]
+        for event_id in event_ids:
+            await self.publish_capacity_change(event_id, conn)
+        return event_ids
+
+    async def mark_hold_finished(self, conn, reservation_id: str, status: str) -> None:
+        """Record what happened to a promoted hold ('registered' or 'cancelled')"""
+        await conn.execute("""
+            UPDATE "EventWaitlist"
+            SET status = $2
+            WHERE "reservationId" = $1 AND status = 'promoted'
+        """, reservation_id, status)
+
+    async def promote_for_events(self, event_ids: List[int]) -> None:
+        """Promote waitlisted users for every event that just freed seats (never raises)"""
+        for event_id in event_ids:
+            try:
+                await self.promote_waitlisted(event_id)
+            except Exception as e:
+                print(f"⚠️ Waitlist promotion failed for event {event_id}: {e}")
+
+    async def sweep_expired_holds(self) -> List[int]:
+        """Release expired holds and lapsed offers, then promote for the freed events"""
+        async with self.get_connection() as conn:
+            freed_event_ids = await self.release_expired_holds(conn)
+        # Promotion takes its own connection, so the sweep's is released first
+        await self.promote_for_events(freed_event_ids)
+        return freed_event_ids
+
+    def _notify_promoted(self, promoted: List[Dict[str, Any]]) -> None:
+        """Send promotion emails off the event loop; delivery failures are only logged"""
+        from authentication.email_sends.ses_functions import send_waitlist_promotion
+
+        loop = asyncio.get_running_loop()
+        for entry in promoted:
+            expires_at = entry['holdExpiresAt'].isoformat() if entry.get('holdExpiresAt') else ""
+            loop.run_in_executor(
+                None,
+                send_waitlist_promotion,
+                entry['notifyEmail'],
+                entry['eventName'],
+                expires_at
+            )
+
+# 期限切れ予約枠の定期スイープ（キャンセル待ちの人は再試行しないため、アクセスがなくても繰り上げる）
+_hold_sweeper: Optional[asyncio.Task] = None
+
+async def _run_hold_sweeper() -> None:
+    waitlist_repo = WaitlistRepository()
+    while True:
+        await asyncio.sleep(WAITLIST_SWEEP_SECONDS)
+        try:
+            freed_event_ids = await waitlist_repo.sweep_expired_holds()
+            if freed_event_ids:
+                print(f"🧹 Released expired holds for events {freed_event_ids}")
+        except Exception as e:
+            print(f"⚠️ Expired hold sweep failed: {e}")
+
+async def start_hold_sweeper() -> None:
+    """Start the periodic expired-hold sweep"""
+    global _hold_sweeper
+    if _hold_sweeper is None or _hold_sweeper.done():
+        _hold_sweeper = asyncio.create_task(_run_hold_sweeper())
+
+async def stop_hold_sweeper() -> None:
+    """Stop the periodic expired-hold sweep"""
+    global _hold_sweeper
+    if _hold_sweeper is not None:
+        _hold_sweeper.cancel()
+        try:
+            await _hold_sweeper
+        except asyncio.CancelledError:
+            pass
+        _hold_sweeper = None
@@ -464,4 +464,61 @@ def send_refund_confirmation(email: str, refund_id: str, amount: float, event_na
         
     except Exception as e:
         print(f"❌ Error sending refund confirmation email: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def send_waitlist_promotion(email: str, event_name: str, expires_at: str) -> bool:
+    """
+    Notify a waitlisted user that a seat has opened up and is being held for them
+    until expires_at (ISO string). The user completes registration from the events page.
+    """
+    try:
+        if not check_email(email):
+            print(f"❌ Invalid email address: {email}")
+            return False
+
+        ses = get_ses()
+
+        ev_html = html.escape(event_name)
+        expires_html = html.escape(expires_at)
+
+        subject = f"A seat opened up — {event_name}"
+        text_body = (
+            "Good news! A seat has opened up for an event you were waitlisted for.\n\n"
+            f"Event: {event_name}\n"
+            f"Your seat is held until: {expires_at}\n\n"
+            "Please complete your registration on the UTJN events page before the hold expires."
+        )
+        html_body = f"""
+        <html><body style="font-family:Arial,Helvetica,sans-serif">
+          <h2 style="margin:0 0 12px 0">A seat has opened up!</h2>
+          <p style="margin:0 0 16px 0">You were on the waitlist and a seat is now held for you.</p>
+          <table style="border-collapse:collapse">
+            <tr><td style="padding:4px 8px"><strong>Event</strong></td><td style="padding:4px 8px">{ev_html}</td></tr>
+            <tr><td style="padding:4px 8px"><strong>Held until</strong></td><td style="padding:4px 8px">{expires_html}</td></tr>
+          </table>
+          <p style="margin-top:16px">Please complete your registration on the UTJN events page before the hold expires.</p>
+        </body></html>
+        """
+
+        ses.send_email(
+            FromEmailAddress="noreply@uoftjn.com",
+            Destination={"ToAddresses": [email]},
+            Content={
+                "Simple": {
+                    "Subject": {"Data": subject},
+                    "Body": {
+                        "Text": {"Data": text_body},
+                        "Html": {"Data": html_body},
+                    },
+                }
+            },
+            EmailTags=[
+                {"Name": "type", "Value": "waitlist"}
+            ],
+        )
+        print(f"✅ Waitlist promotion email sent to {email} for {event_name}")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error sending waitlist promotion email: {e}")
+        return False
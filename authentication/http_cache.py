@@ -0,0 +1,93 @@
+# authentication/http_cache.py
+import os
+import json
+import hashlib
+from typing import Optional
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+# 共有キャッシュ（Caddy等）で公開レスポンスを保持する秒数。ブラウザは毎回ETagで再検証する
+PUBLIC_CACHE_SECONDS = int(os.getenv("PUBLIC_CACHE_SECONDS", "30"))
+PUBLIC_STALE_SECONDS = int(os.getenv("PUBLIC_STALE_SECONDS", "60"))
+
+def make_etag(*parts) -> str:
+    """Weak ETag from a fingerprint (timestamps, counts, request parameters)"""
+    digest = hashlib.sha256(json.dumps(parts, default=str, sort_keys=True).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """If-None-Match comparison (weak, as required for GET/HEAD)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+def cache_headers(etag: str, public: bool = True) -> dict:
+    """ETag + Cache-Control. Personalised responses are private so shared caches never store them"""
+    if public:
+        cache_control = (
+            f"public, max-age=0, s-maxage={PUBLIC_CACHE_SECONDS}, "
+            f"stale-while-revalidate={PUBLIC_STALE_SECONDS}"
+        )
+    else:
+        cache_control = "private, no-cache"
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+def apply_cache_headers(response: Response, etag: str, public: bool = True) -> None:
+    """Attach ETag/Cache-Control to a normal 200 response"""
+    for name, value in cache_headers(etag, public).items():
+        response.headers[name] = value
+
+def not_modified(etag: str, public: bool = True) -> Response:
+    """Empty 304 carrying the same validators as the 200 would"""
+    return Response(status_code=304, headers=cache_headers(etag, public))
+
+def no_store(response: Response) -> None:
+    """Used for admin cache-bypass reads so nothing downstream keeps them"""
+    response.headers["Cache-Control"] = "no-store"
+
+def conditional_get(response: Response, if_none_match: Optional[str], fingerprint, *key,
+                    public: bool = True) -> Optional[Response]:
+    """
+    Return a 304 when the client's ETag still matches, otherwise attach validators to
+    `response` and return None so the handler builds the full body.
+    A missing fingerprint (e.g. 404 or a DB error) disables caching for the request.
+    """
+    if fingerprint is None:
+        return None
+    etag = make_etag(*key, fingerprint)
+    if etag_matches(etag, if_none_match):
+        return not_modified(etag, public)
+    apply_cache_headers(response, etag, public)
+    return None
+
+def render_json(content) -> bytes:
+    """Serialize a response body exactly as FastAPI's JSONResponse would"""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+def content_etag(body: bytes) -> str:
+    """Weak ETag from already-serialized bytes"""
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def json_bytes_response(body: bytes, etag: str, if_none_match: Optional[str], public: bool = True,
+                        cacheable: bool = True) -> Response:
+    """Serve pre-rendered JSON bytes (or a 304) with validators"""
+    if not cacheable:
+        return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
+    if etag_matches(etag, if_none_match):
+        return not_modified(etag, public)
+    return Response(content=body, media_type="application/json", headers=cache_headers(etag, public))
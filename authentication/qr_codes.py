@@ -0,0 +1,170 @@
+# authentication/qr_codes.py
+import os
+import io
+import asyncio
+import hashlib
+import zipfile
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# format → media type
+QR_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml"
+}
+
+# Rendered images kept in memory (LRU); set QR_CACHE_DIR to also keep them on disk across restarts
+QR_CACHE_MAX_ENTRIES = int(os.getenv("QR_CACHE_MAX_ENTRIES", "512"))
+QR_CACHE_DIR = os.getenv("QR_CACHE_DIR", "")
+# Browsers and proxies may keep an image this long; the ETag is the content key, so revalidation is cheap
+QR_CACHE_SECONDS = int(os.getenv("QR_CACHE_SECONDS", "86400"))
+
+# Pixel size per module and quiet zone accepted from requests
+QR_BOX_SIZE_RANGE = (2, 40)
+QR_BORDER_RANGE = (0, 10)
+
+# Upper bound on codes per printing batch
+QR_BATCH_MAX_ITEMS = 200
+
+class QRRenderUnavailable(Exception):
+    """qrcode (with Pillow for PNG) is not installed in this deployment"""
+    pass
+
+def qr_cache_key(data: str, fmt: str, box_size: int, border: int) -> str:
+    """Content key of an image: the same inputs always give the same bytes"""
+    return hashlib.sha256(f"{fmt}|{box_size}|{border}|{data}".encode("utf-8")).hexdigest()
+
+def qr_cache_headers(key: str) -> dict:
+    """Long-lived public caching, validated by the content key"""
+    return {
+        "ETag": f'"{key[:32]}"',
+        "Cache-Control": f"public, max-age={QR_CACHE_SECONDS}"
+    }
+
+def _render(data: str, fmt: str, box_size: int, border: int) -> bytes:
+    """Encode one QR code (CPU-bound; called in a worker thread)"""
+    try:
+        import qrcode
+        if fmt == "svg":
+            from qrcode.image.svg import SvgPathImage as image_factory
+        else:
+            from qrcode.image.pil import PilImage as image_factory
+    except ImportError:
+        raise QRRenderUnavailable("qrcode[pil] is not installed; QR images are unavailable")
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=box_size, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(image_factory=image_factory).save(buffer)
+    return buffer.getvalue()
+
+class QRCodeCache:
+    """
+    QRコード画像のキャッシュ（コンテンツハッシュ単位）
+    メモリ上のLRUに保持し、QR_CACHE_DIR が設定されていればディスクにも書き出す。
+    描画はスレッドプールで行い、イベントループを塞がない
+    """
+
+    def __init__(self, max_entries: int = QR_CACHE_MAX_ENTRIES, cache_dir: str = QR_CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._images: "OrderedDict[str, bytes]" = OrderedDict()
+        self._hits = 0
+        self._disk_hits = 0
+        self._renders = 0
+
+    def _disk_path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{fmt}")
+
+    def _remember(self, key: str, image: bytes) -> None:
+        self._images[key] = image
+        self._images.move_to_end(key)
+        while len(self._images) > self.max_entries:
+            self._images.popitem(last=False)
+
+    def _read_disk(self, key: str, fmt: str) -> Optional[bytes]:
+        path = self._disk_path(key, fmt)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _write_disk(self, key: str, fmt: str, image: bytes) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._disk_path(key, fmt) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(image)
+        os.replace(tmp_path, self._disk_path(key, fmt))
+
+    async def render(self, data: str, fmt: str = "png", box_size: int = 10, border: int = 4) -> Tuple[bytes, str]:
+        """(image bytes, content key) for a payload; raises ValueError for bad options"""
+        if fmt not in QR_FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(QR_FORMATS)}")
+        if not QR_BOX_SIZE_RANGE[0] <= box_size <= QR_BOX_SIZE_RANGE[1]:
+            raise ValueError(f"size must be between {QR_BOX_SIZE_RANGE[0]} and {QR_BOX_SIZE_RANGE[1]}")
+        if not QR_BORDER_RANGE[0] <= border <= QR_BORDER_RANGE[1]:
+            raise ValueError(f"border must be between {QR_BORDER_RANGE[0]} and {QR_BORDER_RANGE[1]}")
+
+        key = qr_cache_key(data, fmt, box_size, border)
+        image = self._images.get(key)
+        if image is not None:
+            self._hits += 1
+            self._images.move_to_end(key)
+            return image, key
+
+        if self.cache_dir:
+            image = await asyncio.to_thread(self._read_disk, key, fmt)
+            if image is not None:
+                self._disk_hits += 1
+                self._remember(key, image)
+                return image, key
+
+        image = await asyncio.to_thread(_render, data, fmt, box_size, border)
+        self._renders += 1
+        self._remember(key, image)
+        if self.cache_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, fmt, image)
+            except OSError as e:
+                print(f"⚠️ Could not write QR cache file: {e}")
+        return image, key
+
+    async def render_zip(self, items: List[Tuple[str, str]], fmt: str = "png", box_size: int = 10,
+                         border: int = 4) -> bytes:
+        """ZIP of (file name without extension, payload) pairs for printing"""
+        files = []
+        for name, data in items:
+            image, _ = await self.render(data, fmt, box_size, border)
+            files.append((f"{name}.{fmt}", image))
+
+        def build() -> bytes:
+            buffer = io.BytesIO()
+            # Images are already compressed; store them as-is
+            with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+                for file_name, image in files:
+                    archive.writestr(file_name, image)
+            return buffer.getvalue()
+
+        return await asyncio.to_thread(build)
+
+    def get_stats(self) -> dict:
+        """キャッシュ統計を取得"""
+        return {
+            "entries": len(self._images),
+            "maxEntries": self.max_entries,
+            "hits": self._hits,
+            "diskHits": self._disk_hits,
+            "renders": self._renders,
+            "diskCache": bool(self.cache_dir)
+        }
+
+# グローバルインスタンス
+_qr_code_cache = None
+
+def get_qr_code_cache() -> QRCodeCache:
+    """グローバルQRコードキャッシュを取得"""
+    global _qr_code_cache
+    if _qr_code_cache is None:
+        _qr_code_cache = QRCodeCache()
+    return _qr_code_cache
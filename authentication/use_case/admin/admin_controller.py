@@ -1,10 +1,14 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Optional
 import base64
 import os
 from datetime import datetime
 import uuid
+from authentication.data_access.analytics_export import (
+    AnalyticsExportRepository, AnalyticsExportUnavailable, AnalyticsExportBusy, ANALYTICS_DATASETS
+)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -75,4 +79,56 @@ async def get_unregistered_refunds_admin(
         
     except Exception as e:
         print(f"❌ Error in admin unregistered refunds: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve unregistered refunds: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve unregistered refunds: {str(e)}")
+
+@router.get("/analytics-exports")
+async def list_analytics_exports():
+    """Watermark, row count and parts of every analytics dataset"""
+    repo = AnalyticsExportRepository()
+    return {"success": True, "datasets": [repo.get_manifest(dataset) for dataset in ANALYTICS_DATASETS]}
+
+@router.post("/analytics-exports/{dataset}/refresh")
+async def refresh_analytics_export(dataset: str):
+    """Append rows added since the last export as a new Parquet part"""
+    if dataset not in ANALYTICS_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+    try:
+        result = await AnalyticsExportRepository().export_increment(dataset)
+        return {"success": True, **result}
+    except AnalyticsExportUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except AnalyticsExportBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error refreshing analytics export {dataset}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to refresh analytics export: {str(e)}")
+
+@router.get("/analytics-exports/{dataset}/download")
+async def download_analytics_export(dataset: str, background_tasks: BackgroundTasks, refresh: bool = False):
+    """Download a dataset as a single Parquet file (refresh=true appends new rows first)"""
+    if dataset not in ANALYTICS_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+    repo = AnalyticsExportRepository()
+    try:
+        if refresh:
+            try:
+                await repo.export_increment(dataset)
+            except AnalyticsExportBusy:
+                # Another worker is appending; serve what is already exported
+                pass
+        path = await repo.build_snapshot(dataset)
+    except AnalyticsExportUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error building analytics export {dataset}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to build analytics export: {str(e)}")
+    
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"{dataset} has not been exported yet")
+    
+    background_tasks.add_task(os.remove, path)
+    return FileResponse(
+        path,
+        media_type="application/vnd.apache.parquet",
+        filename=f"{dataset}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+    )
@@ -1,12 +1,22 @@
 # authentication/use_case/event/event_controller.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Header, Response, Request
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timedelta
-from authentication.data_access.event_repository import EventRepository
+from authentication.data_access.event_repository import (
+    EventRepository, EVENT_VIEWS, EVENT_SUMMARY_FIELDS, EVENT_PUBLIC_FIELDS,
+    EVENT_PAGE_DEFAULT_LIMIT, EVENT_PAGE_MAX_LIMIT, EVENT_TIME_FILTERS, CAPACITY_BATCH_MAX_IDS,
+    REGISTRATION_EXPORT_COLUMNS, DEFAULT_REGISTRATION_EXPORT_COLUMNS
+)
+from authentication.data_access.export_stream import EXPORT_FORMATS, parse_export_columns, stream_export
+from authentication.http_cache import conditional_get, no_store, render_json, content_etag, json_bytes_response
+from authentication.data_access.catalog_cache import get_event_cache, MISS
+from authentication.data_access.capacity_broadcaster import get_capacity_broadcaster
 from fastapi.responses import StreamingResponse
-import io
-import csv
+import json
+import asyncio
+import hmac
+import os
 
 event_router = APIRouter(prefix="/events", tags=["events"])
 
@@ -38,6 +48,8 @@ class TicketTierRequest(BaseModel):
     endDate: Optional[str] = None  # ISO format
     isActive: bool = True
     subEventPrices: Optional[List[float]] = None  # For complex pricing with sub-events
+    sortOrder: Optional[int] = None  # Display / progression order within the event
+    unlockAfterTier: Optional[str] = None  # Opens when this tier sells out (Regular defaults to "Early Bird")
 
 class SubEventRequest(BaseModel):
     eventId: int
@@ -57,6 +69,12 @@ class EventRegistrationRequest(BaseModel):
     finalPrice: Optional[float] = None
     paymentEmail: Optional[str] = None  # Email used for payment (should match user account email)
     reservationId: Optional[str] = None  # Reservation ID to convert to registration
+    joinWaitlist: bool = False  # Join the waitlist instead of failing when the event is full
+
+class CapacityBatchRequest(BaseModel):
+    eventIds: List[int] = []
+    tierIds: List[int] = []
+    subEventIds: List[int] = []
 
 # Dummy payment simulation
 async def simulate_payment(amount: float) -> bool:
@@ -124,14 +142,93 @@ async def verify_square_payment(payment_id: str, expected_amount: float) -> bool
         print(f"❌ Error verifying Square payment {payment_id}: {e}")
         return False
 
+def _is_admin_key(key: Optional[str]) -> bool:
+    """True when key matches the server-side ADMIN_API_KEY (never set on the client)"""
+    admin_key = os.getenv("ADMIN_API_KEY")
+    if not admin_key or not key:
+        return False
+    return hmac.compare_digest(key.encode(), admin_key.encode())
+
+def _use_event_cache(x_cache_bypass: Optional[str]) -> bool:
+    """Trusted server-side callers can read straight from the database by sending X-Cache-Bypass: <ADMIN_API_KEY>"""
+    if not x_cache_bypass:
+        return True
+    if _is_admin_key(x_cache_bypass):
+        print("🔄 Cache bypass requested by admin")
+        return False
+    # Anything else is not a credential: ignore the header and serve from the cache
+    return True
+
+def _parse_event_projection(view: str, fields: Optional[str]):
+    """
+    Resolve ?view= and ?fields= into (projection to load, fields to return).
+    Summary requests may select any public (non-PII) field; a full-view request whose fields
+    are all public is served from the summary query.
+    """
+    if view not in EVENT_VIEWS:
+        raise HTTPException(status_code=400, detail=f"view must be one of: {', '.join(EVENT_VIEWS)}")
+    
+    selected = None
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        if view == "summary":
+            unknown = [field for field in selected if field not in EVENT_PUBLIC_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown summary fields: {', '.join(unknown)}")
+        elif all(field in EVENT_PUBLIC_FIELDS for field in selected):
+            view = "summary"
+    elif view == "summary":
+        selected = list(EVENT_SUMMARY_FIELDS)
+    
+    return view, selected
+
 @event_router.get("")
-async def get_all_events(user_email: Optional[str] = None):
-    """Get all events, filtered by user's university if provided"""
+async def get_all_events(response: Response, user_email: Optional[str] = None,
+                         view: str = "summary", fields: Optional[str] = None,
+                         limit: Optional[int] = Query(None, ge=1, le=EVENT_PAGE_MAX_LIMIT),
+                         cursor: Optional[str] = None,
+                         when: Optional[str] = None,
+                         event_type: Optional[str] = Query(None, alias="type"),
+                         archived: Optional[bool] = None,
+                         q: Optional[str] = None,
+                         x_cache_bypass: Optional[str] = Header(None),
+                         x_admin_key: Optional[str] = Header(None),
+                         if_none_match: Optional[str] = Header(None)):
+    """
+    Get all events, filtered by user's university if provided.
+    The default view=summary is the public shape (no registeredUsers); fields= selects a sparse
+    fieldset of public fields. view=full includes registeredUsers and requires X-Admin-Key.
+    
+    Passing any of limit, cursor, when (upcoming|past|all), type, archived or q switches to the
+    paginated listing: {"events": [...], "nextCursor": ..., "hasMore": ...}. Without them the
+    legacy unpaginated list is returned unchanged.
+    """
     try:
         print(f"📅 Getting all events for user: {user_email}")
         
         event_repo = EventRepository()
         try:
+            projection, selected_fields = _parse_event_projection(view, fields)
+            if projection == "full" and not _is_admin_key(x_admin_key):
+                raise HTTPException(status_code=403, detail="view=full requires admin access")
+            paginated = any(param is not None for param in (limit, cursor, when, event_type, archived, q))
+            if when is not None and when not in EVENT_TIME_FILTERS:
+                raise HTTPException(status_code=400, detail=f"when must be one of: {', '.join(EVENT_TIME_FILTERS)}")
+            
+            use_cache = _use_event_cache(x_cache_bypass)
+            if use_cache:
+                # Answer polling clients before the table checks and catalog queries run
+                fingerprint = await event_repo.get_catalog_fingerprint(user_email)
+                unchanged = conditional_get(response, if_none_match, fingerprint, "events", user_email,
+                                            projection, selected_fields,
+                                            [limit, cursor, when, event_type, archived, q],
+                                            public=not user_email and projection == "summary")
+                if unchanged is not None:
+                    print("✅ Events unchanged (304)")
+                    return unchanged
+            else:
+                no_store(response)
+            
             await event_repo.ensure_tables_exist()
             
             # If user_email is provided, get user info to check university and current year
@@ -151,7 +248,21 @@ async def get_all_events(user_email: Optional[str] = None):
                 finally:
                     pass
             
-            events = await event_repo.get_all_events()
+            # Eligibility (UofT-only, target years) is evaluated in SQL for the user's cohort
+            cohort = (user_university, user_current_year) if (user_university or user_current_year) else None
+            page = None
+            if paginated:
+                try:
+                    page = await event_repo.get_events_page(
+                        view=projection, cohort=cohort, when=when or "all", event_type=event_type,
+                        archived=archived, search=q, cursor=cursor,
+                        limit=limit or EVENT_PAGE_DEFAULT_LIMIT
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                events = page["events"]
+            else:
+                events = await event_repo.get_all_events(use_cache=use_cache, view=projection, cohort=cohort)
             
             # Debug: Check pricing configuration for each event
             for event in events:
@@ -167,26 +278,7 @@ async def get_all_events(user_email: Optional[str] = None):
                         for subEvent in event['subEvents']:
                             print(f"  🎊 SubEvent '{subEvent['name']}': price={subEvent.get('price')}, capacity={subEvent.get('capacity')}")
             
-            # Filter events based on user's university and current year
-            if user_university or user_current_year:
-                filtered_events = []
-                for event in events:
-                    # If event is UofT-only and user is not from UofT, skip it
-                    if event.get('isUofTOnly', False) and user_university != 'University of Toronto':
-                        print(f"🚫 Skipping UofT-only event '{event['name']}' for non-UofT user")
-                        continue
-                    
-                    # If event has specific target years, check if user's current year matches
-                    target_year = event.get('targetYear', 'All years')
-                    if target_year != 'All years' and user_current_year:
-                        # Check if user's current year is in the target years
-                        target_years = [year.strip() for year in target_year.split(',')]
-                        if user_current_year not in target_years:
-                            print(f"🚫 Skipping year-restricted event '{event['name']}' (target: {target_year}, user: {user_current_year})")
-                            continue
-                    
-                    filtered_events.append(event)
-                events = filtered_events
+            if cohort:
                 print(f"✅ Filtered to {len(events)} events for {user_university} user (year: {user_current_year})")
             else:
                 print(f"✅ Retrieved {len(events)} events (no user filter)")
@@ -202,6 +294,11 @@ async def get_all_events(user_email: Optional[str] = None):
                 if event.get('updatedAt'):
                     event['updatedAt'] = event['updatedAt'].isoformat()
             
+            if selected_fields is not None:
+                events = [{field: event.get(field) for field in selected_fields} for event in events]
+            
+            if page is not None:
+                return {"events": events, "nextCursor": page["nextCursor"], "hasMore": page["hasMore"]}
             return events
             
         except Exception as e:
@@ -209,8 +306,52 @@ async def get_all_events(user_email: Optional[str] = None):
             
     except Exception as e:
         print(f"❌ Error getting events: {e}")
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to retrieve events: {str(e)}")
 
+@event_router.get("/search")
+async def search_events(q: str, user_email: Optional[str] = None,
+                        limit: int = Query(EVENT_PAGE_DEFAULT_LIMIT, ge=1, le=EVENT_PAGE_MAX_LIMIT),
+                        cursor: Optional[str] = None):
+    """Full-text event search (ranked, prefix matching, paginated). Declared before /{event_id}."""
+    try:
+        print(f"🔎 Searching events: {q!r}")
+        
+        event_repo = EventRepository()
+        try:
+            cohort = None
+            if user_email:
+                from authentication.data_access.user_repository import UserRepository
+                user = await UserRepository().get_user_by_email(user_email)
+                if user:
+                    cohort = (user.get('university', 'University of Toronto'), user.get('currentYear', '1st year'))
+            
+            try:
+                result = await event_repo.search_events(q, cohort=cohort, cursor=cursor, limit=limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            for event in result["events"]:
+                if event.get('date'):
+                    event['date'] = event['date'].isoformat()
+            result["events"] = [
+                {field: event.get(field) for field in EVENT_SUMMARY_FIELDS + ("rank",)}
+                for event in result["events"]
+            ]
+            
+            print(f"✅ Found {len(result['events'])} events for {q!r}")
+            return result
+            
+        except Exception as e:
+            raise e
+            
+    except Exception as e:
+        print(f"❌ Error searching events: {e}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to search events: {str(e)}")
+
 @event_router.post("")
 async def create_event(event_data: EventRequest):
     """Create a new event"""
@@ -238,8 +379,9 @@ async def create_event(event_data: EventRequest):
             # Create ticket tiers if advanced ticketing is enabled
             if event_data.enableAdvancedTicketing and ticket_tiers:
                 print(f"🎫 Creating {len(ticket_tiers)} ticket tiers for event {event_id}")
-                for tier_data in ticket_tiers:
+                for index, tier_data in enumerate(ticket_tiers):
                     tier_data['eventId'] = event_id
+                    tier_data.setdefault('sortOrder', index)
                     print(f"🎫 Creating tier: {tier_data}")
                     await event_repo.create_ticket_tier(tier_data)
             elif event_data.enableAdvancedTicketing:
@@ -274,14 +416,25 @@ async def create_event(event_data: EventRequest):
         raise HTTPException(status_code=500, detail=f"Failed to create event: {str(e)}")
 
 @event_router.get("/{event_id}")
-async def get_event_by_id(event_id: int):
+async def get_event_by_id(event_id: int, response: Response,
+                          x_cache_bypass: Optional[str] = Header(None),
+                          if_none_match: Optional[str] = Header(None)):
     """Get event by ID"""
     try:
         print(f"🔍 Getting event by ID: {event_id}")
         
         event_repo = EventRepository()
         try:
-            event = await event_repo.get_event_with_tiers_and_subevents(event_id)
+            use_cache = _use_event_cache(x_cache_bypass)
+            if use_cache:
+                fingerprint = await event_repo.get_event_fingerprint(event_id)
+                unchanged = conditional_get(response, if_none_match, fingerprint, "event", event_id)
+                if unchanged is not None:
+                    return unchanged
+            else:
+                no_store(response)
+            
+            event = await event_repo.get_event_with_tiers_and_subevents(event_id, use_cache=use_cache)
             if not event:
                 raise HTTPException(status_code=404, detail="Event not found")
             
@@ -314,57 +467,40 @@ async def get_event_by_id(event_id: int):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to retrieve event: {str(e)}")
 
+@event_router.get("/{event_id}/export")
 @event_router.get("/{event_id}/export_csv")
-async def export_event_registrations_csv(event_id: int):
-    """Export event participants as CSV"""
+async def export_event_registrations_csv(event_id: int, format: str = "csv", columns: Optional[str] = None):
+    """
+    Export event participants (streamed straight from a database cursor).
+    format=csv|ndjson, columns=comma-separated subset of REGISTRATION_EXPORT_COLUMNS.
+    """
     try:
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+        try:
+            selected = parse_export_columns(columns, REGISTRATION_EXPORT_COLUMNS, DEFAULT_REGISTRATION_EXPORT_COLUMNS)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         repo = EventRepository()
         await repo.ensure_tables_exist()
-        # Verify event exists
-        event = await repo.get_event_by_id(event_id)
-        if not event:
+        if not await repo.event_exists(event_id):
             raise HTTPException(status_code=404, detail="Event not found")
-
-        rows = await repo.get_event_registrations_detailed(event_id)
-
-        # Prepare CSV with only requested columns
-        output = io.StringIO()
-        writer = csv.writer(output)
-        header = [
-            "first_name",
-            "last_name",
-            "user_email",
-            "user_major",
-            "graduation_year",
-            "current_year",
-            "university",
-        ]
-        writer.writerow(header)
-        for r in rows:
-            writer.writerow([
-                r.get("first_name"),
-                r.get("last_name"),
-                r.get("user_email"),
-                r.get("user_major"),
-                r.get("graduation_year"),
-                r.get("current_year"),
-                r.get("university"),
-            ])
-
-        output.seek(0)
-        filename = f"event_{event_id}_participants.csv"
+        
+        query, params = repo.registration_export_query(event_id, selected)
+        filename = f"event_{event_id}_participants.{format}"
         return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
+            stream_export(query, params, selected, format),
+            media_type=EXPORT_FORMATS[format],
             headers={
                 "Content-Disposition": f"attachment; filename=\"{filename}\""
             },
         )
     except Exception as e:
-        print(f"❌ Error exporting CSV: {e}")
+        print(f"❌ Error exporting registrations: {e}")
         if isinstance(e, HTTPException):
             raise e
-        raise HTTPException(status_code=500, detail="Failed to export CSV")
+        raise HTTPException(status_code=500, detail="Failed to export registrations")
 
 @event_router.put("/{event_id}")
 async def update_event(event_id: int, event_data: EventRequest):
@@ -390,8 +526,9 @@ async def update_event(event_id: int, event_data: EventRequest):
             
             # Create new ticket tiers if advanced ticketing is enabled
             if event_data.enableAdvancedTicketing and ticket_tiers:
-                for tier_data in ticket_tiers:
+                for index, tier_data in enumerate(ticket_tiers):
                     tier_data['eventId'] = event_id
+                    tier_data.setdefault('sortOrder', index)
                     await event_repo.create_ticket_tier(tier_data)
             
             # Create new sub-events if sub-events are enabled
@@ -444,6 +581,26 @@ async def delete_event(event_id: int):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to delete event: {str(e)}")
 
+async def _enqueue_on_waitlist(event_id: int, registration_data: EventRegistrationRequest) -> dict:
+    """Put a user on the waitlist for a full event and return their queue position"""
+    from authentication.data_access.waitlist_repository import WaitlistRepository
+    
+    waitlist_repo = WaitlistRepository()
+    entry = await waitlist_repo.join_waitlist(
+        event_id=event_id,
+        user_id=registration_data.userId,
+        tier_id=registration_data.tierId,
+        payment_email=registration_data.paymentEmail
+    )
+    print(f"⏳ Event {event_id} is full, user {registration_data.userId} waitlisted at position {entry['position']}")
+    return {
+        "message": "Event is full - you have been added to the waitlist",
+        "waitlisted": True,
+        "waitlistStatus": entry['status'],
+        "position": entry['position'],
+        "reservationId": entry.get('reservationId')
+    }
+
 @event_router.post("/{event_id}/reserve")
 async def reserve_event_registration(event_id: int, registration_data: EventRegistrationRequest):
     """Reserve a spot for event registration (without payment)"""
@@ -461,16 +618,36 @@ async def reserve_event_registration(event_id: int, registration_data: EventRegi
             if not event:
                 raise HTTPException(status_code=404, detail="Event not found")
             
-            # Check capacity BEFORE any payment processing
-            registration_count = await event_repo.get_registration_count(event_id)
-            if registration_count >= event['capacity']:
-                raise HTTPException(status_code=400, detail="Event is full")
-            
             # Check if user is already registered
             existing = await event_repo.check_existing_registration(registration_data.userId, event_id)
             if existing:
                 raise HTTPException(status_code=400, detail="User already registered for this event")
             
+            # A user who already holds a seat (e.g. promoted from the waitlist) checks out with that hold;
+            # the capacity checks below would count it against them
+            hold = await event_repo.claim_active_hold(
+                user_id=registration_data.userId,
+                event_id=event_id,
+                tier_id=registration_data.tierId,
+                sub_event_ids=registration_data.subEventIds,
+                final_price=registration_data.finalPrice,
+                payment_email=registration_data.paymentEmail
+            )
+            if hold:
+                print(f"✅ Using existing reservation for user {registration_data.userId}: {hold['id']}")
+                return {
+                    "message": "Registration spot reserved successfully",
+                    "reservationId": hold['id'],
+                    "expiresAt": hold['expiresAt'].isoformat()
+                }
+            
+            # Check capacity BEFORE any payment processing
+            registration_count = await event_repo.get_registration_count(event_id)
+            if registration_count >= event['capacity']:
+                if registration_data.joinWaitlist:
+                    return await _enqueue_on_waitlist(event_id, registration_data)
+                raise HTTPException(status_code=400, detail="Event is full")
+            
             # Validate advanced ticketing selections
             if registration_data.tierId:
                 tier_capacity = await event_repo.get_available_capacity(tier_id=registration_data.tierId)
@@ -484,14 +661,20 @@ async def reserve_event_registration(event_id: int, registration_data: EventRegi
                         raise HTTPException(status_code=400, detail=f"Sub-event {sub_event_id} is no longer available")
             
             # Create a temporary reservation (without payment)
-            reservation_id = await event_repo.create_reservation(
-                user_id=registration_data.userId,
-                event_id=event_id,
-                tier_id=registration_data.tierId,
-                sub_event_ids=registration_data.subEventIds,
-                final_price=registration_data.finalPrice,
-                payment_email=registration_data.paymentEmail
-            )
+            try:
+                reservation_id = await event_repo.create_reservation(
+                    user_id=registration_data.userId,
+                    event_id=event_id,
+                    tier_id=registration_data.tierId,
+                    sub_event_ids=registration_data.subEventIds,
+                    final_price=registration_data.finalPrice,
+                    payment_email=registration_data.paymentEmail
+                )
+            except Exception as e:
+                # Remaining seats are all held by reservations: queue once instead of retrying
+                if "Event is full" in str(e) and registration_data.joinWaitlist:
+                    return await _enqueue_on_waitlist(event_id, registration_data)
+                raise e
             
             print(f"✅ Reservation created for user {registration_data.userId}: {reservation_id}")
             return {
@@ -677,7 +860,8 @@ async def register_for_event(event_id: int, registration_data: EventRegistration
                     registration = await event_repo.convert_reservation_to_registration(
                         reservation_id=registration_data.reservationId,
                         payment_id=registration_data.paymentId,
-                        payment_email=registration_data.paymentEmail
+                        payment_email=registration_data.paymentEmail,
+                        final_price=payment_amount
                     )
                     additional_registrations = []
                     
@@ -1185,6 +1369,63 @@ async def get_event_capacity(event_id: int):
         print(f"❌ Error getting event capacity: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get event capacity: {str(e)}")
 
+# Comment frames keep proxies from closing an idle stream
+CAPACITY_STREAM_KEEPALIVE_SECONDS = 15
+
+def _sse_message(snapshot: dict) -> str:
+    """Format a capacity snapshot as a server-sent event"""
+    return f"event: capacity\ndata: {json.dumps(snapshot, separators=(',', ':'))}\n\n"
+
+@event_router.get("/{event_id}/capacity/stream")
+async def stream_event_capacity(event_id: int, request: Request):
+    """Push remaining seats for an event, its tiers and sub-events (server-sent events)"""
+    event_repo = EventRepository()
+    try:
+        snapshot = await event_repo.get_capacity_snapshot(event_id)
+    except Exception as e:
+        print(f"❌ Error opening capacity stream: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to open capacity stream: {str(e)}")
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    broadcaster = get_capacity_broadcaster()
+    queue = broadcaster.subscribe(event_id)
+    
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            yield _sse_message(snapshot)
+            while not await request.is_disconnected():
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=CAPACITY_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse_message(update)
+        finally:
+            broadcaster.unsubscribe(event_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    )
+
+@event_router.post("/capacity:batch")
+async def get_capacity_batch(request: CapacityBatchRequest):
+    """Remaining capacity for many events, tiers and sub-events in one request"""
+    for name, ids in (("eventIds", request.eventIds), ("tierIds", request.tierIds), ("subEventIds", request.subEventIds)):
+        if len(ids) > CAPACITY_BATCH_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"{name} accepts at most {CAPACITY_BATCH_MAX_IDS} IDs")
+    
+    try:
+        event_repo = EventRepository()
+        capacity = await event_repo.get_capacity_batch(request.eventIds, request.tierIds, request.subEventIds)
+        return {"success": True, **capacity}
+    except Exception as e:
+        print(f"❌ Error getting batch capacity: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get batch capacity: {str(e)}")
+
 @event_router.get("/capacity/{tier_id}")
 async def get_tier_capacity(tier_id: int):
     """Get available capacity for a ticket tier"""
@@ -1218,17 +1459,18 @@ async def get_sub_event_capacity(sub_event_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to get sub-event capacity: {str(e)}")
 
 @event_router.get("/{event_id}/ticket-options")
-async def get_ticket_options(event_id: int, user_email: Optional[str] = None):
-    """Get available ticket options for an event with automatic progression logic"""
+async def get_ticket_options(event_id: int, user_email: Optional[str] = None,
+                             x_cache_bypass: Optional[str] = Header(None),
+                             if_none_match: Optional[str] = Header(None)):
+    """
+    Get available ticket options for an event with automatic progression logic.
+    The response depends only on the event's inventory and the user's cohort (currentYear, UofT or not),
+    so rendered bytes are cached per cohort until the next inventory change or tier date boundary.
+    """
     try:
         event_repo = EventRepository()
         try:
-            await event_repo.ensure_tables_exist()
-            
-            # Get the event first
-            event = await event_repo.get_event_with_tiers_and_subevents(event_id)
-            if not event:
-                raise HTTPException(status_code=404, detail="Event not found")
+            use_cache = _use_event_cache(x_cache_bypass)
             
             # Get user info for filtering if provided
             user_current_year = None
@@ -1244,9 +1486,30 @@ async def get_ticket_options(event_id: int, user_email: Optional[str] = None):
                 finally:
                     pass
             
+            response_cache = get_event_cache().responses
+            cache_key = ("ticket-options", event_id, user_university == 'University of Toronto', user_current_year)
+            public = not user_email
+            if use_cache:
+                cached = response_cache.get(cache_key)
+                if cached is not MISS:
+                    etag, body = cached
+                    return json_bytes_response(body, etag, if_none_match, public)
+            version = response_cache.version_of(event_id)
+            
+            await event_repo.ensure_tables_exist()
+            
+            # Get the event first
+            event = await event_repo.get_event_with_tiers_and_subevents(event_id, use_cache=use_cache)
+            if not event:
+                raise HTTPException(status_code=404, detail="Event not found")
+            
             # Check university restrictions
             if event.get('isUofTOnly', False) and user_university != 'University of Toronto':
-                return {"success": False, "message": "This event is restricted to University of Toronto students only"}
+                result = {"success": False, "message": "This event is restricted to University of Toronto students only"}
+                body = render_json(result)
+                etag = content_etag(body)
+                response_cache.put(cache_key, (etag, body), event_id, version)
+                return json_bytes_response(body, etag, if_none_match, public, cacheable=use_cache)
             
             result = {
                 "success": True,
@@ -1263,19 +1526,12 @@ async def get_ticket_options(event_id: int, user_email: Optional[str] = None):
             }
             
             # Get available ticket tiers with automatic progression
+            filtered_tiers = []
             if event.get('enableAdvancedTicketing', False):
-                tiers = await event_repo.get_available_ticket_tiers(event_id)
-                
-                # Filter by user's current year
-                filtered_tiers = []
-                for tier in tiers:
-                    target_year = tier.get('targetYear', 'All years')
-                    if target_year == 'All years' or not user_current_year:
-                        filtered_tiers.append(tier)
-                    else:
-                        target_years = [year.strip() for year in target_year.split(',')]
-                        if user_current_year in target_years:
-                            filtered_tiers.append(tier)
+                # Only tiers targeting the user's current year (evaluated in SQL)
+                filtered_tiers = await event_repo.get_available_ticket_tiers(
+                    event_id, use_cache=use_cache, current_year=user_current_year
+                )
                 
                 # Convert datetime fields
                 for tier in filtered_tiers:
@@ -1291,10 +1547,17 @@ async def get_ticket_options(event_id: int, user_email: Optional[str] = None):
             
             # Get available sub-events
             if event.get('enableSubEvents', False):
-                sub_events = await event_repo.get_available_sub_events(event_id)
+                sub_events = await event_repo.get_available_sub_events(event_id, use_cache=use_cache)
                 result['subEvents'] = sub_events
             
-            return result
+            body = render_json(result)
+            etag = content_etag(body)
+            
+            # Expire exactly when a tier opens or closes; inventory writes invalidate the event scope
+            ttl = event_repo.transition_ttl(response_cache, filtered_tiers)
+            response_cache.put(cache_key, (etag, body), event_id, version, ttl_seconds=ttl)
+            
+            return json_bytes_response(body, etag, if_none_match, public, cacheable=use_cache)
             
         except Exception as e:
             raise e
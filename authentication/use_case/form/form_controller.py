@@ -1,14 +1,27 @@
 # authentication/use_case/form/form_controller.py
-from fastapi import APIRouter, HTTPException
+import os
+from fastapi import APIRouter, HTTPException, Header, Query, BackgroundTasks, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Any, Dict
 from datetime import datetime
-from authentication.data_access.form_repository import FormRepository
+from authentication.data_access.form_repository import FormRepository, SUBMISSION_PAGE_MAX_LIMIT
+from authentication.http_cache import make_etag, render_json, content_etag, json_bytes_response, etag_matches
+from authentication.qr_codes import (
+    get_qr_code_cache, qr_cache_headers, QRRenderUnavailable, QR_FORMATS, QR_BATCH_MAX_ITEMS
+)
+from authentication.data_access.catalog_cache import MISS
+from authentication.data_access.export_stream import EXPORT_FORMATS, stream_export
+from authentication.data_access.form_cache import get_form_cache, FORMS_SCOPE
+from authentication.data_access.submission_buffer import (
+    get_submission_buffer, SubmissionBufferFull, DuplicateBufferedSubmission
+)
 
 form_router = APIRouter(prefix="/forms", tags=["forms"])
 
 # Pydantic models
 class FormFieldRequest(BaseModel):
+    id: Optional[int] = None  # existing field (kept, with its answers); omit for a new field
     type: str  # "text", "textarea", "select", "radio", "checkbox", "rating", "file"
     question: str
     description: Optional[str] = None
@@ -44,6 +57,12 @@ class PublicFormSubmissionRequest(BaseModel):
     guestName: Optional[str] = None
     userId: Optional[int] = None
 
+class QRBatchRequest(BaseModel):
+    formIds: List[int]
+    format: str = "png"
+    size: int = 10
+    border: int = 4
+
 class CouponRequest(BaseModel):
     code: str
     name: str
@@ -85,28 +104,47 @@ async def create_form(form_data: FormRequest):
         raise HTTPException(status_code=500, detail=f"Failed to create form: {str(e)}")
 
 @form_router.get("/public/{access_token}")
-async def get_public_form(access_token: str):
-    """Get form by access token for public access"""
+async def get_public_form(access_token: str, if_none_match: Optional[str] = Header(None)):
+    """Get form by access token for public access (served from pre-serialized JSON)"""
     try:
         print(f"📝 Getting public form with token: {access_token}")
         
         form_repo = FormRepository()
+        response_cache = get_form_cache().responses
         try:
+            # The fingerprint is the form version plus its event's updatedAt, so a cached body is
+            # only served while neither has changed
+            fingerprint = await form_repo.get_public_form_fingerprint(access_token)
+            if fingerprint is not None:
+                cached = response_cache.get(("public", access_token))
+                if cached is not MISS and cached[0] == fingerprint:
+                    _, etag, body = cached
+                    return json_bytes_response(body, etag, if_none_match)
+            
+            version = response_cache.version_of(FORMS_SCOPE)
             form = await form_repo.get_form_by_token(access_token)
             if not form:
                 raise HTTPException(status_code=404, detail="Form not found or not accessible")
             
             # Also get the event information
             event = await form_repo.get_event_by_id(form["eventId"])
-            return {
+            body = render_json({
                 "success": True,
                 "form": form,
                 "event": event
-            }
+            })
+            
+            if fingerprint is None:
+                return json_bytes_response(body, content_etag(body), if_none_match, cacheable=False)
+            etag = make_etag("public-form", access_token, fingerprint)
+            response_cache.put(("public", access_token), (fingerprint, etag, body), FORMS_SCOPE, version)
+            return json_bytes_response(body, etag, if_none_match)
         except Exception as e:
             raise e
     except Exception as e:
         print(f"❌ Error getting public form: {e}")
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to get public form: {str(e)}")
 
 @form_router.get("/event/{event_id}")
@@ -138,6 +176,11 @@ async def get_form_by_event(event_id: int):
         error_message = str(e) if str(e) else "Unknown database error"
         raise HTTPException(status_code=500, detail=f"Failed to get form: {error_message}")
 
+def _public_form_url(access_token: str) -> str:
+    """Public form URL encoded in the QR code"""
+    base_url = os.getenv("FRONTEND_URL", "https://uoftjn.com")
+    return f"{base_url}/form/{access_token}"
+
 @form_router.get("/{form_id}/qr")
 async def get_form_qr_data(form_id: int):
     """Get QR code data for a form"""
@@ -146,34 +189,58 @@ async def get_form_qr_data(form_id: int):
         
         form_repo = FormRepository()
         try:
-            form = await form_repo.get_form_by_id(form_id)
-            if not form:
+            targets = await form_repo.get_form_qr_targets([form_id])
+            if not targets:
                 raise HTTPException(status_code=404, detail="Form not found")
-            
-            # Get event info for the QR code
-            event = await form_repo.get_event_by_id(form["eventId"])
-            # Generate the public form URL
-            # Get base URL from environment or use default
-            import os
-            base_url = os.getenv("FRONTEND_URL", "https://uoftjn.com")
-            public_url = f"{base_url}/form/{form['accessToken']}"
+            form = targets[0]
             
             return {
                 "success": True,
                 "qrData": {
-                    "url": public_url,
+                    "url": _public_form_url(form["accessToken"]),
+                    "imageUrl": f"/forms/{form_id}/qr/image",
                     "accessToken": form["accessToken"],
                     "formTitle": form["title"],
-                    "eventName": event["name"] if event else "Unknown Event",
-                    "eventDate": str(event["date"]) if event else None
+                    "eventName": form["eventName"] or "Unknown Event",
+                    "eventDate": str(form["eventDate"]) if form["eventDate"] else None
                 }
             }
         except Exception as e:
             raise e
     except Exception as e:
         print(f"❌ Error getting QR code data: {e}")
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to get QR code data: {str(e)}")
 
+@form_router.get("/{form_id}/qr/image")
+async def get_form_qr_image(form_id: int, format: str = "png", size: int = 10, border: int = 4,
+                            if_none_match: Optional[str] = Header(None)):
+    """Server-rendered QR code (png|svg) for the public form URL, cached by content hash"""
+    try:
+        targets = await FormRepository().get_form_qr_targets([form_id])
+        if not targets:
+            raise HTTPException(status_code=404, detail="Form not found")
+        
+        try:
+            image, key = await get_qr_code_cache().render(
+                _public_form_url(targets[0]["accessToken"]), format, size, border
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QRRenderUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        headers = qr_cache_headers(key)
+        if etag_matches(headers["ETag"], if_none_match):
+            return Response(status_code=304, headers=headers)
+        return Response(content=image, media_type=QR_FORMATS[format], headers=headers)
+    except Exception as e:
+        print(f"❌ Error rendering QR code: {e}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to render QR code: {str(e)}")
+
 @form_router.put("/{form_id}")
 async def update_form(form_id: int, form_data: FormRequest):
     """Update an existing form"""
@@ -183,6 +250,8 @@ async def update_form(form_id: int, form_data: FormRequest):
         form_repo = FormRepository()
         try:
             form = await form_repo.update_form(form_id, form_data.dict())
+            if form is None:
+                raise HTTPException(status_code=404, detail="Form not found")
             return {
                 "success": True,
                 "message": "Form updated successfully",
@@ -192,6 +261,8 @@ async def update_form(form_id: int, form_data: FormRequest):
             raise e
     except Exception as e:
         print(f"❌ Error updating form: {e}")
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to update form: {str(e)}")
 
 @form_router.delete("/{form_id}")
@@ -220,25 +291,61 @@ async def delete_form(form_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to delete form: {str(e)}")
 
 # Form submission endpoints
+@form_router.post("/qr:batch")
+async def get_form_qr_batch(batch_request: QRBatchRequest):
+    """ZIP of QR codes for several forms (for printing), one file per form"""
+    try:
+        form_ids = list(dict.fromkeys(batch_request.formIds))
+        if not form_ids:
+            raise HTTPException(status_code=400, detail="formIds must not be empty")
+        if len(form_ids) > QR_BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"At most {QR_BATCH_MAX_ITEMS} forms per batch")
+        
+        targets = await FormRepository().get_form_qr_targets(form_ids)
+        if not targets:
+            raise HTTPException(status_code=404, detail="No forms found")
+        
+        items = [
+            (f"form_{target['id']}", _public_form_url(target["accessToken"]))
+            for target in targets
+        ]
+        try:
+            archive = await get_qr_code_cache().render_zip(
+                items, batch_request.format, batch_request.size, batch_request.border
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QRRenderUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        return Response(
+            content=archive,
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="form_qr_codes.zip"'}
+        )
+    except Exception as e:
+        print(f"❌ Error rendering QR code batch: {e}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to render QR codes: {str(e)}")
+
 @form_router.post("/submit")
-async def submit_form(submission_data: FormSubmissionRequest):
+async def submit_form(submission_data: FormSubmissionRequest, background_tasks: BackgroundTasks):
     """Submit a form response"""
     try:
         print(f"📝 Submitting form {submission_data.formId} by user {submission_data.userId}")
         
         form_repo = FormRepository()
         try:
-            submission = await form_repo.submit_form(submission_data.dict())
+            try:
+                submission = await form_repo.submit_form(submission_data.dict())
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             
-            # Check if this submission triggers any auto-coupons
-            # Get the form to find the event ID
-            form_query = 'SELECT "eventId" FROM "Form" WHERE id = $1'
-            async with form_repo.pool.acquire() as conn:
-                form_row = await conn.fetchrow(form_query, submission["formId"])
-                if form_row:
-                    generated_coupons = await form_repo.check_and_generate_auto_coupons(form_row["eventId"])
-                    if generated_coupons:
-                        print(f"🎟️ Generated {len(generated_coupons)} auto-coupons")
+            # Check if this submission triggers any auto-coupons (after the response is sent)
+            form = await form_repo.get_form_by_id(submission["formId"])
+            if form and form.get("eventId"):
+                background_tasks.add_task(_generate_auto_coupons, form["eventId"], submission["userId"])
             
             return {
                 "success": True,
@@ -249,76 +356,102 @@ async def submit_form(submission_data: FormSubmissionRequest):
             raise e
     except Exception as e:
         print(f"❌ Error submitting form: {e}")
+        if isinstance(e, HTTPException):
+            raise e
         # Check if this is a duplicate submission error
         if "You have already submitted this form" in str(e):
             raise HTTPException(status_code=409, detail="You have already submitted this form")
         raise HTTPException(status_code=500, detail=f"Failed to submit form: {str(e)}")
 
+async def _generate_auto_coupons(event_id: int, user_id: int) -> None:
+    """Deferred coupon generation after a submission (errors are only logged)"""
+    try:
+        generated_coupons = await FormRepository().check_and_generate_auto_coupons(event_id, [user_id])
+        if generated_coupons:
+            print(f"🎟️ Generated {len(generated_coupons)} auto-coupons after submission by user {user_id}")
+    except Exception as e:
+        print(f"❌ Deferred auto-coupon generation failed for event {event_id}: {e}")
+
 @form_router.post("/public/{access_token}/submit")
-async def submit_public_form(access_token: str, submission_data: PublicFormSubmissionRequest):
+async def submit_public_form(access_token: str, submission_data: PublicFormSubmissionRequest,
+                             background_tasks: BackgroundTasks):
     """Submit a form response via public access token"""
     try:
         print(f"📝 Submitting public form with token: {access_token}")
         
         form_repo = FormRepository()
-        try:
-            # First get the form by token to verify access
-            form = await form_repo.get_form_by_token(access_token)
-            if not form:
-                raise HTTPException(status_code=404, detail="Form not found or not accessible")
-            
-            # Handle guest submissions - find or create user
-            user_id = submission_data.userId
-            if not user_id and submission_data.guestEmail:
-                # Try to find existing user by email, or create a guest entry
-                user_id = await form_repo.find_or_create_guest_user(
-                    submission_data.guestEmail, 
-                    submission_data.guestName or "Guest User"
+        responses_data = [
+            {"fieldId": response.fieldId, "value": response.value}
+            for response in submission_data.responses
+        ]
+        
+        # Buffered mode (event-day check-in): acknowledge with a receipt, write in the next batch
+        submission_buffer = get_submission_buffer()
+        if submission_buffer.started:
+            try:
+                receipt = await submission_buffer.enqueue(
+                    access_token,
+                    responses_data,
+                    user_id=submission_data.userId,
+                    guest_email=submission_data.guestEmail,
+                    guest_name=submission_data.guestName
                 )
-            
-            if not user_id:
-                raise HTTPException(status_code=400, detail="User identification required")
-            
-            # Create submission data - convert Pydantic objects to dict
-            responses_data = []
-            for response in submission_data.responses:
-                responses_data.append({
-                    "fieldId": response.fieldId,
-                    "value": response.value
-                })
-            
-            form_submission_data = {
-                "formId": form["id"],
-                "userId": user_id,
-                "responses": responses_data
-            }
-            
-            submission = await form_repo.submit_form(form_submission_data)
-            
-            # Award credits for form completion
-            credits_awarded = await form_repo.award_credits_for_form_submission(form["id"], user_id)
-            
-            # Check if this submission triggers any auto-coupons
-            generated_coupons = await form_repo.check_and_generate_auto_coupons(form["eventId"])
-            if generated_coupons:
-                print(f"🎟️ Generated {len(generated_coupons)} auto-coupons for public submission")
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except DuplicateBufferedSubmission as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            except SubmissionBufferFull as e:
+                raise HTTPException(status_code=503, detail=str(e))
             
             return {
                 "success": True,
-                "message": "Form submitted successfully",
-                "submission": submission,
-                "creditsAwarded": credits_awarded,
-                "generatedCoupons": generated_coupons if generated_coupons else []
+                "message": "Form submission received",
+                "receipt": receipt,
+                "generatedCoupons": []
             }
-        except Exception as e:
-            raise e
+        
+        # Token lookup, guest upsert, submission and credits commit together
+        try:
+            result = await form_repo.submit_public_form(
+                access_token,
+                responses_data,
+                user_id=submission_data.userId,
+                guest_email=submission_data.guestEmail,
+                guest_name=submission_data.guestName
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if result is None:
+            raise HTTPException(status_code=404, detail="Form not found or not accessible")
+        
+        # Coupon thresholds span every submission of the event; evaluated after the response is sent
+        background_tasks.add_task(_generate_auto_coupons, result["eventId"], result["submission"]["userId"])
+        
+        return {
+            "success": True,
+            "message": "Form submitted successfully",
+            "submission": result["submission"],
+            "creditsAwarded": result["creditsAwarded"],
+            "generatedCoupons": []
+        }
     except Exception as e:
         print(f"❌ Error submitting public form: {e}")
+        if isinstance(e, HTTPException):
+            raise e
         # Check if this is a duplicate submission error
         if "You have already submitted this form" in str(e):
             raise HTTPException(status_code=409, detail="You have already submitted this form")
         raise HTTPException(status_code=500, detail=f"Failed to submit public form: {str(e)}")
 
+@form_router.get("/public/receipts/{receipt_id}")
+async def get_submission_receipt(receipt_id: str):
+    """Status of a buffered public submission (receipts are held by the worker that issued them)"""
+    receipt = get_submission_buffer().get_receipt(receipt_id)
+    if receipt is None:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return receipt
+
 @form_router.get("/check-submission")
 async def check_form_submission(formId: int, userId: int):
     """Check if a user has already submitted a specific form"""
@@ -328,7 +461,7 @@ async def check_form_submission(formId: int, userId: int):
         form_repo = FormRepository()
         try:
             # Check if submission exists
-            async with form_repo.pool.acquire() as conn:
+            async with form_repo.get_connection() as conn:
                 submission_query = """
                     SELECT fs.id, fs."submittedAt",
                            array_agg(
@@ -370,25 +503,86 @@ async def check_form_submission(formId: int, userId: int):
         raise HTTPException(status_code=500, detail=f"Failed to check form submission: {str(e)}")
 
 @form_router.get("/{form_id}/submissions")
-async def get_form_submissions(form_id: int):
-    """Get all submissions for a form"""
+async def get_form_submissions(form_id: int,
+                               limit: Optional[int] = Query(None, ge=1, le=SUBMISSION_PAGE_MAX_LIMIT),
+                               cursor: Optional[str] = None):
+    """
+    Get submissions for a form (one query, responses decoded by field type).
+    Pass limit (and the returned nextCursor) to page through large forms.
+    """
     try:
         print(f"📝 Getting submissions for form {form_id}")
         
         form_repo = FormRepository()
         try:
-            submissions = await form_repo.get_form_submissions(form_id)
-            return {
-                "success": True,
-                "submissions": submissions,
-                "count": len(submissions)
-            }
-        except Exception as e:
-            raise e
+            result = await form_repo.get_form_submissions(form_id, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {
+            "success": True,
+            **result,
+            "count": len(result["submissions"])
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error getting form submissions: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get form submissions: {str(e)}")
 
+@form_router.get("/{form_id}/submissions/count")
+async def count_form_submissions(form_id: int):
+    """Total number of submissions for a form"""
+    try:
+        total = await FormRepository().count_form_submissions(form_id)
+        return {"success": True, "formId": form_id, "total": total}
+    except Exception as e:
+        print(f"❌ Error counting form submissions: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to count form submissions: {str(e)}")
+
+@form_router.get("/{form_id}/export")
+async def export_form_submissions(form_id: int, format: str = "csv"):
+    """
+    Export submissions pivoted to one row per submission and one column per field
+    (streamed straight from a database cursor). format=csv|ndjson.
+    """
+    try:
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+        
+        export = await FormRepository().submission_export_query(form_id)
+        if export is None:
+            raise HTTPException(status_code=404, detail="Form not found")
+        
+        filename = f"form_{form_id}_submissions.{format}"
+        return StreamingResponse(
+            stream_export(export["query"], export["params"], export["columns"], format,
+                          headers=export["headers"], decoders=export["decoders"]),
+            media_type=EXPORT_FORMATS[format],
+            headers={
+                "Content-Disposition": f"attachment; filename=\"{filename}\""
+            },
+        )
+    except Exception as e:
+        print(f"❌ Error exporting form submissions: {e}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to export form submissions")
+
+@form_router.get("/{form_id}/analytics")
+async def get_form_analytics(form_id: int):
+    """Per-field answer counts, option breakdowns and numeric histograms (from the aggregate table)"""
+    try:
+        analytics = await FormRepository().get_form_analytics(form_id)
+        if analytics is None:
+            raise HTTPException(status_code=404, detail="Form not found")
+        return {"success": True, "analytics": analytics}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error getting form analytics: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get form analytics: {str(e)}")
+
 # Coupon endpoints
 @form_router.post("/coupons")
 async def create_coupon(coupon_data: CouponRequest):
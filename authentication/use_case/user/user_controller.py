@@ -1,8 +1,11 @@
 # authentication/use_case/user/user_controller.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
+from typing import Optional
 from authentication.data_access.data_access import get_user_sub
 from authentication.data_access.user_repository import UserRepository
+from authentication.data_access.event_repository import EventRepository, EVENT_PAGE_DEFAULT_LIMIT, EVENT_PAGE_MAX_LIMIT
+from authentication.data_access.refund_repository import RefundRepository
 from authentication.data_access.cognito_idp_actions import CognitoIdentityProviderWrapper
 
 user_router = APIRouter(prefix="/users", tags=["users"])
@@ -316,4 +319,29 @@ async def get_user_admin_status(email: str):
             
     except Exception as e:
         print(f"❌ Controller error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to get admin status: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to get admin status: {str(e)}") 
+
+@user_router.get("/{user_id}/registrations")
+async def get_user_registrations(user_id: int,
+                                 limit: int = Query(EVENT_PAGE_DEFAULT_LIMIT, ge=1, le=EVENT_PAGE_MAX_LIMIT),
+                                 cursor: Optional[str] = None):
+    """
+    Every registration of a user (newest first) with event summary, tier, payment ID/email and
+    refund request status, so the profile page loads in one request. Paginated with nextCursor.
+    """
+    try:
+        # The query joins RefundRequest, which is created lazily by the refund repository
+        await RefundRepository().ensure_tables_exist()
+        
+        try:
+            result = await EventRepository().get_user_registrations(user_id, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {"success": True, **result}
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error getting registrations for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get registrations: {str(e)}")
@@ -0,0 +1,107 @@
+# authentication/use_case/waitlist/waitlist_controller.py
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+from typing import Optional
+from authentication.data_access.event_repository import EventRepository
+from authentication.data_access.waitlist_repository import WaitlistRepository
+
+waitlist_router = APIRouter(prefix="/events", tags=["waitlist"])
+
+class WaitlistJoinRequest(BaseModel):
+    userId: int
+    tierId: Optional[int] = None
+    paymentEmail: Optional[str] = None
+
+def _serialize_entry(entry: dict) -> dict:
+    """Convert datetime fields of a waitlist entry to ISO strings"""
+    for key in ("queuedAt", "promotedAt", "holdExpiresAt"):
+        if entry.get(key):
+            entry[key] = entry[key].isoformat()
+    return entry
+
+@waitlist_router.post("/{event_id}/waitlist")
+async def join_waitlist(event_id: int, request: WaitlistJoinRequest):
+    """Join an event's waitlist once instead of retrying a full event"""
+    try:
+        print(f"⏳ User {request.userId} joining waitlist for event {event_id}")
+
+        event_repo = EventRepository()
+        await event_repo.ensure_tables_exist()
+
+        if await event_repo.check_existing_registration(request.userId, event_id):
+            raise HTTPException(status_code=400, detail="User already registered for this event")
+
+        waitlist_repo = WaitlistRepository()
+        entry = await waitlist_repo.join_waitlist(
+            event_id=event_id,
+            user_id=request.userId,
+            tier_id=request.tierId,
+            payment_email=request.paymentEmail
+        )
+
+        # A seat may already be free (e.g. a hold just expired); promote immediately if so
+        if entry['status'] == 'waiting':
+            await waitlist_repo.promote_waitlisted(event_id)
+            entry = await waitlist_repo.get_waitlist_entry(event_id, request.userId)
+
+        return {
+            "success": True,
+            "message": "Added to waitlist" if entry['status'] == 'waiting' else "A seat is being held for you",
+            "waitlist": _serialize_entry(entry)
+        }
+    except Exception as e:
+        print(f"❌ Error joining waitlist: {e}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to join waitlist: {str(e)}")
+
+@waitlist_router.get("/{event_id}/waitlist/status")
+async def get_waitlist_status(event_id: int, user_id: int = Query(...)):
+    """Get a user's waitlist position, or their held reservation once promoted"""
+    try:
+        waitlist_repo = WaitlistRepository()
+        entry = await waitlist_repo.get_waitlist_entry(event_id, user_id)
+        if not entry:
+            return {"success": True, "onWaitlist": False, "waitlist": None}
+
+        return {
+            "success": True,
+            "onWaitlist": entry['status'] in ('waiting', 'promoted'),
+            "waitlist": _serialize_entry(entry)
+        }
+    except Exception as e:
+        print(f"❌ Error getting waitlist status: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get waitlist status: {str(e)}")
+
+@waitlist_router.delete("/{event_id}/waitlist")
+async def leave_waitlist(event_id: int, user_id: int = Query(...)):
+    """Leave an event's waitlist (releases any held seat to the next person)"""
+    try:
+        waitlist_repo = WaitlistRepository()
+        success = await waitlist_repo.leave_waitlist(event_id, user_id)
+        if not success:
+            raise HTTPException(status_code=404, detail="Waitlist entry not found")
+
+        print(f"✅ User {user_id} left waitlist for event {event_id}")
+        return {"success": True, "message": "Removed from waitlist"}
+    except Exception as e:
+        print(f"❌ Error leaving waitlist: {e}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to leave waitlist: {str(e)}")
+
+@waitlist_router.get("/{event_id}/waitlist")
+async def get_event_waitlist(event_id: int):
+    """Get the active waitlist for an event (admin)"""
+    try:
+        waitlist_repo = WaitlistRepository()
+        entries = await waitlist_repo.get_event_waitlist(event_id)
+        return {
+            "success": True,
+            "waitlist": [_serialize_entry(entry) for entry in entries],
+            "waitingCount": sum(1 for entry in entries if entry['status'] == 'waiting'),
+            "promotedCount": sum(1 for entry in entries if entry['status'] == 'promoted')
+        }
+    except Exception as e:
+        print(f"❌ Error getting event waitlist: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get event waitlist: {str(e)}")
@@ -0,0 +1,5 @@
+// Server-side only: ADMIN_API_KEY must never be exposed as a NEXT_PUBLIC_ variable
+export function adminHeaders(): Record<string, string> {
+  const key = process.env.ADMIN_API_KEY;
+  return key ? { 'X-Admin-Key': key } : {};
+}
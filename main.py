@@ -13,6 +13,7 @@ from authentication.use_case.contact.contact_controller import contact_router
 from authentication.use_case.user.user_controller import user_router
 from authentication.use_case.form.form_controller import form_router
 from authentication.use_case.event.event_controller import event_router
+from authentication.use_case.waitlist.waitlist_controller import waitlist_router
 from authentication.use_case.refund.refund_controller import refund_router
 from authentication.use_case.unregistered_payments.unregistered_payments_controller import unregistered_payments_router
 from authentication.use_case.admin.admin_controller import router as admin_router
@@ -20,6 +21,9 @@ from authentication.use_case.send_contact_form.send_contact_form_controller impo
 from authentication.use_case.send_receipt.sendreceipt_controller import receipt_router as sendreceipt_controller
 from authentication.data_access.database_init import init_database
 from authentication.data_access.database_pool import initialize_global_pool, close_global_pool
+from authentication.data_access.invalidation_bus import start_invalidation_bus, stop_invalidation_bus
+from authentication.data_access.submission_buffer import start_submission_buffer, stop_submission_buffer
+from authentication.data_access.waitlist_repository import start_hold_sweeper, stop_hold_sweeper
 
 app = FastAPI()
 
@@ -47,6 +51,7 @@ app.include_router(contact_router)
 app.include_router(user_router)
 app.include_router(form_router)
 app.include_router(event_router)
+app.include_router(waitlist_router)
 app.include_router(refund_router)
 app.include_router(unregistered_payments_router)
 app.include_router(admin_router)
@@ -66,6 +71,17 @@ async def startup_event():
         # Initialize database tables
         await init_database()
         print("✅ Database connection verified and ready")
+        
+        # Subscribe to cache invalidations from other workers
+        await start_invalidation_bus()
+        print("✅ Cache invalidation bus started")
+        
+        # Replay buffered form submissions left by a previous run (no-op unless enabled)
+        await start_submission_buffer()
+        
+        # Release expired reservation holds and promote the waitlist even when nobody is reserving
+        await start_hold_sweeper()
+        print("✅ Expired hold sweeper started")
     except Exception as e:
         print(f"⚠️ Database initialization failed: {e}")
         print("⚠️ The app will continue but database operations may fail")
@@ -76,6 +92,9 @@ async def startup_event():
 async def shutdown_event():
     """Close global connection pool on shutdown"""
     try:
+        await stop_hold_sweeper()
+        await stop_submission_buffer()
+        await stop_invalidation_bus()
         await close_global_pool()
         print("✅ Global connection pool closed")
     except Exception as e:
@@ -97,3 +116,23 @@ async def get_pool_status():
         return status
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+@app.get("/cache-status")
+async def get_cache_status():
+    """Get event catalog cache statistics"""
+    try:
+        from authentication.data_access.catalog_cache import get_event_cache
+        from authentication.data_access.invalidation_bus import get_invalidation_bus
+        from authentication.data_access.capacity_broadcaster import get_capacity_broadcaster
+        from authentication.data_access.form_cache import get_form_cache
+        from authentication.data_access.submission_buffer import get_submission_buffer
+        from authentication.qr_codes import get_qr_code_cache
+        stats = get_event_cache().get_stats()
+        stats["forms"] = get_form_cache().get_stats()
+        stats["invalidationBus"] = get_invalidation_bus().get_stats()
+        stats["capacityStream"] = get_capacity_broadcaster().get_stats()
+        stats["submissionBuffer"] = get_submission_buffer().get_stats()
+        stats["qrCodes"] = get_qr_code_cache().get_stats()
+        return stats
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
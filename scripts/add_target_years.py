@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Database migration script for normalized target years (Event / TicketTier "targetYears")
+
+Usage:
+    python scripts/add_target_years.py              # add columns + GIN indexes
+    python scripts/add_target_years.py --benchmark  # also compare old vs new eligibility filtering
+                                                    # on 1,000 seeded archived events (rolled back)
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Add the parent directory to the path so we can import from authentication
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from authentication.data_access.database_pool import get_pool_manager
+from authentication.data_access.event_repository import TARGET_YEARS_EXPRESSION
+
+BENCHMARK_EVENTS = 1000
+BENCHMARK_RUNS = 20
+BENCHMARK_YEAR = "3rd year"
+
+async def add_target_years_columns(conn):
+    """Add generated targetYears columns and GIN indexes"""
+    for table_name in ("Event", "TicketTier"):
+        column_exists = await conn.fetchval("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.columns
+                WHERE table_schema = 'public'
+                AND table_name = $1
+                AND column_name = 'targetYears'
+            );
+        """, table_name)
+
+        if column_exists:
+            print(f"✅ {table_name}.targetYears already exists")
+        else:
+            print(f"🆕 Adding targetYears to {table_name}...")
+            await conn.execute(f"""
+                ALTER TABLE "{table_name}"
+                ADD COLUMN "targetYears" TEXT[] GENERATED ALWAYS AS ({TARGET_YEARS_EXPRESSION}) STORED;
+            """)
+            print(f"✅ {table_name}.targetYears added (backfilled by Postgres)")
+
+        await conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS "idx_{table_name}_targetYears"
+            ON "{table_name}" USING GIN ("targetYears");
+        """)
+        print(f"✅ GIN index on {table_name}.targetYears created/verified")
+
+async def benchmark(conn):
+    """Seed archived events, then time Python-side vs SQL-side eligibility filtering"""
+    print(f"\n📊 Seeding {BENCHMARK_EVENTS} archived events (rolled back afterwards)...")
+    await conn.execute("""
+        INSERT INTO "Event" (name, description, "targetYear", fee, capacity, date, type, "isArchived", "isUofTOnly")
+        SELECT 'Benchmark ' || g, 'benchmark',
+               (ARRAY['All years', '1st year, 2nd year', '3rd year, 4th year', 'Graduate'])[1 + g % 4],
+               0, 50, NOW() - (g || ' days')::interval, 'social', TRUE, g % 5 = 0
+        FROM generate_series(1, $1) g
+    """, BENCHMARK_EVENTS)
+    await conn.execute('ANALYZE "Event"')
+
+    # Before: load every event, split targetYear per row in Python
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_RUNS):
+        rows = await conn.fetch('SELECT * FROM "Event" ORDER BY date')
+        visible = [
+            row for row in rows
+            if not row['isUofTOnly']
+            and (row['targetYear'] == 'All years'
+                 or BENCHMARK_YEAR in [year.strip() for year in row['targetYear'].split(',')])
+        ]
+    python_ms = (time.perf_counter() - start) * 1000 / BENCHMARK_RUNS
+
+    # After: predicate in SQL, only eligible rows leave the database
+    query = """
+        SELECT * FROM "Event" e
+        WHERE (NOT COALESCE(e."isUofTOnly", FALSE) OR $1::text = 'University of Toronto')
+        AND e."targetYears" && ARRAY['All years', $2::text]
+        ORDER BY e.date
+    """
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_RUNS):
+        sql_rows = await conn.fetch(query, "Other", BENCHMARK_YEAR)
+    sql_ms = (time.perf_counter() - start) * 1000 / BENCHMARK_RUNS
+
+    plan = await conn.fetch("EXPLAIN ANALYZE " + query.replace("$1::text", "'Other'").replace("$2::text", f"'{BENCHMARK_YEAR}'"))
+
+    print(f"  Python filter: {python_ms:.2f} ms/request ({len(rows)} rows fetched, {len(visible)} visible)")
+    print(f"  SQL filter:    {sql_ms:.2f} ms/request ({len(sql_rows)} rows fetched)")
+    print("  Plan:")
+    for line in plan:
+        print(f"    {line[0]}")
+
+async def run_migration():
+    """Run the database migration"""
+
+    print("🚀 Starting target years migration...")
+
+    # Get the pool manager (same as backend)
+    pool_manager = get_pool_manager()
+
+    try:
+        print("🔗 Connecting to database using pool manager...")
+        await pool_manager.initialize_pool()
+        print("✅ Pool initialized")
+
+        async with pool_manager.get_connection() as conn:
+            async with conn.transaction():
+                await add_target_years_columns(conn)
+
+            if "--benchmark" in sys.argv:
+                transaction = conn.transaction()
+                await transaction.start()
+                try:
+                    await benchmark(conn)
+                finally:
+                    await transaction.rollback()
+                    print("↩️ Benchmark data rolled back")
+
+        print("\n🚀 Migration completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        # Close the pool
+        if pool_manager._pool:
+            await pool_manager._pool.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_migration())